@@ -1,18 +1,57 @@
-from fastapi import FastAPI, Query
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Query, Request
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import RedirectResponse
+from fastapi.responses import JSONResponse, RedirectResponse, Response
 from pydantic import BaseModel
 from typing import Optional
-import psycopg2, os, json
+from datetime import datetime, timezone
+import base64, binascii, json, os
+
+from backend.db import (
+    PoolTimeout, close_async_pool, close_pool, get_async_pool, get_pool, instrument_pool, open_async_pool, open_pool,
+)
+from backend.cache import ResponseCache, etag_matches, instrument_cache
+from backend.rollup import DEFAULT_SPAN, ROLLUP_SOURCES, RollupJob, instrument_rollup, rollup_tz
 
 # Routers
-from backend.api.routes_stream import router as stream_router
+from backend.api.routes_stream import router as stream_router, stop_broadcasters
+from backend.api.routes_events import router as events_router, hub as notify_hub
+from backend.api.routes_metrics import router as metrics_router, LatencyMiddleware, registry as metrics_registry
+
+
+# short-lived cache for the dashboard polling endpoints (every open browser polls the same queries)
+response_cache = ResponseCache(
+    ttl=float(os.getenv("API_CACHE_TTL", "2")),
+    max_entries=int(os.getenv("API_CACHE_MAX_ENTRIES", "256")),
+)
+instrument_cache(metrics_registry, response_cache)
+
+# hourly/daily rollups of area_counts, refreshed in the background (ROLLUP_INTERVAL_S, 0 = off)
+rollup_job = RollupJob.from_env(get_async_pool)
+instrument_rollup(metrics_registry, rollup_job)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # shared DB pools per API process (size/timeouts via DB_POOL_* env):
+    # asyncpg for the async read endpoints, psycopg2 for the sync write endpoint
+    instrument_pool(metrics_registry, await open_async_pool(), driver="asyncpg")
+    instrument_pool(metrics_registry, open_pool(), driver="psycopg2")
+    rollup_job.start()
+    yield
+    await rollup_job.stop()
+    stop_broadcasters()
+    notify_hub.stop()
+    await close_async_pool()
+    close_pool()
+
 
 # Use a relative server URL so Swagger doesn't try calling 0.0.0.0
 app = FastAPI(
     title="People Counting - MVP",
-    servers=[{"url": "/"}]
+    servers=[{"url": "/"}],
+    lifespan=lifespan,
 )
 
 # CORS (open for MVP)
@@ -21,28 +60,21 @@ app.add_middleware(
     allow_origins=["*"],
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "X-Next-Cursor"],
 )
+app.add_middleware(LatencyMiddleware)
 
 # Mount dashboard AFTER API routes so it doesn't shadow them
 app.include_router(stream_router)
+app.include_router(events_router)
+app.include_router(metrics_router)
 app.mount("/dashboard", StaticFiles(directory="dashboard", html=True), name="dashboard")
 
 
-# ----- DB helpers -----------------------------------------------------------
-
-def _env(key: str, default: Optional[str] = None) -> Optional[str]:
-    """Allow DB_* or POSTGRES_* variable names (same behavior as worker)."""
-    return os.getenv(key) or os.getenv(key.replace("DB_", "POSTGRES_")) or default
-
-
-def get_conn():
-    return psycopg2.connect(
-        host=_env("DB_HOST", "localhost"),
-        port=_env("DB_PORT", "5432"),
-        dbname=_env("DB_NAME", "people_counting"),
-        user=_env("DB_USER", "postgres"),
-        password=_env("DB_PASSWORD", ""),
-    )
+@app.exception_handler(PoolTimeout)
+async def pool_timeout_handler(request: Request, exc: PoolTimeout):
+    # pool saturated: tell the client to back off instead of piling up threads
+    return JSONResponse({"detail": str(exc)}, status_code=503, headers={"Retry-After": "1"})
 
 
 # ----- Schemas --------------------------------------------------------------
@@ -68,86 +100,176 @@ def health():
     return {"status": "ok"}
 
 
-@app.get("/api/stats/")
-def get_stats(
-    limit: int = Query(default=100, ge=1, le=1000),
-    stream_id: Optional[int] = Query(default=None),
-    area_id: Optional[int] = Query(default=None),
-):
-    """Return recent ENTER/EXIT events. Optional filter by stream_id/area_id."""
-    conn = get_conn()
-    cur = conn.cursor()
+async def cached_json(request: Request, key: tuple, load):
+    """Serve `load()` through the response cache, with ETag / If-None-Match -> 304."""
+    entry = await response_cache.get(key, load)
+    # no-cache: browsers keep the body but revalidate every poll (cheap 304 when unchanged)
+    headers = {**entry.headers, "ETag": entry.etag, "Cache-Control": "no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), entry.etag):
+        response_cache.not_modified += 1
+        return Response(status_code=304, headers=headers)
+    return Response(entry.body, media_type="application/json", headers=headers)
 
+
+def stream_area_filter(stream_id: Optional[int], area_id: Optional[int]):
+    """WHERE conditions ($n placeholders, asyncpg) + params for the optional stream/area filter."""
     where = []
     params = []
     if stream_id is not None:
-        where.append("stream_id = %s")
         params.append(stream_id)
+        where.append(f"stream_id = ${len(params)}")
     if area_id is not None:
-        where.append("area_id = %s")
         params.append(area_id)
+        where.append(f"area_id = ${len(params)}")
+    return where, params
 
-    sql = "SELECT stream_id, area_id, track_id, ts, direction FROM area_events"
-    if where:
-        sql += " WHERE " + " AND ".join(where)
-    sql += " ORDER BY ts DESC LIMIT %s"
-    params.append(limit)
 
-    cur.execute(sql, tuple(params))
-    rows = cur.fetchall()
-    columns = [desc[0] for desc in cur.description]
-    cur.close(); conn.close()
-    return [dict(zip(columns, r)) for r in rows]
+def where_sql(where: list) -> str:
+    return " WHERE " + " AND ".join(where) if where else ""
 
 
-@app.get("/api/stats/live")
-def get_live_stats(
+def as_utc(dt: Optional[datetime]) -> Optional[datetime]:
+    # timestamps without offset are taken as UTC (same as the stored timestamptz values)
+    if dt is not None and dt.tzinfo is None:
+        return dt.replace(tzinfo=timezone.utc)
+    return dt
+
+
+def encode_cursor(ts: datetime, event_id: int) -> str:
+    """Opaque keyset cursor for the row AFTER which the next page starts (ts, event_id)."""
+    return base64.urlsafe_b64encode(f"{ts.isoformat()}|{event_id}".encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        ts, event_id = raw.rsplit("|", 1)
+        return as_utc(datetime.fromisoformat(ts)), int(event_id)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise HTTPException(status_code=400, detail="invalid cursor") from None
+
+
+@app.get("/api/stats/")
+async def get_stats(
+    request: Request,
+    limit: int = Query(default=100, ge=1, le=1000),
     stream_id: Optional[int] = Query(default=None),
     area_id: Optional[int] = Query(default=None),
+    since: Optional[datetime] = Query(default=None, description="only events with ts >= since (ISO 8601)"),
+    until: Optional[datetime] = Query(default=None, description="only events with ts < until (ISO 8601)"),
+    cursor: Optional[str] = Query(default=None, description="X-Next-Cursor of the previous page"),
+    since_event_id: Optional[int] = Query(default=None, description=(
+        "delta: only events with event_id > this. Gap-free only with a single writer per (stream, area); "
+        "otherwise poll with `since` = newest ts - overlap and drop duplicate event_ids")),
 ):
-    """Return current inside count per area from area_live."""
-    conn = get_conn()
-    cur = conn.cursor()
+    """
+    Return ENTER/EXIT events, newest first (ts DESC, event_id DESC). Optional
+    filter by stream_id/area_id and time range. When more rows may exist the
+    response carries `X-Next-Cursor`; pass it back as `cursor` for the next
+    (older) page.
+
+    `since_event_id` returns only events with a larger id. event_id is assigned
+    at INSERT, not at COMMIT, so with several writers for the same (stream,
+    area) (e.g. a live worker plus a replay bulk load) a smaller id can become
+    visible after a client has moved past it, and replayed events carry new
+    ids with old timestamps. It is only gap-free with a single writer per
+    (stream, area); the dashboard polls by `since` with an overlap instead.
+    """
+    since, until = as_utc(since), as_utc(until)
+    where, params = stream_area_filter(stream_id, area_id)
+    if since is not None:
+        params.append(since)
+        where.append(f"ts >= ${len(params)}")
+    if until is not None:
+        params.append(until)
+        where.append(f"ts < ${len(params)}")
+    if cursor:
+        params.extend(decode_cursor(cursor))
+        where.append(f"(ts, event_id) < (${len(params) - 1}, ${len(params)})")
+    if since_event_id is not None:
+        params.append(since_event_id)
+        where.append(f"event_id > ${len(params)}")
+    params.append(limit)
+    sql = ("SELECT event_id, stream_id, area_id, track_id, ts, direction FROM area_events"
+           f"{where_sql(where)} ORDER BY ts DESC, event_id DESC LIMIT ${len(params)}")
+
+    async def load():
+        rows = await (await get_async_pool()).fetch(sql, *params)
+        headers = {}
+        if len(rows) == limit:
+            headers["X-Next-Cursor"] = encode_cursor(rows[-1]["ts"], rows[-1]["event_id"])
+        return rows, headers
+    key = ("stats", stream_id, area_id, limit, since, until, cursor, since_event_id)
+    return await cached_json(request, key, load)
+
+
+@app.get("/api/stats/rollup")
+async def get_rollup(
+    request: Request,
+    bucket: str = Query(default="hour", pattern="^(minute|hour|day|week)$"),
+    stream_id: Optional[int] = Query(default=None),
+    area_id: Optional[int] = Query(default=None),
+    since: Optional[datetime] = Query(default=None, description="default: until minus 1d/7d/90d/365d per bucket"),
+    until: Optional[datetime] = Query(default=None, description="default: now"),
+    limit: int = Query(default=5000, ge=1, le=50000),
+):
+    """
+    Enters/exits/net per time bucket per (stream, area), oldest first.
+    minute reads area_counts; hour/day/week read the precomputed rollups
+    (area_counts_hourly / area_counts_daily), which lag by up to ROLLUP_INTERVAL_S.
+    Day and week buckets start at midnight in ROLLUP_TZ.
+    """
+    table, column, unit = ROLLUP_SOURCES[bucket]
+
+    async def load():
+        end = as_utc(until) or datetime.now(timezone.utc)
+        start = as_utc(since) or end - DEFAULT_SPAN[bucket]
+        where, params = stream_area_filter(stream_id, area_id)
+        params += [start, end, rollup_tz(), limit]
+        n = len(params)
+        # since is aligned down to the bucket start so the first bucket is complete
+        where += [f"{column} >= date_trunc('{unit}', ${n - 3}::timestamptz, ${n - 1})", f"{column} < ${n - 2}"]
+        bucket_expr = f"date_trunc('week', {column}, ${n - 1})" if bucket == "week" else column
+        sql = (f"SELECT stream_id, area_id, {bucket_expr} AS bucket_start, "
+               "SUM(enters) AS enters, SUM(exits) AS exits, SUM(enters) - SUM(exits) AS net "
+               f"FROM {table}{where_sql(where)} "
+               f"GROUP BY stream_id, area_id, {bucket_expr} ORDER BY bucket_start, stream_id, area_id LIMIT ${n}")
+        return await (await get_async_pool()).fetch(sql, *params), None
+    return await cached_json(request, ("rollup", bucket, stream_id, area_id, since, until, limit), load)
 
-    where = []
-    params = []
-    if stream_id is not None:
-        where.append("stream_id = %s")
-        params.append(stream_id)
-    if area_id is not None:
-        where.append("area_id = %s")
-        params.append(area_id)
 
-    sql = "SELECT stream_id, area_id, current_inside, updated_at FROM area_live"
-    if where:
-        sql += " WHERE " + " AND ".join(where)
-    sql += " ORDER BY updated_at DESC"
+@app.get("/api/stats/live")
+async def get_live_stats(
+    request: Request,
+    stream_id: Optional[int] = Query(default=None),
+    area_id: Optional[int] = Query(default=None),
+):
+    """Return current inside count per area from area_live."""
+    where, params = stream_area_filter(stream_id, area_id)
+    sql = ("SELECT stream_id, area_id, current_inside, updated_at FROM area_live"
+           f"{where_sql(where)} ORDER BY updated_at DESC")
 
-    cur.execute(sql, tuple(params))
-    rows = cur.fetchall()
-    columns = [desc[0] for desc in cur.description]
-    cur.close(); conn.close()
-    return [dict(zip(columns, r)) for r in rows]
+    async def load():
+        return await (await get_async_pool()).fetch(sql, *params), None
+    return await cached_json(request, ("live", stream_id, area_id, None), load)
 
 
 @app.post("/api/config/area")
 def update_area_config(payload: AreaUpdate):
     """Update polygon of an area (image_norm coordinates)"""
-    conn = get_conn()
-    cur = conn.cursor()
-
-    cur.execute(
-        """
-        UPDATE areas
-        SET polygon_geojson = %s, updated_at = NOW()
-        WHERE area_id = %s
-        RETURNING area_id
-        """,
-        (json.dumps(payload.polygon_geojson), payload.area_id),
-    )
-    row = cur.fetchone()
-    conn.commit()
-    cur.close(); conn.close()
+    with get_pool().connection() as conn, conn.cursor() as cur:
+        cur.execute(
+            """
+            UPDATE areas
+            SET polygon_geojson = %s, updated_at = NOW()
+            WHERE area_id = %s
+            RETURNING area_id
+            """,
+            (json.dumps(payload.polygon_geojson), payload.area_id),
+        )
+        row = cur.fetchone()
+        conn.commit()
+    response_cache.invalidate()
 
     if not row:
         return {"status": "not_found", "area_id": payload.area_id}
@@ -0,0 +1,149 @@
+import asyncio, json, select, threading, time
+from typing import Optional
+
+from fastapi import APIRouter, Query, Request
+from fastapi.responses import StreamingResponse
+
+from backend.db import get_conn
+from backend.api.routes_metrics import registry
+
+router = APIRouter(prefix="/api/stats")
+
+# harus sama dengan NOTIFY_CHANNEL di workers/db_writer.py
+CHANNEL = "area_updates"
+HEARTBEAT_S = 15.0
+CLIENT_QUEUE_SIZE = 64
+
+
+class Subscription:
+    def __init__(self, loop, stream_id: Optional[int], area_id: Optional[int]):
+        self.loop = loop
+        self.stream_id = stream_id
+        self.area_id = area_id
+        self.queue = asyncio.Queue(maxsize=CLIENT_QUEUE_SIZE)
+
+    def wants(self, msg: dict) -> bool:
+        return ((self.stream_id is None or msg.get("stream_id") == self.stream_id)
+                and (self.area_id is None or msg.get("area_id") == self.area_id))
+
+    def push(self, msg: dict):
+        # dipanggil di event loop; client lambat -> buang pesan tertua
+        if self.queue.full():
+            self.queue.get_nowait()
+        self.queue.put_nowait(msg)
+
+
+class NotifyHub:
+    """
+    Satu koneksi LISTEN untuk seluruh proses API. Thread background menunggu
+    NOTIFY dari worker lalu meneruskan pesan ke semua subscriber SSE.
+    """
+    def __init__(self, channel: str = CHANNEL):
+        self.channel = channel
+        self._subs = set()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+
+    @property
+    def subscriber_count(self) -> int:
+        with self._lock:
+            return len(self._subs)
+
+    def subscribe(self, stream_id: Optional[int], area_id: Optional[int]) -> Subscription:
+        sub = Subscription(asyncio.get_running_loop(), stream_id, area_id)
+        with self._lock:
+            self._subs.add(sub)
+        self.start()
+        return sub
+
+    def unsubscribe(self, sub: Subscription):
+        with self._lock:
+            self._subs.discard(sub)
+
+    def start(self):
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="notify-hub", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=2.0)
+
+    def _dispatch(self, payload: str):
+        try:
+            messages = json.loads(payload)
+        except ValueError:
+            return
+        if isinstance(messages, dict):
+            messages = [messages]
+        with self._lock:
+            subs = list(self._subs)
+        for sub in subs:
+            for msg in messages:
+                if sub.wants(msg):
+                    sub.loop.call_soon_threadsafe(sub.push, msg)
+
+    def _run(self):
+        while not self._stop.is_set():
+            conn = None
+            try:
+                conn = get_conn()
+                conn.autocommit = True
+                cur = conn.cursor()
+                cur.execute(f"LISTEN {self.channel}")
+                cur.close()
+                while not self._stop.is_set():
+                    if select.select([conn], [], [], 1.0) == ([], [], []):
+                        continue
+                    conn.poll()
+                    while conn.notifies:
+                        self._dispatch(conn.notifies.pop(0).payload)
+            except Exception as e:
+                print(f"[notify-hub] listener error: {e}")
+                time.sleep(2.0)
+            finally:
+                try:
+                    if conn:
+                        conn.close()
+                except Exception:
+                    pass
+
+
+hub = NotifyHub()
+registry.gauge_fn("pc_sse_subscribers", "Client SSE /api/stats/stream yang terhubung", lambda: hub.subscriber_count)
+
+
+async def sse_events(request: Request, sub: Subscription):
+    try:
+        yield "retry: 3000\n\n"
+        while True:
+            if await request.is_disconnected():
+                break
+            try:
+                msg = await asyncio.wait_for(sub.queue.get(), timeout=HEARTBEAT_S)
+            except asyncio.TimeoutError:
+                yield ": ping\n\n"
+                continue
+            yield f"event: {msg.get('type', 'message')}\ndata: {json.dumps(msg)}\n\n"
+    finally:
+        hub.unsubscribe(sub)
+
+
+@router.get("/stream")
+async def stream_stats(
+    request: Request,
+    stream_id: Optional[int] = Query(default=None),
+    area_id: Optional[int] = Query(default=None),
+):
+    """Server-sent events: `live` (current_inside berubah) dan `event` (ENTER/EXIT) secara push."""
+    sub = hub.subscribe(stream_id, area_id)
+    headers = {
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no",
+    }
+    return StreamingResponse(sse_events(request, sub), media_type="text/event-stream", headers=headers)
@@ -0,0 +1,62 @@
+from fastapi import APIRouter
+from fastapi.responses import Response
+import glob, os, time
+
+from workers.metrics import (
+    CONTENT_TYPE, SNAPSHOT_FILENAME, MetricsRegistry, merge_families, read_snapshot, render,
+)
+
+router = APIRouter()
+
+# folder output worker (volume bersama); snapshot: <dir>/metrics.json (multi) dan <dir>/<stream>/metrics.json
+METRICS_DIR = os.getenv("METRICS_DIR", "samples/output")
+SNAPSHOT_MAX_AGE_S = 30.0       # snapshot lebih tua = worker dianggap mati, tidak dilaporkan
+
+# metrics milik proses API (MJPEG, SSE, latency HTTP)
+registry = MetricsRegistry()
+
+
+class LatencyMiddleware:
+    """
+    ASGI middleware: histogram latency per route sampai header respons dikirim
+    (time-to-first-byte; untuk MJPEG/SSE bukan lama koneksi). Label route =
+    template path, bukan URL mentah, supaya kardinalitas tetap kecil.
+    """
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        t0 = time.perf_counter()
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                route = getattr(scope.get("route"), "path", "unmatched")
+                registry.histogram("pc_http_request_seconds", "Latency request API sampai header respons (detik)",
+                                   route=route, method=scope["method"],
+                                   status=message["status"]).observe(time.perf_counter() - t0)
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
+
+
+def worker_snapshots():
+    paths = glob.glob(os.path.join(METRICS_DIR, SNAPSHOT_FILENAME))
+    paths += glob.glob(os.path.join(METRICS_DIR, "*", SNAPSHOT_FILENAME))
+    snapshots = []
+    for path in sorted(paths):
+        families = read_snapshot(path, SNAPSHOT_MAX_AGE_S)
+        if families:
+            snapshots.append(families)
+    return snapshots
+
+
+@router.get("/metrics")
+def metrics():
+    """Metrics format Prometheus: API + gabungan snapshot semua worker yang masih hidup."""
+    snapshots = worker_snapshots()
+    registry.gauge("pc_worker_snapshots", "Jumlah snapshot worker yang masih segar").set(len(snapshots))
+    body = render(merge_families(registry.collect(), *snapshots))
+    return Response(body, media_type=CONTENT_TYPE)
@@ -1,48 +1,238 @@
-from fastapi import APIRouter, Query
+from fastapi import APIRouter, Query, Request
 from fastapi.responses import StreamingResponse
-import time, os
+import asyncio, time, os
+
+from workers.frame_ring import RING_FILENAME, FrameRingReader
+from backend.api.routes_metrics import registry
 
 router = APIRouter(prefix="/api/stream")
 
 BOUNDARY = "frame"
+POLL_INTERVAL_S = 0.02      # cek frame baru per stream, bukan per client
+RING_RETRY_S = 2.0          # selang cek ulang apakah worker sudah membuat latest.ring
 
-# mapping stream_id -> folder output worker
+# mapping stream_id -> folder output worker (slug nama stream)
+OUTPUT_ROOT = "samples/output"
 STREAM_OUTPUTS = {
     1: "samples/output/malioboro-10-kepatihan/latest.jpg",  # Malioboro_10_Kepatihan
-    # 3: "samples/output/nolkm-utara/latest.jpg",             # NolKm_Utara
+    3: "samples/output/nolkm-utara/latest.jpg",              # NolKm_Utara
 }
 
-def mjpeg_generator(latest_path: str, target_fps: float = 8.0):
-    delay = 1.0 / max(target_fps, 0.1)
-    while True:
+
+def multipart_chunk(jpg: bytes) -> bytes:
+    return (
+        b"--" + BOUNDARY.encode() + b"\r\n"
+        b"Content-Type: image/jpeg\r\n"
+        b"Content-Length: " + str(len(jpg)).encode() + b"\r\n\r\n"
+    ) + jpg + b"\r\n"
+
+
+class FrameBroadcaster:
+    """
+    Satu reader per stream: satu task asyncio memantau frame baru, membaca
+    data hanya kalau ada frame baru, lalu menyimpan chunk multipart-nya di
+    memori untuk semua viewer.
+
+    Sumber frame: ring buffer mmap `latest.ring` dari worker (cek seq langsung
+    dari memori, tanpa syscall); kalau tidak ada / retired, fallback ke
+    `latest.jpg` (cek mtime/inode/size).
+
+    Selama ada viewer, broadcaster menulis heartbeat jumlah viewer ke ring;
+    worker dengan `--render on-demand` berhenti render/encode kalau heartbeat
+    berhenti (tidak ada yang menonton).
+
+    Viewer tidak pernah antre: setiap viewer menunggu `seq` berikutnya dan
+    selalu mengambil frame TERBARU, jadi client lambat otomatis skip frame.
+    Task reader berhenti sendiri saat viewer terakhir keluar.
+    """
+    def __init__(self, latest_path: str):
+        self.latest_path = latest_path
+        self.ring_path = os.path.join(os.path.dirname(latest_path), RING_FILENAME)
+        self.seq = 0                # naik setiap ada frame baru
+        self.chunk = None           # frame terbaru, sudah dalam format multipart
+        self.viewers = 0
+        self.reads = 0              # jumlah baca file (statistik)
+        self._stat_key = None
+        self._ring = None
+        self._ring_seq = 0
+        self._ring_retry_at = 0.0
+        self._new_frame = asyncio.Event()
+        self._task = None
+
+        # metrics per stream (label = nama folder output, sama dengan label worker)
+        label = os.path.basename(os.path.dirname(latest_path))
+        registry.gauge_fn("pc_mjpeg_viewers", "Viewer MJPEG yang terhubung", lambda: self.viewers, stream=label)
+        self.frames_sent = registry.counter("pc_mjpeg_frames_sent_total", "Frame MJPEG terkirim ke viewer",
+                                            stream=label)
+        self.bytes_sent = registry.counter("pc_mjpeg_bytes_sent_total", "Byte MJPEG terkirim ke viewer",
+                                           stream=label)
+        registry.counter_fn("pc_mjpeg_torn_frames_total", "Frame ring yang dibuang karena sobek",
+                            lambda: self._ring.torn if self._ring is not None else 0, stream=label)
+
+    def _current_ring(self):
+        """Ring yang sedang terbuka dan belum retired (tanpa I/O file)."""
+        ring = self._ring
+        if ring is not None and ring.retired:
+            ring.close()
+            self._ring, self._ring_seq = None, 0
+            ring = None
+        return ring
+
+    def _try_open_ring(self):
+        """Buka latest.ring (I/O file, jalan di thread). None kalau belum ada / retired."""
+        try:
+            ring = FrameRingReader(self.ring_path, writable=True)
+        except (OSError, ValueError):
+            return None
+        if ring.retired:
+            ring.close()
+            return None
+        return ring
+
+    def _read_file_if_changed(self):
+        """Fallback latest.jpg (stat + read, jalan di thread)."""
+        try:
+            st = os.stat(self.latest_path)
+        except FileNotFoundError:
+            return None
+        key = (st.st_mtime_ns, st.st_ino, st.st_size)
+        if key == self._stat_key:
+            return None
         try:
-            with open(latest_path, "rb") as f:
+            with open(self.latest_path, "rb") as f:
                 jpg = f.read()
         except FileNotFoundError:
-            time.sleep(0.05)
-            continue
+            return None
+        self.reads += 1
+        if not jpg:
+            return None
+        self._stat_key = key
+        return jpg
+
+    async def _next_frame(self):
+        # I/O file (buka ring, stat/baca latest.jpg) jalan di thread supaya
+        # storage lambat / network tidak mem-block event loop semua client;
+        # ring yang sudah terbuka dibaca langsung dari mmap.
+        ring = self._current_ring()
+        if ring is None:
+            now = time.monotonic()
+            if now >= self._ring_retry_at:
+                self._ring_retry_at = now + RING_RETRY_S
+                ring = await asyncio.to_thread(self._try_open_ring)
+                if ring is not None:
+                    if self.viewers == 0:   # semua viewer keluar selama open
+                        ring.close()
+                        return None
+                    self._ring, self._ring_seq = ring, 0
+        if ring is None:
+            return await asyncio.to_thread(self._read_file_if_changed)
+        ring.mark_viewers(self.viewers)     # heartbeat -> worker tetap render
+        got = ring.read(self._ring_seq)
+        if got is None:
+            return None
+        self._ring_seq, jpg = got
+        return jpg
+
+    def _publish(self, jpg: bytes):
+        self.chunk = multipart_chunk(jpg)
+        self.seq += 1
+        event, self._new_frame = self._new_frame, asyncio.Event()
+        event.set()
+
+    async def _run(self):
+        try:
+            while self.viewers > 0:
+                jpg = await self._next_frame()
+                if jpg is not None:
+                    self._publish(jpg)
+                await asyncio.sleep(POLL_INTERVAL_S)
+        finally:
+            self._task = None
+
+    def subscribe(self):
+        self.viewers += 1
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def unsubscribe(self):
+        self.viewers = max(self.viewers - 1, 0)
+        if self.viewers == 0 and self._ring is not None:
+            try:
+                self._ring.mark_viewers(0)
+            except ValueError:  # mapping sudah ditutup
+                pass
+
+    async def wait_frame(self, last_seq: int, timeout: float):
+        """Tunggu frame dengan seq > last_seq. Return (seq, chunk) atau None kalau timeout."""
+        if self.seq <= last_seq:
+            try:
+                await asyncio.wait_for(self._new_frame.wait(), timeout)
+            except asyncio.TimeoutError:
+                return None
+        return self.seq, self.chunk
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+        if self._ring is not None:
+            self._ring.close()
+            self._ring = None
+
+
+broadcasters = {}   # latest_path -> FrameBroadcaster
+
+
+def get_broadcaster(latest_path: str) -> FrameBroadcaster:
+    bc = broadcasters.get(latest_path)
+    if bc is None:
+        bc = broadcasters[latest_path] = FrameBroadcaster(latest_path)
+    return bc
+
+
+def stop_broadcasters():
+    for bc in broadcasters.values():
+        bc.stop()
+
+
+async def mjpeg_generator(request: Request, latest_path: str, target_fps: float = 8.0):
+    delay = 1.0 / max(target_fps, 0.1)
+    bc = get_broadcaster(latest_path)
+    bc.subscribe()
+    last_seq = 0
+    try:
+        while True:
+            if await request.is_disconnected():
+                break
+            t0 = time.monotonic()
+            got = await bc.wait_frame(last_seq, timeout=1.0)
+            if got is None:
+                continue
+            last_seq, chunk = got
+            yield chunk
+            bc.frames_sent.inc()
+            bc.bytes_sent.inc(len(chunk))
 
-        yield (
-            b"--" + BOUNDARY.encode() + b"\r\n"
-            b"Content-Type: image/jpeg\r\n"
-            b"Content-Length: " + str(len(jpg)).encode() + b"\r\n\r\n"
-        ) + jpg + b"\r\n"
+            # batasi fps per client; frame yang lewat selama jeda di-skip
+            wait = delay - (time.monotonic() - t0)
+            if wait > 0:
+                await asyncio.sleep(wait)
+    finally:
+        bc.unsubscribe()
 
-        time.sleep(delay)
 
 @router.get("/mjpeg")
-def stream_mjpeg(stream_id: int = Query(..., description="ID stream video")):
+async def stream_mjpeg(request: Request, stream_id: int = Query(..., description="ID stream video")):
     latest_path = STREAM_OUTPUTS.get(stream_id)
     if not latest_path:
-        # fallback: kalau stream_id tidak dikenali
-        latest_path = "samples/output/default/latest.jpg"
+        # stream tanpa mapping: worker multi-stream menulis ke stream-<id>/ kalau nama stream tidak diketahui
+        latest_path = os.path.join(OUTPUT_ROOT, f"stream-{stream_id}", "latest.jpg")
 
     headers = {
         "Cache-Control": "no-store, no-cache, must-revalidate, max-age=0",
         "Pragma": "no-cache",
     }
     return StreamingResponse(
-        mjpeg_generator(latest_path, target_fps=8.0),
+        mjpeg_generator(request, latest_path, target_fps=8.0),
         media_type=f"multipart/x-mixed-replace; boundary={BOUNDARY}",
         headers=headers,
-    )
\ No newline at end of file
+    )
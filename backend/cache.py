@@ -0,0 +1,147 @@
+import asyncio, hashlib, json, threading, time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Hashable, Optional
+
+from fastapi.encoders import jsonable_encoder
+
+
+class CachedResponse:
+    __slots__ = ("body", "etag", "headers", "expires_at")
+
+    def __init__(self, body: bytes, etag: str, headers: Optional[dict], expires_at: float):
+        self.body = body
+        self.etag = etag
+        self.headers = headers or {}
+        self.expires_at = expires_at
+
+
+def encode_json(payload) -> bytes:
+    # same bytes FastAPI's JSONResponse would produce for this payload
+    return json.dumps(jsonable_encoder(payload), ensure_ascii=False, allow_nan=False,
+                      separators=(",", ":")).encode("utf-8")
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match check (comma separated list, weak validators, or *)."""
+    if not if_none_match:
+        return False
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag == "*" or tag.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+class ResponseCache:
+    """
+    Small in-process cache of serialized JSON responses for the polling endpoints.
+
+    - Entries live `ttl` seconds; at most `max_entries` are kept (LRU eviction).
+    - Single-flight: concurrent misses for the same key share one load (one
+      SQL query), the others await its result. Cancelling any caller,
+      including the one that started the load, doesn't affect the others.
+    - Each entry carries a strong ETag (hash of the body) so unchanged
+      responses can be answered with 304.
+    - `invalidate()` drops everything; a load that started before the
+      invalidation is returned to its callers but not stored.
+
+    `ttl <= 0` disables storing (single-flight and ETags still apply).
+    """
+    def __init__(self, ttl: float = 2.0, max_entries: int = 256):
+        self.ttl = ttl
+        self.max_entries = max(1, max_entries)
+        self._entries = OrderedDict()       # key -> CachedResponse
+        self._inflight = {}                 # key -> asyncio.Task running the load (event loop only)
+        self._lock = threading.Lock()       # invalidate() is also called from sync endpoints (threadpool)
+        self.generation = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+        self.not_modified = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def hit_ratio(self) -> float:
+        served = self.hits + self.coalesced
+        total = served + self.misses
+        return served / total if total else 0.0
+
+    def _lookup(self, key, now: float) -> Optional[CachedResponse]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry.expires_at <= now:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def _store(self, key, entry: CachedResponse, generation: int):
+        with self._lock:
+            if generation != self.generation:
+                return
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    async def get(self, key: Hashable, load: Callable[[], Awaitable]) -> CachedResponse:
+        """
+        Cached response for `key`. On a miss `await load()` runs once for all
+        waiters and returns (JSON-able payload, extra response headers or None).
+
+        The load runs in its own task, not in the request that started it: a
+        cancelled caller (e.g. client disconnect) does not cancel the load for
+        the other waiters.
+        """
+        entry = self._lookup(key, time.monotonic())
+        if entry is not None:
+            self.hits += 1
+            return entry
+
+        task = self._inflight.get(key)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            self.misses += 1
+            task = asyncio.get_running_loop().create_task(self._load(key, load, self.generation))
+            # don't warn "exception never retrieved" when every waiter went away
+            task.add_done_callback(lambda t: t.cancelled() or t.exception())
+            self._inflight[key] = task
+        return await asyncio.shield(task)
+
+    async def _load(self, key, load, generation: int) -> CachedResponse:
+        try:
+            payload, headers = await load()
+            body = encode_json(payload)
+            entry = CachedResponse(body, '"' + hashlib.sha1(body).hexdigest()[:20] + '"', headers,
+                                   time.monotonic() + self.ttl)
+            if self.ttl > 0:
+                self._store(key, entry, generation)
+            return entry
+        finally:
+            self._inflight.pop(key, None)
+
+    def invalidate(self):
+        with self._lock:
+            self.generation += 1
+            self._entries.clear()
+
+
+def instrument_cache(registry, cache: ResponseCache):
+    """Hit ratio & size of the response cache on the API metrics registry."""
+    for result, attr in (("hit", "hits"), ("miss", "misses"), ("coalesced", "coalesced")):
+        registry.counter_fn("pc_api_cache_requests_total", "Cached endpoint lookups by result",
+                            lambda attr=attr: getattr(cache, attr), result=result)
+    registry.gauge_fn("pc_api_cache_hit_ratio", "Share of lookups served without a DB query",
+                      lambda: cache.hit_ratio)
+    registry.gauge_fn("pc_api_cache_entries", "Entries in the response cache", lambda: len(cache))
+    registry.counter_fn("pc_api_cache_evictions_total", "LRU evictions", lambda: cache.evictions)
+    registry.counter_fn("pc_api_cache_not_modified_total", "Responses answered 304 via If-None-Match",
+                        lambda: cache.not_modified)
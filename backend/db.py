@@ -0,0 +1,341 @@
+import asyncio, os, threading, time
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from typing import Optional
+
+import asyncpg
+import psycopg2
+
+
+def _env(key: str, default: Optional[str] = None) -> Optional[str]:
+    """Allow DB_* or POSTGRES_* variable names (same behavior as worker)."""
+    return os.getenv(key) or os.getenv(key.replace("DB_", "POSTGRES_")) or default
+
+
+def get_conn(**kwargs):
+    """One dedicated connection (e.g. the LISTEN connection). Request handlers use the pool."""
+    return psycopg2.connect(
+        host=_env("DB_HOST", "localhost"),
+        port=_env("DB_PORT", "5432"),
+        dbname=_env("DB_NAME", "people_counting"),
+        user=_env("DB_USER", "postgres"),
+        password=_env("DB_PASSWORD", ""),
+        **kwargs,
+    )
+
+
+class PoolTimeout(Exception):
+    """No connection became free within the pool timeout (pool saturated)."""
+
+
+class ConnectionPool:
+    """
+    Blocking, bounded pool of psycopg2 connections shared by all request threads.
+
+    - At most `max_size` connections exist; `min_size` are opened up front.
+    - `connection()` waits up to `timeout` seconds for a free slot, then raises
+      PoolTimeout (mapped to 503 by the API) instead of queueing forever.
+    - Idle connections are health-checked (`SELECT 1`) on borrow when they have
+      been idle longer than `check_idle_s`; broken ones are replaced silently.
+    - Connections are returned rolled back, so a borrower never sees another
+      request's open transaction.
+    """
+    def __init__(self, min_size: int = 1, max_size: int = 10, timeout: float = 5.0,
+                 check_idle_s: float = 30.0, connect_timeout: int = 5, statement_timeout_ms: int = 0):
+        self.min_size = max(0, min_size)
+        self.max_size = max(1, max_size, self.min_size)
+        self.timeout = timeout
+        self.check_idle_s = check_idle_s
+        self._connect_kwargs = {"connect_timeout": connect_timeout}
+        if statement_timeout_ms > 0:
+            self._connect_kwargs["options"] = f"-c statement_timeout={int(statement_timeout_ms)}"
+        self._idle = deque()            # (conn, returned_at)
+        self._cond = threading.Condition()
+        self._size = 0                  # open + being opened
+        self._closed = False
+
+        # stats (read by the metrics callbacks)
+        self.waiting = 0
+        self.acquired = 0
+        self.timeouts = 0
+        self.discarded = 0
+        self.wait_seconds = None        # Histogram set by instrument_pool
+
+        for _ in range(self.min_size):
+            try:
+                conn = self._connect()
+            except psycopg2.OperationalError as e:
+                # DB not up yet: start anyway, connections are opened on first borrow
+                print(f"[db-pool] warm-up connect failed: {e}")
+                break
+            with self._cond:
+                self._size += 1
+                self._idle.append((conn, time.monotonic()))
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            min_size=int(_env("DB_POOL_MIN", "1")),
+            max_size=int(_env("DB_POOL_MAX", "10")),
+            timeout=float(_env("DB_POOL_TIMEOUT", "5")),
+            check_idle_s=float(_env("DB_POOL_CHECK_IDLE", "30")),
+            connect_timeout=int(_env("DB_CONNECT_TIMEOUT", "5")),
+            statement_timeout_ms=int(_env("DB_STATEMENT_TIMEOUT_MS", "10000")),
+        )
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    @property
+    def in_use(self) -> int:
+        return self._size - len(self._idle)
+
+    def _connect(self):
+        return get_conn(**self._connect_kwargs)
+
+    def _healthy(self, conn, idle_s: float) -> bool:
+        if conn.closed:
+            return False
+        if idle_s < self.check_idle_s:
+            return True
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def _discard(self, conn):
+        self.discarded += 1
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def getconn(self):
+        t0 = time.monotonic()
+        deadline = t0 + self.timeout
+        with self._cond:
+            self.waiting += 1
+            try:
+                while not self._idle and self._size >= self.max_size and not self._closed:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.timeouts += 1
+                        raise PoolTimeout(f"no database connection free within {self.timeout:.1f}s "
+                                          f"(pool max {self.max_size})")
+                    self._cond.wait(remaining)
+            finally:
+                self.waiting -= 1
+            if self._closed:
+                raise PoolTimeout("connection pool is closed")
+            item = self._idle.pop() if self._idle else None
+            if item is None:
+                self._size += 1         # reserve the slot; connect outside the lock
+        try:
+            if item is not None:
+                conn, returned_at = item
+                if not self._healthy(conn, time.monotonic() - returned_at):
+                    self._discard(conn)
+                    conn = self._connect()
+            else:
+                conn = self._connect()
+        except Exception:
+            with self._cond:
+                self._size -= 1
+                self._cond.notify()
+            raise
+        self.acquired += 1
+        if self.wait_seconds is not None:
+            self.wait_seconds.observe(time.monotonic() - t0)
+        return conn
+
+    def putconn(self, conn, broken: bool = False):
+        if not broken and not conn.closed:
+            try:
+                conn.rollback()
+            except psycopg2.Error:
+                broken = True
+        with self._cond:
+            if broken or conn.closed or self._closed:
+                self._size -= 1
+                self._discard(conn)
+            else:
+                self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self):
+        conn = self.getconn()
+        broken = False
+        try:
+            yield conn
+        except psycopg2.OperationalError:
+            broken = True       # server gone / connection reset: don't hand it out again
+            raise
+        finally:
+            self.putconn(conn, broken)
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            while self._idle:
+                conn, _ = self._idle.popleft()
+                self._size -= 1
+                try:
+                    conn.close()
+                except Exception:
+                    pass
+            self._cond.notify_all()
+
+
+_pool: Optional[ConnectionPool] = None
+_pool_lock = threading.Lock()
+
+
+def open_pool() -> ConnectionPool:
+    """Create the app-wide pool (called from the FastAPI lifespan)."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ConnectionPool.from_env()
+        return _pool
+
+
+def close_pool():
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.close()
+
+
+def get_pool() -> ConnectionPool:
+    # lazily created so scripts / tests that skip the lifespan still work
+    return _pool or open_pool()
+
+
+class AsyncConnectionPool:
+    """
+    asyncpg pool for the `async def` read endpoints: queries never occupy a
+    threadpool thread, so dashboard polling and MJPEG/SSE streams don't
+    compete for the same workers. Same settings, semantics (borrow timeout ->
+    PoolTimeout) and stats as ConnectionPool.
+
+    asyncpg resets connections on release and drops ones idle longer than
+    `check_idle_s`; a connection that died in between surfaces as an error on
+    that query only (asyncpg discards it).
+    """
+    def __init__(self, pool, max_size: int, timeout: float):
+        self._pool = pool
+        self.max_size = max_size
+        self.timeout = timeout
+        self.waiting = 0
+        self.acquired = 0
+        self.timeouts = 0
+        self.discarded = 0
+        self.wait_seconds = None
+
+    @classmethod
+    async def from_env(cls):
+        min_size = max(0, int(_env("DB_POOL_MIN", "1")))
+        max_size = max(1, int(_env("DB_POOL_MAX", "10")), min_size)
+        statement_timeout_ms = int(_env("DB_STATEMENT_TIMEOUT_MS", "10000"))
+        settings = {"statement_timeout": str(statement_timeout_ms)} if statement_timeout_ms > 0 else None
+        kwargs = dict(
+            host=_env("DB_HOST", "localhost"),
+            port=int(_env("DB_PORT", "5432")),
+            database=_env("DB_NAME", "people_counting"),
+            user=_env("DB_USER", "postgres"),
+            password=_env("DB_PASSWORD", "") or None,
+            min_size=min_size, max_size=max_size,
+            timeout=float(_env("DB_CONNECT_TIMEOUT", "5")),
+            max_inactive_connection_lifetime=float(_env("DB_POOL_CHECK_IDLE", "30")),
+            server_settings=settings,
+        )
+        try:
+            pool = await asyncpg.create_pool(**kwargs)
+        except (OSError, asyncpg.PostgresError) as e:
+            # DB not up yet: open lazily (no warm connections)
+            print(f"[db-pool] async warm-up connect failed: {e}")
+            pool = await asyncpg.create_pool(**{**kwargs, "min_size": 0})
+        return cls(pool, max_size, float(_env("DB_POOL_TIMEOUT", "5")))
+
+    @property
+    def size(self) -> int:
+        return self._pool.get_size()
+
+    @property
+    def in_use(self) -> int:
+        return self._pool.get_size() - self._pool.get_idle_size()
+
+    @asynccontextmanager
+    async def connection(self):
+        t0 = time.monotonic()
+        self.waiting += 1
+        try:
+            conn = await self._pool.acquire(timeout=self.timeout)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            raise PoolTimeout(f"no database connection free within {self.timeout:.1f}s "
+                              f"(pool max {self.max_size})") from None
+        finally:
+            self.waiting -= 1
+        self.acquired += 1
+        if self.wait_seconds is not None:
+            self.wait_seconds.observe(time.monotonic() - t0)
+        try:
+            yield conn
+        except (OSError, asyncpg.exceptions.ConnectionDoesNotExistError):
+            self.discarded += 1
+            raise
+        finally:
+            await self._pool.release(conn)
+
+    async def fetch(self, sql: str, *params):
+        """Rows as dicts (column name -> value), same shape as the psycopg2 endpoints returned."""
+        async with self.connection() as conn:
+            return [dict(r) for r in await conn.fetch(sql, *params)]
+
+    async def close(self):
+        await self._pool.close()
+
+
+_async_pool: Optional[AsyncConnectionPool] = None
+_async_pool_lock = asyncio.Lock()
+
+
+async def open_async_pool() -> AsyncConnectionPool:
+    global _async_pool
+    async with _async_pool_lock:
+        if _async_pool is None:
+            _async_pool = await AsyncConnectionPool.from_env()
+        return _async_pool
+
+
+async def close_async_pool():
+    global _async_pool
+    pool, _async_pool = _async_pool, None
+    if pool is not None:
+        await pool.close()
+
+
+async def get_async_pool() -> AsyncConnectionPool:
+    return _async_pool or await open_async_pool()
+
+
+def instrument_pool(registry, pool, **labels):
+    """Pool saturation & borrow wait time on the API metrics registry."""
+    pool.wait_seconds = registry.histogram("pc_db_pool_wait_seconds", "Time waiting to borrow a DB connection (s)",
+                                           **labels)
+    registry.gauge_fn("pc_db_pool_size", "Open DB connections in the pool", lambda: pool.size, **labels)
+    registry.gauge_fn("pc_db_pool_in_use", "DB connections borrowed by requests", lambda: pool.in_use, **labels)
+    registry.gauge_fn("pc_db_pool_max", "Configured pool max size", lambda: pool.max_size, **labels)
+    registry.gauge_fn("pc_db_pool_waiting", "Requests waiting for a DB connection", lambda: pool.waiting, **labels)
+    registry.counter_fn("pc_db_pool_acquired_total", "DB connections borrowed", lambda: pool.acquired, **labels)
+    registry.counter_fn("pc_db_pool_timeouts_total", "Borrows that timed out (pool saturated)",
+                        lambda: pool.timeouts, **labels)
+    registry.counter_fn("pc_db_pool_discarded_total", "Broken / unhealthy connections dropped",
+                        lambda: pool.discarded, **labels)
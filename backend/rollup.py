@@ -0,0 +1,224 @@
+"""
+Hourly / daily rollups of area_counts (one row per minute per area).
+
+area_counts rows are upserted in place by the workers, so the refresh is
+driven by `area_counts.updated_at` (set by trigger): every run recomputes the
+hours that contain rows changed since the last watermark (minus an overlap
+that covers writer transactions still in flight when the previous run read),
+then the days that contain those hours. Buckets are recomputed from their
+source rows (not incremented), so reprocessing is idempotent.
+
+Hour buckets are UTC hours; day/week buckets follow ROLLUP_TZ (default: TZ,
+then UTC). When ROLLUP_TZ changes the daily table is rebuilt automatically.
+
+The API runs the refresh as a background task (ROLLUP_INTERVAL_S); it can
+also be run by hand, e.g. for the initial backfill:
+
+    python -m backend.rollup            # one refresh
+    python -m backend.rollup --rebuild  # drop rollups and recompute everything
+"""
+import argparse, asyncio, os, time
+from datetime import timedelta
+from typing import Optional
+
+ROLLUP_NAME = "area_counts"
+LOCK_KEY = 0x70635F72           # pg advisory lock: one refresher at a time across API processes
+
+# bucket -> (table, time column, date_trunc unit)
+ROLLUP_SOURCES = {
+    "minute": ("area_counts", "window_start", "minute"),
+    "hour": ("area_counts_hourly", "bucket_start", "hour"),
+    "day": ("area_counts_daily", "bucket_start", "day"),
+    "week": ("area_counts_daily", "bucket_start", "week"),
+}
+# default range when `since` is not given
+DEFAULT_SPAN = {
+    "minute": timedelta(days=1),
+    "hour": timedelta(days=7),
+    "day": timedelta(days=90),
+    "week": timedelta(days=365),
+}
+
+# each touched bucket is re-summed by its own index range scan (LATERAL), not one big range join
+HOURLY_SQL = """
+WITH touched AS (
+    SELECT DISTINCT stream_id, area_id, date_trunc('hour', window_start, 'UTC') AS bucket_start
+    FROM area_counts
+    {where}
+)
+INSERT INTO area_counts_hourly AS h (stream_id, area_id, bucket_start, enters, exits)
+SELECT t.stream_id, t.area_id, t.bucket_start, s.enters, s.exits
+FROM touched t
+CROSS JOIN LATERAL (
+    SELECT SUM(c.enters) AS enters, SUM(c.exits) AS exits
+    FROM area_counts c
+    WHERE c.stream_id = t.stream_id AND c.area_id = t.area_id
+      AND c.window_start >= t.bucket_start AND c.window_start < t.bucket_start + interval '1 hour'
+) s
+ON CONFLICT (stream_id, area_id, bucket_start) DO UPDATE
+SET enters = EXCLUDED.enters, exits = EXCLUDED.exits, updated_at = now()
+WHERE (h.enters, h.exits) IS DISTINCT FROM (EXCLUDED.enters, EXCLUDED.exits)
+"""
+
+# days containing hourly rows written by THIS transaction (updated_at = now()), or all on rebuild.
+# date_add(.., $1) steps one local day, so DST days get their 23/25 hours.
+DAILY_SQL = """
+WITH touched AS (
+    SELECT DISTINCT stream_id, area_id, date_trunc('day', bucket_start, $1) AS bucket_start
+    FROM area_counts_hourly
+    {where}
+)
+INSERT INTO area_counts_daily AS d (stream_id, area_id, bucket_start, enters, exits)
+SELECT t.stream_id, t.area_id, t.bucket_start, s.enters, s.exits
+FROM touched t
+CROSS JOIN LATERAL (
+    SELECT SUM(h.enters) AS enters, SUM(h.exits) AS exits
+    FROM area_counts_hourly h
+    WHERE h.stream_id = t.stream_id AND h.area_id = t.area_id
+      AND h.bucket_start >= t.bucket_start AND h.bucket_start < date_add(t.bucket_start, interval '1 day', $1)
+) s
+ON CONFLICT (stream_id, area_id, bucket_start) DO UPDATE
+SET enters = EXCLUDED.enters, exits = EXCLUDED.exits, updated_at = now()
+WHERE (d.enters, d.exits) IS DISTINCT FROM (EXCLUDED.enters, EXCLUDED.exits)
+"""
+
+
+def rollup_tz() -> str:
+    return os.getenv("ROLLUP_TZ") or os.getenv("TZ") or "UTC"
+
+
+def _rowcount(status: str) -> int:
+    # asyncpg command status, e.g. "INSERT 0 42"
+    return int(status.rsplit(" ", 1)[-1])
+
+
+async def refresh_rollups(conn, tz: str, overlap_s: float = 300.0, rebuild: bool = False) -> Optional[dict]:
+    """
+    One incremental refresh in a single transaction. Returns row counts, or
+    None when another process holds the refresh lock.
+    """
+    async with conn.transaction():
+        if not await conn.fetchval("SELECT pg_try_advisory_xact_lock($1)", LOCK_KEY):
+            return None
+        await conn.execute("SET LOCAL statement_timeout = 0")     # backfill may take longer than API queries
+        state = await conn.fetchrow("SELECT watermark, tz FROM rollup_state WHERE name = $1", ROLLUP_NAME)
+        if rebuild:
+            await conn.execute("DELETE FROM area_counts_hourly")
+        if rebuild or state is None or state["tz"] != tz:
+            await conn.execute("DELETE FROM area_counts_daily")
+            all_days = True
+        else:
+            all_days = False
+        since = None if rebuild or state is None else state["watermark"] - timedelta(seconds=overlap_s)
+
+        # separate statements (not `$1 IS NULL OR ...`) so the incremental one keeps its index plan
+        if since is None:
+            hourly = _rowcount(await conn.execute(HOURLY_SQL.format(where="")))
+        else:
+            hourly = _rowcount(await conn.execute(HOURLY_SQL.format(where="WHERE updated_at >= $1"), since))
+        daily_where = "" if all_days else "WHERE updated_at >= now()"
+        daily = _rowcount(await conn.execute(DAILY_SQL.format(where=daily_where), tz))
+        await conn.execute(
+            """
+            INSERT INTO rollup_state (name, watermark, tz) VALUES ($1, now(), $2)
+            ON CONFLICT (name) DO UPDATE SET watermark = EXCLUDED.watermark, tz = EXCLUDED.tz, updated_at = now()
+            """,
+            ROLLUP_NAME, tz,
+        )
+    return {"hourly": hourly, "daily": daily, "full": since is None}
+
+
+class RollupJob:
+    """Periodic refresh as an asyncio task inside the API process."""
+    def __init__(self, get_pool, interval: float = 60.0, overlap_s: float = 300.0, tz: Optional[str] = None):
+        self.get_pool = get_pool            # async () -> AsyncConnectionPool
+        self.interval = interval
+        self.overlap_s = overlap_s
+        self.tz = tz or rollup_tz()
+        self._task = None
+
+        self.last_success = None            # time.time() of the last completed refresh
+        self.hourly_rows = 0
+        self.daily_rows = 0
+        self.failures = 0
+        self.refresh_seconds = None         # Histogram set by instrument_rollup
+
+    @classmethod
+    def from_env(cls, get_pool):
+        return cls(get_pool, interval=float(os.getenv("ROLLUP_INTERVAL_S", "60")),
+                   overlap_s=float(os.getenv("ROLLUP_OVERLAP_S", "300")))
+
+    async def refresh_once(self):
+        t0 = time.perf_counter()
+        pool = await self.get_pool()
+        async with pool.connection() as conn:
+            result = await refresh_rollups(conn, self.tz, self.overlap_s)
+        if result is None:
+            return None                     # another API process is refreshing
+        self.last_success = time.time()
+        self.hourly_rows += result["hourly"]
+        self.daily_rows += result["daily"]
+        if self.refresh_seconds is not None:
+            self.refresh_seconds.observe(time.perf_counter() - t0)
+        return result
+
+    async def _run(self):
+        while True:
+            try:
+                await self.refresh_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.failures += 1
+                print(f"[rollup] refresh failed: {e}")
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        if self.interval > 0 and self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+def instrument_rollup(registry, job: RollupJob):
+    job.refresh_seconds = registry.histogram("pc_rollup_refresh_seconds", "Duration of one rollup refresh (s)")
+    registry.gauge_fn("pc_rollup_age_seconds", "Seconds since the last successful rollup refresh",
+                      lambda: time.time() - job.last_success if job.last_success else float("nan"))
+    registry.counter_fn("pc_rollup_rows_total", "Rollup rows (re)computed", lambda: job.hourly_rows, table="hourly")
+    registry.counter_fn("pc_rollup_rows_total", "Rollup rows (re)computed", lambda: job.daily_rows, table="daily")
+    registry.counter_fn("pc_rollup_failures_total", "Failed rollup refreshes", lambda: job.failures)
+
+
+async def _main(args):
+    from backend.db import AsyncConnectionPool
+    pool = await AsyncConnectionPool.from_env()
+    try:
+        t0 = time.perf_counter()
+        async with pool.connection() as conn:
+            result = await refresh_rollups(conn, rollup_tz(), args.overlap, rebuild=args.rebuild)
+        if result is None:
+            print("[rollup] another process is refreshing; try again later")
+        else:
+            print(f"[rollup] hourly={result['hourly']} daily={result['daily']} full={result['full']} "
+                  f"tz={rollup_tz()} in {time.perf_counter() - t0:.2f}s")
+    finally:
+        await pool.close()
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Refresh hourly/daily rollups of area_counts")
+    ap.add_argument("--rebuild", action="store_true", help="drop both rollup tables and recompute everything")
+    ap.add_argument("--overlap", type=float, default=float(os.getenv("ROLLUP_OVERLAP_S", "300")),
+                    help="re-scan rows changed this many seconds before the watermark")
+    asyncio.run(_main(ap.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+# benchmarks/bench_api.py
+"""
+Load test API stats: N client konkuren (default 200) memanggil
+/api/stats/ dan /api/stats/live berulang-ulang selama --duration detik,
+opsional sambil M viewer MJPEG (/api/stream/mjpeg) tetap terhubung supaya
+kondisinya mirip dashboard sungguhan (polling + stream panjang).
+
+Dilaporkan per endpoint: jumlah request, throughput, p50/p90/p99/max latency
+dan error (status != 200 / timeout). Untuk membandingkan dua implementasi,
+jalankan terhadap API versi lama dan simpan --json, lalu jalankan terhadap
+versi baru dengan --compare:
+
+    # API versi lama (mis. checkout commit sebelumnya) di port 8080
+    python benchmarks/bench_api.py --url http://localhost:8080 --json sync.json --label sync
+    # API versi baru
+    python benchmarks/bench_api.py --url http://localhost:8080 --json async.json --label async --compare sync.json
+
+    python benchmarks/bench_api.py --clients 200 --mjpeg 20 --stream-id 1 --area-id 1
+
+Butuh `pip install httpx`.
+"""
+import argparse, asyncio, json, platform, sys, time
+from datetime import datetime, timezone
+
+import httpx
+import numpy as np
+
+
+def endpoint_paths(args):
+    q = ""
+    if args.stream_id is not None:
+        q += f"&stream_id={args.stream_id}"
+    if args.area_id is not None:
+        q += f"&area_id={args.area_id}"
+    return {
+        "stats": f"/api/stats/?limit={args.limit}{q}",
+        "live": f"/api/stats/live?{q.lstrip('&')}",
+    }
+
+
+async def poll_client(client, paths, names, deadline, samples, errors, offset):
+    """Satu client dashboard: request berurutan (tanpa jeda) bergantian antar endpoint."""
+    i = offset
+    while time.perf_counter() < deadline:
+        name = names[i % len(names)]
+        i += 1
+        t0 = time.perf_counter()
+        try:
+            r = await client.get(paths[name])
+            await r.aread()
+            ok = r.status_code == 200
+            err = None if ok else str(r.status_code)
+        except httpx.HTTPError as e:
+            ok, err = False, type(e).__name__
+        dt = time.perf_counter() - t0
+        if ok:
+            samples[name].append(dt)
+        else:
+            errors[name][err] = errors[name].get(err, 0) + 1
+
+
+async def mjpeg_viewer(client, path, stop, received):
+    """Viewer MJPEG yang terus terhubung (hitung byte diterima)."""
+    while not stop.is_set():
+        try:
+            async with client.stream("GET", path, timeout=None) as r:
+                async for chunk in r.aiter_bytes():
+                    received[0] += len(chunk)
+                    if stop.is_set():
+                        return
+        except httpx.HTTPError:
+            await asyncio.sleep(0.5)
+
+
+def summarize(samples, errors, elapsed):
+    out = {}
+    for name, lat in samples.items():
+        lat = np.asarray(lat) * 1000.0
+        out[name] = {
+            "requests": int(len(lat)),
+            "rps": len(lat) / elapsed if elapsed > 0 else 0.0,
+            "p50_ms": float(np.percentile(lat, 50)) if len(lat) else 0.0,
+            "p90_ms": float(np.percentile(lat, 90)) if len(lat) else 0.0,
+            "p99_ms": float(np.percentile(lat, 99)) if len(lat) else 0.0,
+            "max_ms": float(lat.max()) if len(lat) else 0.0,
+            "errors": errors[name],
+        }
+    return out
+
+
+async def run(args):
+    paths = endpoint_paths(args)
+    names = args.endpoints
+    samples = {n: [] for n in names}
+    errors = {n: {} for n in names}
+    limits = httpx.Limits(max_connections=args.clients + args.mjpeg, max_keepalive_connections=args.clients + args.mjpeg)
+    async with httpx.AsyncClient(base_url=args.url, limits=limits, timeout=args.timeout) as client:
+        stop = asyncio.Event()
+        received = [0]
+        mjpeg_path = f"/api/stream/mjpeg?stream_id={args.stream_id or 1}"
+        viewers = [asyncio.create_task(mjpeg_viewer(client, mjpeg_path, stop, received)) for _ in range(args.mjpeg)]
+
+        # warm-up: koneksi HTTP + pool DB di server terbuka sebelum diukur
+        warm = {n: [] for n in names}
+        await asyncio.gather(*(poll_client(client, paths, names, time.perf_counter() + args.warmup, warm,
+                                           {n: {} for n in names}, k) for k in range(args.clients)))
+
+        t0 = time.perf_counter()
+        deadline = t0 + args.duration
+        await asyncio.gather(*(poll_client(client, paths, names, deadline, samples, errors, k)
+                               for k in range(args.clients)))
+        elapsed = time.perf_counter() - t0
+
+        stop.set()
+        for t in viewers:
+            t.cancel()
+        await asyncio.gather(*viewers, return_exceptions=True)
+    return summarize(samples, errors, elapsed), elapsed, received[0]
+
+
+def print_table(label, endpoints):
+    print(f"{label}:")
+    print(f"{'endpoint':>10} {'requests':>9} {'rps':>8} {'p50 ms':>8} {'p90 ms':>8} {'p99 ms':>8} {'max ms':>8} errors")
+    for name, r in endpoints.items():
+        errs = ", ".join(f"{k}={v}" for k, v in r["errors"].items()) or "-"
+        print(f"{name:>10} {r['requests']:>9} {r['rps']:>8.1f} {r['p50_ms']:>8.1f} {r['p90_ms']:>8.1f} "
+              f"{r['p99_ms']:>8.1f} {r['max_ms']:>8.1f} {errs}")
+
+
+def print_compare(result, baseline):
+    print(f"\n{baseline.get('label') or 'baseline'} -> {result.get('label') or 'current'}:")
+    print(f"{'endpoint':>10} {'p50 ms':>17} {'p99 ms':>17} {'rps':>17}")
+    for name, cur in result["endpoints"].items():
+        base = baseline.get("endpoints", {}).get(name)
+        if not base:
+            continue
+        cols = []
+        for key, fmt in (("p50_ms", ".1f"), ("p99_ms", ".1f"), ("rps", ".0f")):
+            cols.append(f"{base[key]:{fmt}} -> {cur[key]:{fmt}}")
+        print(f"{name:>10} " + " ".join(f"{c:>17}" for c in cols))
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Load test endpoint stats API (p50/p99 pada N client konkuren)")
+    ap.add_argument("--url", default="http://localhost:8080", help="base URL API")
+    ap.add_argument("--clients", type=int, default=200, help="jumlah client polling konkuren")
+    ap.add_argument("--duration", type=float, default=20.0, help="lama pengukuran (detik)")
+    ap.add_argument("--warmup", type=float, default=2.0, help="warm-up sebelum diukur (detik)")
+    ap.add_argument("--endpoints", nargs="+", choices=["stats", "live"], default=["stats", "live"])
+    ap.add_argument("--stream-id", type=int, default=None)
+    ap.add_argument("--area-id", type=int, default=None)
+    ap.add_argument("--limit", type=int, default=100, help="limit untuk /api/stats/")
+    ap.add_argument("--mjpeg", type=int, default=0, help="viewer MJPEG yang terhubung selama test")
+    ap.add_argument("--timeout", type=float, default=30.0, help="timeout per request (detik)")
+    ap.add_argument("--label", default="", help="nama implementasi (mis. sync / async) untuk laporan")
+    ap.add_argument("--json", default="", help="simpan hasil JSON ke file ini")
+    ap.add_argument("--compare", default="", help="JSON hasil run sebelumnya sebagai pembanding")
+    args = ap.parse_args()
+
+    endpoints, elapsed, mjpeg_bytes = asyncio.run(run(args))
+    result = {
+        "label": args.label,
+        "time": datetime.now(timezone.utc).isoformat(),
+        "host": platform.node(),
+        "config": {k: v for k, v in vars(args).items() if k not in ("json", "compare")},
+        "elapsed_s": elapsed,
+        "mjpeg_bytes": mjpeg_bytes,
+        "endpoints": endpoints,
+    }
+    print_table(f"{args.label or args.url} | {args.clients} client, {elapsed:.1f}s"
+                + (f", {args.mjpeg} viewer MJPEG ({mjpeg_bytes / 1e6:.1f} MB)" if args.mjpeg else ""), endpoints)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(result, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            print_compare(result, json.load(f))
+    if not any(r["requests"] for r in endpoints.values()):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+# benchmarks/bench_detector.py
+"""
+Bandingkan backend detector (workers/detector.py) dengan baseline PyTorch
+pada klip contoh: latency model.predict per frame dan kesesuaian deteksi.
+
+Kesesuaian dihitung per frame terhadap deteksi baseline (dianggap acuan):
+box dipasangkan optimal (Hungarian) dengan syarat kelas sama dan
+IoU >= --match-iou, lalu dilaporkan precision / recall / F1, rata-rata IoU
+pasangan, dan selisih jumlah person per frame (yang paling berpengaruh ke
+counting).
+
+    python benchmarks/bench_detector.py --video samples/output/nolkm-utara/nolkm-utara.mp4
+    python benchmarks/bench_detector.py --video clip.mp4 --model yolov8s.pt --backends onnx openvino --int8
+    python benchmarks/bench_detector.py --video clip.mp4 --json out.json
+
+Model hasil export disimpan di --model-cache (dipakai ulang oleh worker).
+"""
+import argparse, json, sys, time
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+from workers.detector import DEFAULT_CACHE_DIR, load_detector
+from workers.trackers.assignment import linear_assignment
+
+
+def read_frames(video, n):
+    cap = cv2.VideoCapture(video)
+    frames = []
+    while len(frames) < n:
+        ok, frame = cap.read()
+        if not ok:
+            break
+        frames.append(frame)
+    cap.release()
+    if not frames:
+        raise SystemExit(f"Gagal membaca frame dari {video}")
+    return frames
+
+
+def run_detector(model, frames, args):
+    """Return (latency ms per frame setelah warm-up, list (boxes (N,4), classes (N,)) per frame)."""
+    times, outputs = [], []
+    for i, frame in enumerate(frames):
+        t0 = time.perf_counter()
+        r = model.predict(frame, imgsz=args.imgsz, conf=args.conf, classes=[0, 1, 3], iou=0.5, verbose=False)[0]
+        dt = (time.perf_counter() - t0) * 1000.0
+        if i >= args.warmup:
+            times.append(dt)
+        if r.boxes is None or len(r.boxes) == 0:
+            outputs.append((np.zeros((0, 4), np.float32), np.zeros(0, np.int64)))
+        else:
+            outputs.append((np.asarray(r.boxes.xyxy.cpu(), np.float32), np.asarray(r.boxes.cls.cpu(), np.int64)))
+    return np.asarray(times), outputs
+
+
+def iou_matrix(a, b):
+    ix1 = np.maximum(a[:, None, 0], b[None, :, 0])
+    iy1 = np.maximum(a[:, None, 1], b[None, :, 1])
+    ix2 = np.minimum(a[:, None, 2], b[None, :, 2])
+    iy2 = np.minimum(a[:, None, 3], b[None, :, 3])
+    inter = np.maximum(ix2 - ix1, 0) * np.maximum(iy2 - iy1, 0)
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    return inter / np.maximum(area_a[:, None] + area_b[None, :] - inter, 1e-6)
+
+
+def agreement(baseline, candidate, match_iou=0.5):
+    """Statistik kesesuaian deteksi candidate terhadap baseline (list per frame)."""
+    matched = n_base = n_cand = 0
+    ious, count_diff = [], []
+    for (bb, bc), (cb, cc) in zip(baseline, candidate):
+        n_base += len(bb)
+        n_cand += len(cb)
+        count_diff.append(abs(int((bc == 0).sum()) - int((cc == 0).sum())))
+        if len(bb) == 0 or len(cb) == 0:
+            continue
+        iou = iou_matrix(bb, cb)
+        iou[bc[:, None] != cc[None, :]] = 0.0
+        rows, cols = linear_assignment(1.0 - iou)
+        ok = iou[rows, cols] >= match_iou
+        matched += int(ok.sum())
+        ious.extend(iou[rows, cols][ok].tolist())
+    precision = matched / n_cand if n_cand else 1.0
+    recall = matched / n_base if n_base else 1.0
+    f1 = 2 * precision * recall / (precision + recall) if precision + recall > 0 else 0.0
+    return {
+        "precision": precision, "recall": recall, "f1": f1,
+        "mean_iou": float(np.mean(ious)) if ious else 0.0,
+        "person_count_mae": float(np.mean(count_diff)) if count_diff else 0.0,
+        "detections": n_cand, "baseline_detections": n_base,
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Latency & kesesuaian deteksi backend ONNX/OpenVINO vs PyTorch")
+    ap.add_argument("--video", required=True, help="klip contoh")
+    ap.add_argument("--model", default="yolov8n.pt")
+    ap.add_argument("--imgsz", type=int, default=640)
+    ap.add_argument("--conf", type=float, default=0.25)
+    ap.add_argument("--frames", type=int, default=200)
+    ap.add_argument("--warmup", type=int, default=5, help="frame awal yang tidak dihitung latency-nya")
+    ap.add_argument("--backends", nargs="+", default=["onnx", "openvino"], choices=["onnx", "openvino"])
+    ap.add_argument("--int8", action="store_true", help="uji juga varian INT8 tiap backend")
+    ap.add_argument("--model-cache", default=DEFAULT_CACHE_DIR)
+    ap.add_argument("--match-iou", type=float, default=0.5)
+    ap.add_argument("--json", default="", help="simpan hasil JSON ke file ini")
+    args = ap.parse_args()
+
+    frames = read_frames(args.video, args.frames)
+    variants = [("torch", False)] + [(b, False) for b in args.backends]
+    if args.int8:
+        variants += [(b, True) for b in args.backends]
+
+    rows, baseline = [], None
+    for backend, int8 in variants:
+        dargs = argparse.Namespace(model=args.model, imgsz=args.imgsz, backend=backend, int8=int8,
+                                   int8_calib="", model_cache=args.model_cache, video=args.video)
+        try:
+            model = load_detector(dargs)
+        except Exception as e:      # runtime opsional belum terpasang / export gagal
+            print(f"[SKIP] {backend}{'-int8' if int8 else ''}: {e!r}")
+            continue
+        times, outputs = run_detector(model, frames, args)
+        if baseline is None:
+            baseline = outputs
+        row = {
+            "backend": backend + ("-int8" if int8 else ""),
+            "mean_ms": float(times.mean()), "p50_ms": float(np.percentile(times, 50)),
+            "p95_ms": float(np.percentile(times, 95)),
+            **agreement(baseline, outputs, args.match_iou),
+        }
+        rows.append(row)
+    if not rows:
+        raise SystemExit("Tidak ada backend yang bisa dijalankan")
+
+    base_ms = rows[0]["mean_ms"]
+    print(f"{args.model} imgsz={args.imgsz} frames={len(frames)} (baseline: {rows[0]['backend']})")
+    print(f"{'backend':>14} {'mean ms':>9} {'p95':>8} {'speedup':>8} {'prec':>6} {'recall':>6} "
+          f"{'F1':>6} {'mIoU':>6} {'cntMAE':>7}")
+    for r in rows:
+        r["speedup"] = base_ms / r["mean_ms"] if r["mean_ms"] > 0 else 0.0
+        print(f"{r['backend']:>14} {r['mean_ms']:>9.2f} {r['p95_ms']:>8.2f} {r['speedup']:>7.2f}x "
+              f"{r['precision']:>6.3f} {r['recall']:>6.3f} {r['f1']:>6.3f} {r['mean_iou']:>6.3f} "
+              f"{r['person_count_mae']:>7.3f}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"model": args.model, "imgsz": args.imgsz, "frames": len(frames),
+                       "video": args.video, "results": rows}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+# benchmarks/bench_geometry.py
+"""
+Cek + microbenchmark SDF polygon (workers/geometry.py) terhadap
+cv2.pointPolygonTest untuk polygon seed (db/02_seed_areas.sql).
+
+Per polygon x resolusi x --poly-pad, titik acak (sebagian merata di sekitar
+bbox polygon, sebagian di pita dekat tepi, sebagian di luar frame):
+
+- error maks SDF lookup mentah vs jarak eksak, harus <= SDF_TOLERANCE;
+- keputusan ambang PolygonCounter (inside: d >= -poly_margin, dekat tepi:
+  |d| <= cross_margin, tanda d terhadap 0) dari signed_distance(..., thresholds)
+  harus identik dengan hasil pointPolygonTest;
+- waktu signed_distance (batch) vs pointPolygonTest per titik.
+
+Exit code 1 kalau ada keputusan yang beda atau error melewati toleransi.
+
+    python benchmarks/bench_geometry.py
+    python benchmarks/bench_geometry.py --points 200000 --res 1920x1080 1280x720 --poly-pad 0 6 --json
+"""
+import argparse, json, re, sys, time
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+from workers.geometry import SDF_TOLERANCE, PolygonGeometry
+from workers.detect_track_count import build_polygon_geometry
+
+
+def load_seed_polygons(path):
+    """[("stream/area", poly_norm)] dari file seed SQL (GeoJSON $$...$$ + WHERE s.name = '...')."""
+    text = Path(path).read_text()
+    out = []
+    for body, stream in re.findall(r"\$\$(\{.*?\})\$\$::jsonb.*?WHERE s\.name = '([^']+)'", text, re.S):
+        feat = json.loads(body)
+        name = feat.get("properties", {}).get("name", f"area{len(out) + 1}")
+        out.append((f"{stream}/{name}", feat["geometry"]["coordinates"][0]))
+    return out
+
+
+def sample_points(poly_px, W, H, n, band, rng):
+    """n titik: 1/2 merata di bbox polygon (+20 px), 1/3 di pita +-band dari tepi, sisanya acak termasuk luar frame."""
+    pts = poly_px.reshape(-1, 2).astype(np.float64)
+    x, y, w, h = cv2.boundingRect(poly_px.reshape(-1, 1, 2).astype(np.int32))
+    n_box, n_edge = n // 2, n // 3
+    n_any = n - n_box - n_edge
+    box = np.c_[rng.uniform(x - 20, x + w + 20, n_box), rng.uniform(y - 20, y + h + 20, n_box)]
+
+    idx = rng.integers(0, len(pts), n_edge)
+    a, b = pts[idx], np.roll(pts, -1, axis=0)[idx]
+    t = rng.random((n_edge, 1))
+    d = b - a
+    normal = np.c_[-d[:, 1], d[:, 0]] / np.maximum(np.hypot(d[:, 0], d[:, 1]), 1e-9)[:, None]
+    edge = a + t * d + normal * rng.uniform(-band, band, (n_edge, 1))
+
+    anywhere = np.c_[rng.uniform(-30, W + 30, n_any), rng.uniform(-30, H + 30, n_any)]
+    return np.concatenate([box, edge, anywhere]).astype(np.float32)
+
+
+def decisions(dist, poly_margin, cross_margin):
+    """Keputusan ambang yang dipakai PolygonCounter.update."""
+    return {
+        "inside": dist >= -poly_margin,
+        "near_edge": np.abs(dist) <= cross_margin,
+        "d<=0": dist <= 0,
+        "d>0": dist > 0,
+        "d>=0": dist >= 0,
+        "d<0": dist < 0,
+    }
+
+
+def run_case(poly_norm, W, H, poly_pad, args, rng):
+    geo_args = argparse.Namespace(poly_pad=poly_pad, roi_scale=1.0, geometry_cache=None)
+    poly_px, _roi, mask = build_polygon_geometry(poly_norm, W, H, geo_args)
+    geom = PolygonGeometry(poly_px, mask)
+    pts = sample_points(poly_px, W, H, args.points, band=max(args.cross_margin, args.poly_margin) + 4, rng=rng)
+
+    t0 = time.perf_counter()
+    exact = geom._exact(pts)
+    t_exact = time.perf_counter() - t0
+
+    thresholds = (0.0, -float(args.poly_margin), float(args.cross_margin), -float(args.cross_margin))
+    t0 = time.perf_counter()
+    fast = geom.signed_distance(pts, thresholds)
+    t_fast = time.perf_counter() - t0
+
+    # error SDF mentah (tanpa refine), hanya titik di dalam frame
+    xi, yi = np.rint(pts[:, 0]).astype(np.int64), np.rint(pts[:, 1]).astype(np.int64)
+    in_frame = (xi >= 0) & (xi < W) & (yi >= 0) & (yi < H)
+    raw_err = np.abs(geom.sdf[yi[in_frame], xi[in_frame]] - exact[in_frame])
+
+    want = decisions(exact, args.poly_margin, args.cross_margin)
+    got = decisions(fast, args.poly_margin, args.cross_margin)
+    mismatches = {k: int((want[k] != got[k]).sum()) for k in want}
+    return {
+        "points": int(len(pts)),
+        "max_sdf_err_px": float(raw_err.max()) if len(raw_err) else 0.0,
+        "refined_pct": 100.0 * float(np.mean(fast != geom.sdf[np.clip(yi, 0, H - 1), np.clip(xi, 0, W - 1)])),
+        "mismatches": mismatches,
+        "exact_us_per_pt": 1e6 * t_exact / len(pts),
+        "sdf_us_per_pt": 1e6 * t_fast / len(pts),
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Cek keputusan ambang SDF polygon vs pointPolygonTest (polygon seed)")
+    ap.add_argument("--seed-sql", default=str(REPO_ROOT / "db" / "02_seed_areas.sql"))
+    ap.add_argument("--res", nargs="+", default=["1920x1080", "1280x720", "640x360"])
+    ap.add_argument("--poly-pad", type=int, nargs="+", default=[0, 6])
+    ap.add_argument("--poly-margin", type=float, default=5, help="sama dengan default worker")
+    ap.add_argument("--cross-margin", type=float, default=8, help="sama dengan default worker")
+    ap.add_argument("--points", type=int, default=200000, help="titik acak per kasus")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--json", action="store_true", help="cetak hasil sebagai JSON")
+    args = ap.parse_args()
+
+    polygons = load_seed_polygons(args.seed_sql)
+    if not polygons:
+        raise SystemExit(f"tidak ada polygon di {args.seed_sql}")
+    rng = np.random.default_rng(args.seed)
+
+    results, failed = [], False
+    if not args.json:
+        print(f"SDF_TOLERANCE = {SDF_TOLERANCE:.4f} px | poly_margin={args.poly_margin} cross_margin={args.cross_margin}")
+        print(f"{'polygon':>38} {'res':>10} {'pad':>4} {'max err':>8} {'refine%':>8} "
+              f"{'exact us':>9} {'sdf us':>7} mismatches")
+    for name, poly_norm in polygons:
+        for res in args.res:
+            W, H = (int(v) for v in res.lower().split("x"))
+            for pad in args.poly_pad:
+                r = run_case(poly_norm, W, H, pad, args, rng)
+                r.update(polygon=name, res=res, poly_pad=pad)
+                bad = sum(r["mismatches"].values()) > 0 or r["max_sdf_err_px"] > SDF_TOLERANCE
+                failed |= bad
+                results.append(r)
+                if not args.json:
+                    mm = ", ".join(f"{k}={v}" for k, v in r["mismatches"].items() if v) or "-"
+                    print(f"{name:>38} {res:>10} {pad:>4} {r['max_sdf_err_px']:>8.4f} {r['refined_pct']:>8.2f} "
+                          f"{r['exact_us_per_pt']:>9.2f} {r['sdf_us_per_pt']:>7.3f} {mm}" + ("  <-- GAGAL" if bad else ""))
+
+    if args.json:
+        print(json.dumps({"sdf_tolerance": SDF_TOLERANCE, "results": results}, indent=2))
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
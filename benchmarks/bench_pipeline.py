@@ -0,0 +1,392 @@
+# benchmarks/bench_pipeline.py
+"""
+Benchmark per stage pipeline detect_track_count pada video sintetis, tanpa
+jaringan / GPU:
+
+    decode -> roi (crop/resize) -> infer -> post (parse + filter rider)
+    -> track -> count -> db -> render -> encode
+
+Video sintetis berisi kotak "orang" yang bergerak (resolusi, kepadatan dan
+kecepatan bisa diatur). Detector default adalah stub yang langsung
+mengembalikan kotak ground truth dalam format hasil Ultralytics, jadi yang
+terukur adalah overhead pipeline kita sendiri; --detector yolo memakai model
+asli (mis. yolov8n.pt). DB memakai stand-in lokal (sqlite3 in-memory dengan
+query setara DBLogger sync) kecuali --db sync/batched ke Postgres dari .env.
+
+    python benchmarks/bench_pipeline.py
+    python benchmarks/bench_pipeline.py --res 1920x1080 --people 40 --speed 6 --json out.json
+    python benchmarks/bench_pipeline.py --json new.json --compare out.json --max-regression 0.2
+    python benchmarks/bench_pipeline.py --worker-args "--tracker kalman --count-mode ratio"
+    python benchmarks/bench_pipeline.py --detector yolo --worker-args "--backend openvino --int8"
+
+Waktu "count" tidak termasuk waktu di dalam dblogger (dilaporkan sebagai "db").
+"""
+import argparse, json, os, platform, shlex, sqlite3, sys, tempfile, time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+from workers import detect_track_count as dtc
+from workers.detector import load_detector
+from workers.geometry import get_polygon_geometry
+
+STAGES = ("decode", "roi", "infer", "post", "track", "count", "db", "render", "encode")
+POLY_NORM = [[0.2, 0.25], [0.75, 0.2], [0.85, 0.8], [0.15, 0.85]]
+
+
+# ---------- video sintetis ----------
+def synth_video(path, W, H, frames, people, speed, box_h, fps=25, seed=0):
+    """
+    Tulis video MJPG berisi `people` kotak (lebar box_h/2.5) yang bergerak lurus
+    dengan kecepatan ~speed px/frame dan memantul di tepi frame.
+    Return list boxes (N,4) int per frame (ground truth untuk stub detector).
+    """
+    rng = np.random.default_rng(seed)
+    # latar statis bertekstur supaya biaya decode / encode realistis
+    bg = cv2.GaussianBlur(rng.integers(0, 256, (H, W, 3), dtype=np.uint8), (0, 0), 3)
+    box_w = max(int(box_h / 2.5), 2)
+    pos = rng.uniform([box_w, box_h], [W - box_w, H], (people, 2))
+    ang = rng.uniform(0, 2 * np.pi, people)
+    vel = np.stack([np.cos(ang), np.sin(ang)], axis=1) * speed * rng.uniform(0.5, 1.5, (people, 1))
+    colors = rng.integers(0, 256, (people, 3)).tolist()
+
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"MJPG"), fps, (W, H))
+    if not writer.isOpened():
+        raise SystemExit(f"Gagal membuat video sintetis: {path}")
+    truth = []
+    for _ in range(frames):
+        pos += vel
+        for axis, lo, hi in ((0, box_w / 2, W - box_w / 2), (1, box_h, H - 1)):
+            out = (pos[:, axis] < lo) | (pos[:, axis] > hi)
+            vel[out, axis] *= -1
+            pos[:, axis] = np.clip(pos[:, axis], lo, hi)
+        # bottom-center -> bbox
+        cx, by = pos[:, 0], pos[:, 1]
+        boxes = np.stack([cx - box_w / 2, by - box_h, cx + box_w / 2, by], axis=1).astype(np.int32)
+        img = bg.copy()
+        for (x1, y1, x2, y2), c in zip(boxes.tolist(), colors):
+            cv2.rectangle(img, (x1, y1), (x2, y2), c, -1)
+        writer.write(img)
+        truth.append(boxes)
+    writer.release()
+    return truth
+
+
+# ---------- stub detector ----------
+class _Boxes(list):
+    pass
+
+
+class _Box:
+    __slots__ = ("xyxy", "cls", "conf")
+
+    def __init__(self, xyxy, cls, conf):
+        self.xyxy, self.cls, self.conf = (xyxy,), (cls,), (conf,)
+
+
+class _Result:
+    def __init__(self, boxes):
+        self.boxes = boxes
+
+
+class StubDetector:
+    """
+    Pengganti YOLO: predict() mengembalikan box ground truth frame saat ini
+    (yang di-set lewat set_frame) dalam koordinat ROI (+upscale), format
+    result.boxes seperti Ultralytics.
+    """
+    def __init__(self, roi_rect, upscale=1.0):
+        self.roi_rect = roi_rect
+        self.scale = upscale if upscale and upscale > 1.0 else 1.0
+        self._boxes = np.zeros((0, 4), np.int32)
+
+    def set_frame(self, boxes):
+        self._boxes = boxes
+
+    def predict(self, images, **kwargs):
+        x, y, w, h = self.roi_rect
+        b = self._boxes.astype(np.float32) - np.array([x, y, x, y], np.float32)
+        b[:, 0::2] = np.clip(b[:, 0::2], 0, w)
+        b[:, 1::2] = np.clip(b[:, 1::2], 0, h)
+        keep = (b[:, 2] - b[:, 0] > 1) & (b[:, 3] - b[:, 1] > 1)
+        b = b[keep] * self.scale
+        boxes = _Boxes(_Box(row, 0, 0.9) for row in b)
+        n = len(images) if isinstance(images, list) else 1
+        return [_Result(boxes)] * n
+
+
+# ---------- DB stand-in ----------
+class StandInDB:
+    """DB lokal pengganti Postgres: sqlite3 in-memory, alur query setara DBLogger (sync)."""
+    def __init__(self):
+        self.conn = sqlite3.connect(":memory:", isolation_level=None, check_same_thread=False)
+        self.conn.executescript("""
+            CREATE TABLE tracks (track_id INTEGER PRIMARY KEY, stream_id INTEGER NOT NULL);
+            CREATE TABLE area_events (event_id INTEGER PRIMARY KEY, stream_id INTEGER, area_id INTEGER,
+                                      track_id INTEGER, ts TEXT, direction TEXT);
+            CREATE TABLE area_counts (stream_id INTEGER, area_id INTEGER, window_start TEXT, window_end TEXT,
+                                      enters INTEGER DEFAULT 0, exits INTEGER DEFAULT 0,
+                                      UNIQUE (stream_id, area_id, window_start, window_end));
+            CREATE TABLE area_live (stream_id INTEGER, area_id INTEGER, current_inside INTEGER, updated_at TEXT,
+                                    PRIMARY KEY (stream_id, area_id));
+        """)
+        self._live_sent = {}
+
+    def log_event_and_counts(self, stream_id, area_id, track_id, direction, ts=None):
+        ts = ts or datetime.now(timezone.utc)
+        win = ts.replace(second=0, microsecond=0)
+        enter = 1 if direction.lower() == "enter" else 0
+        cur = self.conn.cursor()
+        cur.execute("INSERT OR IGNORE INTO tracks (track_id, stream_id) VALUES (?, ?)", (int(track_id), stream_id))
+        cur.execute("INSERT INTO area_events (stream_id, area_id, track_id, ts, direction) VALUES (?, ?, ?, ?, ?)",
+                    (stream_id, area_id, int(track_id), ts.isoformat(), direction.upper()))
+        cur.execute("""
+            INSERT INTO area_counts (stream_id, area_id, window_start, window_end, enters, exits)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT (stream_id, area_id, window_start, window_end)
+            DO UPDATE SET enters = enters + excluded.enters, exits = exits + excluded.exits
+        """, (stream_id, area_id, win.isoformat(), win.isoformat(), enter, 1 - enter))
+
+    def upsert_live(self, stream_id, area_id, current_inside):
+        key = (int(stream_id), int(area_id))
+        if self._live_sent.get(key) == int(current_inside):
+            return
+        self.conn.execute("""
+            INSERT INTO area_live (stream_id, area_id, current_inside, updated_at) VALUES (?, ?, ?, ?)
+            ON CONFLICT (stream_id, area_id)
+            DO UPDATE SET current_inside = excluded.current_inside, updated_at = excluded.updated_at
+        """, (key[0], key[1], int(current_inside), datetime.now(timezone.utc).isoformat()))
+        self._live_sent[key] = int(current_inside)
+
+    def close(self):
+        self.conn.close()
+
+
+class TimedLogger:
+    """Proxy dblogger yang mengakumulasi waktu di dalam pemanggilan DB (ns)."""
+    def __init__(self, inner):
+        self.inner = inner
+        self.ns = 0
+
+    def log_event_and_counts(self, *a, **k):
+        t0 = time.perf_counter_ns()
+        self.inner.log_event_and_counts(*a, **k)
+        self.ns += time.perf_counter_ns() - t0
+
+    def upsert_live(self, *a, **k):
+        t0 = time.perf_counter_ns()
+        self.inner.upsert_live(*a, **k)
+        self.ns += time.perf_counter_ns() - t0
+
+    def take(self):
+        ns, self.ns = self.ns, 0
+        return ns
+
+    def close(self):
+        self.inner.close()
+
+
+def make_db(kind):
+    if kind == "off":
+        return None
+    if kind == "standin":
+        return StandInDB()
+    if kind == "sync":
+        return dtc.DBLogger()
+    from workers.db_writer import BatchedDBLogger
+    return BatchedDBLogger()
+
+
+# ---------- benchmark ----------
+def run(video, truth, W, H, bench_args, wargs):
+    poly_px, roi_rect, mask = dtc.build_polygon_geometry(POLY_NORM, W, H, wargs)
+    geometry = get_polygon_geometry(poly_px, mask)
+    if bench_args.detector == "yolo":
+        wargs.model = bench_args.model
+        model = load_detector(wargs, calib_source=video)
+    else:
+        model = StubDetector(roi_rect, wargs.roi_upscale)
+    tracker = dtc.build_tracker(wargs)
+    db = make_db(bench_args.db)
+    logger = TimedLogger(db) if db is not None else None
+    wargs.db_log = logger is not None
+    counter = dtc.PolygonCounter(geometry, wargs, logger)
+    encode_params = [int(cv2.IMWRITE_JPEG_QUALITY), bench_args.quality]
+
+    cap = cv2.VideoCapture(video)
+    times = {s: [] for s in STAGES}
+    clock = time.perf_counter_ns
+    idx = 0
+    t_start = None
+    try:
+        while True:
+            t0 = clock()
+            ok, frame = cap.read()
+            t1 = clock()
+            if not ok:
+                break
+            if isinstance(model, StubDetector):
+                model.set_frame(truth[idx])
+            roi = dtc.prepare_roi(frame, roi_rect, wargs)
+            t2 = clock()
+            results = dtc.predict_rois(model, roi, wargs)
+            t3 = clock()
+            detections = []
+            for r in results:
+                detections.extend(dtc.parse_detections(r, roi_rect, wargs))
+            t4 = clock()
+            tracked = tracker.update(detections)
+            t5 = clock()
+            counter.update(tracked, idx + 1)
+            t6 = clock()
+            db_ns = logger.take() if logger is not None else 0
+            counts = (counter.enter_count, counter.exit_count, counter.current_inside)
+            vis = dtc.render_frame(frame, tracked, counter.poly_px, mask, counts,
+                                   dtc.hud_text(wargs, 0.0), scale=wargs.render_scale)
+            t7 = clock()
+            cv2.imencode(".jpg", vis, encode_params)
+            t8 = clock()
+
+            idx += 1
+            if idx <= bench_args.warmup:
+                continue
+            if t_start is None:
+                t_start = t0
+            for name, ns in zip(STAGES, (t1 - t0, t2 - t1, t3 - t2, t4 - t3, t5 - t4,
+                                         t6 - t5 - db_ns, db_ns, t7 - t6, t8 - t7)):
+                times[name].append(ns)
+            t_end = t8
+    finally:
+        cap.release()
+        if logger is not None:
+            logger.close()
+
+    measured = len(times["decode"])
+    if measured == 0:
+        raise SystemExit("Tidak ada frame terukur (frames <= warmup?)")
+    stages = {}
+    total_mean = sum(np.mean(v) for v in times.values()) / 1e6
+    for name, v in times.items():
+        ms = np.asarray(v, np.float64) / 1e6
+        stages[name] = {
+            "mean_ms": float(ms.mean()),
+            "p50_ms": float(np.percentile(ms, 50)),
+            "p95_ms": float(np.percentile(ms, 95)),
+            "max_ms": float(ms.max()),
+            "share": float(ms.mean() / total_mean) if total_mean > 0 else 0.0,
+        }
+    wall_s = (t_end - t_start) / 1e9
+    return {
+        "frames": measured,
+        "fps": measured / wall_s if wall_s > 0 else 0.0,
+        "frame_ms": total_mean,
+        "events": {"enter": counter.enter_count, "exit": counter.exit_count},
+        "stages": stages,
+    }
+
+
+def compare(result, baseline, max_regression, min_delta_ms=0.05):
+    """Return list regresi: stage yang mean-nya naik > max_regression (dan > min_delta_ms)."""
+    regressions = []
+    for name, cur in result["stages"].items():
+        base = baseline.get("stages", {}).get(name)
+        if not base:
+            continue
+        delta = cur["mean_ms"] - base["mean_ms"]
+        if delta > min_delta_ms and cur["mean_ms"] > base["mean_ms"] * (1.0 + max_regression):
+            regressions.append((name, base["mean_ms"], cur["mean_ms"]))
+    return regressions
+
+
+def parse_res(s):
+    w, h = s.lower().split("x")
+    return int(w), int(h)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark per stage pipeline detect_track_count (video sintetis)")
+    ap.add_argument("--res", type=parse_res, default=(1280, 720))
+    ap.add_argument("--frames", type=int, default=300)
+    ap.add_argument("--warmup", type=int, default=10, help="frame awal yang tidak diukur")
+    ap.add_argument("--people", type=int, default=20, help="jumlah kotak bergerak di video")
+    ap.add_argument("--speed", type=float, default=4.0, help="kecepatan rata-rata (px/frame)")
+    ap.add_argument("--box-height", type=int, default=0, help="tinggi kotak px (0 = 12%% tinggi frame)")
+    ap.add_argument("--video", default="", help="pakai video ini (stub detector butuh video sintetis)")
+    ap.add_argument("--detector", choices=["stub", "yolo"], default="stub")
+    ap.add_argument("--model", default="yolov8n.pt", help="model untuk --detector yolo")
+    ap.add_argument("--db", choices=["standin", "off", "sync", "batched"], default="standin",
+                    help="standin = sqlite3 in-memory; sync/batched = Postgres dari .env")
+    ap.add_argument("--quality", type=int, default=70, help="kualitas JPEG encode")
+    ap.add_argument("--worker-args", default="",
+                    help='argumen tambahan detect_track_count, mis. "--tracker kalman --roi-upscale 1.5"')
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--json", default="", help="simpan hasil JSON ke file ini ('-' = stdout)")
+    ap.add_argument("--compare", default="", help="JSON baseline; exit 1 bila ada stage yang regresi")
+    ap.add_argument("--max-regression", type=float, default=0.2,
+                    help="ambang regresi relatif per stage (0.2 = 20%% lebih lambat)")
+    args = ap.parse_args()
+
+    wargs = dtc.build_arg_parser().parse_args(shlex.split(args.worker_args))
+    W, H = args.res
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.video:
+            if args.detector == "stub":
+                raise SystemExit("--video hanya untuk --detector yolo (stub butuh ground truth video sintetis)")
+            cap = cv2.VideoCapture(args.video)
+            W, H = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+            cap.release()
+            video, truth = args.video, None
+        else:
+            video = os.path.join(tmp, "synth.avi")
+            box_h = args.box_height or max(int(H * 0.12), 8)
+            truth = synth_video(video, W, H, args.frames, args.people, args.speed, box_h, seed=args.seed)
+        result = run(video, truth, W, H, args, wargs)
+
+    result["config"] = {
+        "resolution": f"{W}x{H}", "frames": args.frames, "warmup": args.warmup, "people": args.people,
+        "speed": args.speed, "detector": "stub" if args.detector == "stub" else
+        f"{args.model}:{wargs.backend}{'-int8' if wargs.int8 else ''}",
+        "db": args.db, "worker_args": args.worker_args,
+    }
+    result["env"] = {
+        "python": platform.python_version(), "numpy": np.__version__, "opencv": cv2.__version__,
+        "cpu": platform.processor() or platform.machine(), "cpus": os.cpu_count(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+    }
+
+    if args.json == "-":
+        print(json.dumps(result, indent=2))
+    else:
+        if args.json:
+            with open(args.json, "w") as f:
+                json.dump(result, f, indent=2)
+        print(f"{result['config']['resolution']} people={args.people} detector={result['config']['detector']} "
+              f"db={args.db}: {result['frame_ms']:.2f} ms/frame ({result['fps']:.1f} fps), "
+              f"ENTER={result['events']['enter']} EXIT={result['events']['exit']}")
+        print(f"{'stage':>8} {'mean ms':>9} {'p50':>8} {'p95':>8} {'max':>8} {'share':>7}")
+        for name in STAGES:
+            s = result["stages"][name]
+            print(f"{name:>8} {s['mean_ms']:>9.3f} {s['p50_ms']:>8.3f} {s['p95_ms']:>8.3f} "
+                  f"{s['max_ms']:>8.3f} {s['share'] * 100:>6.1f}%")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(result, baseline, args.max_regression)
+        for name, base, cur in regressions:
+            print(f"[REGRESI] {name}: {base:.3f} -> {cur:.3f} ms/frame (+{(cur / base - 1) * 100:.0f}%)",
+                  file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+        print(f"[OK] tidak ada stage yang lebih lambat > {args.max_regression * 100:.0f}% dari {args.compare}",
+              file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+# benchmarks/bench_render.py
+"""
+Microbenchmark render overlay: versi lama (frame.copy + boolean-mask float dim
++ polylines per frame) vs OverlayRenderer (layer statis + LUT in-place).
+
+    python benchmarks/bench_render.py
+    python benchmarks/bench_render.py --res 1920x1080 1280x720 --frames 100 --json
+"""
+import argparse, json, sys, time
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+from workers.overlay import OverlayRenderer
+
+
+def synth_scene(W, H, seed=0):
+    rng = np.random.default_rng(seed)
+    frame = rng.integers(0, 256, size=(H, W, 3), dtype=np.uint8)
+    poly_norm = np.array([[0.15, 0.2], [0.8, 0.15], [0.9, 0.85], [0.2, 0.9]], np.float32)
+    poly_px = (poly_norm * np.array([W, H], np.float32)).astype(np.int32).reshape(-1, 1, 2)
+    mask = np.zeros((H, W), np.uint8)
+    cv2.fillPoly(mask, [poly_px], 255)
+    return frame, poly_px, mask
+
+
+def legacy_background(frame, poly_px, mask):
+    vis = frame.copy()
+    cv2.polylines(vis, [poly_px], True, (0, 255, 255), 2)
+    vis[mask == 0] = (vis[mask == 0] * 0.35).astype(np.uint8)
+    return vis
+
+
+def bench(fn, frames, repeat):
+    fn()    # warm-up
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        for _ in range(frames):
+            fn()
+        best = min(best, time.perf_counter() - t0)
+    return best / frames * 1e3   # ms per frame
+
+
+def parse_res(s):
+    w, h = s.lower().split("x")
+    return int(w), int(h)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Microbenchmark render overlay lama vs OverlayRenderer")
+    ap.add_argument("--res", type=parse_res, nargs="+", default=[(1920, 1080), (1280, 720)])
+    ap.add_argument("--frames", type=int, default=50)
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--json", action="store_true", help="output JSON (untuk dibandingkan antar run)")
+    args = ap.parse_args()
+
+    rows = []
+    for W, H in args.res:
+        frame, poly_px, mask = synth_scene(W, H)
+        renderer = OverlayRenderer(poly_px, mask)
+        if not np.array_equal(renderer.compose(frame), legacy_background(frame, poly_px, mask)):
+            print(f"[WARN] output {W}x{H} berbeda dari versi lama")
+        legacy = bench(lambda: legacy_background(frame, poly_px, mask), args.frames, args.repeat)
+        layered = bench(lambda: renderer.compose(frame), args.frames, args.repeat)
+        rows.append({"resolution": f"{W}x{H}", "legacy_ms": legacy, "overlay_ms": layered,
+                     "speedup": legacy / layered})
+
+    if args.json:
+        print(json.dumps(rows, indent=2))
+        return
+    print(f"{'res':>10} {'legacy ms/frame':>16} {'overlay ms/frame':>17} {'speedup':>8}")
+    for r in rows:
+        print(f"{r['resolution']:>10} {r['legacy_ms']:>16.3f} {r['overlay_ms']:>17.3f} {r['speedup']:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+# benchmarks/bench_tracker.py
+"""
+Microbenchmark tracker: CentroidTracker (greedy, dict) vs ArrayCentroidTracker
+(NumPy + Hungarian) vs KalmanCentroidTracker (+ constant-velocity) pada
+10 / 100 / 500 deteksi per frame.
+
+    python benchmarks/bench_tracker.py
+    python benchmarks/bench_tracker.py --sizes 10 100 500 --frames 200 --json
+"""
+import argparse, json, sys, time
+from pathlib import Path
+
+import numpy as np
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+from workers.trackers.centroid import CentroidTracker
+from workers.trackers.array_centroid import ArrayCentroidTracker
+from workers.trackers.kalman import KalmanCentroidTracker
+
+
+def synth_sequence(n_dets, n_frames, W=1920, H=1080, seed=0):
+    """Random-walk orang dengan bbox 30x80, sebagian deteksi hilang (miss) tiap frame."""
+    rng = np.random.default_rng(seed)
+    pos = rng.uniform([0, 0], [W, H], size=(n_dets, 2))
+    vel = rng.normal(0, 3, size=(n_dets, 2))
+    frames = []
+    for _ in range(n_frames):
+        vel += rng.normal(0, 0.5, size=vel.shape)
+        pos = np.clip(pos + vel, 0, [W - 1, H - 1])
+        visible = rng.random(n_dets) > 0.05
+        dets = []
+        for cx, cy in pos[visible].astype(int).tolist():
+            dets.append({"x1": cx - 15, "y1": cy - 80, "x2": cx + 15, "y2": cy, "cx": cx, "cy": cy})
+        frames.append(dets)
+    return frames
+
+
+def bench(tracker_cls, frames, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        tracker = tracker_cls(max_distance=60, max_miss=40)
+        t0 = time.perf_counter()
+        for dets in frames:
+            tracker.update(dets)
+        best = min(best, time.perf_counter() - t0)
+    return best / len(frames) * 1e3   # ms per frame
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Microbenchmark CentroidTracker vs ArrayCentroidTracker vs KalmanCentroidTracker")
+    ap.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 500])
+    ap.add_argument("--frames", type=int, default=100)
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--json", action="store_true", help="output JSON (untuk dibandingkan antar run)")
+    args = ap.parse_args()
+
+    rows = []
+    for n in args.sizes:
+        frames = synth_sequence(n, args.frames)
+        legacy = bench(CentroidTracker, frames, args.repeat)
+        array = bench(ArrayCentroidTracker, frames, args.repeat)
+        kalman = bench(KalmanCentroidTracker, frames, args.repeat)
+        rows.append({"detections": n, "centroid_ms": legacy, "array_ms": array, "kalman_ms": kalman,
+                     "speedup": legacy / array})
+
+    if args.json:
+        print(json.dumps(rows, indent=2))
+        return
+    print(f"{'dets':>6} {'centroid ms/frame':>18} {'array ms/frame':>15} {'kalman ms/frame':>16} {'speedup':>8}")
+    for r in rows:
+        print(f"{r['detections']:>6} {r['centroid_ms']:>18.3f} {r['array_ms']:>15.3f} "
+              f"{r['kalman_ms']:>16.3f} {r['speedup']:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
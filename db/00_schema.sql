@@ -54,6 +54,10 @@ CREATE TABLE IF NOT EXISTS area_events (
     direction  TEXT NOT NULL CHECK (direction IN ('ENTER','EXIT'))
 );
 CREATE INDEX IF NOT EXISTS idx_area_events_ts ON area_events(ts);
+-- GET /api/stats/ per stream/area: filter + urutan (ts, event_id) DESC langsung dari index,
+-- INCLUDE supaya query-nya index-only (tanpa baca heap)
+CREATE INDEX IF NOT EXISTS idx_area_events_stream_area_ts
+    ON area_events(stream_id, area_id, ts DESC, event_id DESC) INCLUDE (track_id, direction);
 
 -- ========== area_counts ==========
 CREATE TABLE IF NOT EXISTS area_counts (
@@ -64,11 +68,62 @@ CREATE TABLE IF NOT EXISTS area_counts (
     window_end   TIMESTAMPTZ NOT NULL,
     enters       INTEGER NOT NULL DEFAULT 0,
     exits        INTEGER NOT NULL DEFAULT 0,
+    updated_at   TIMESTAMPTZ NOT NULL DEFAULT now(),
     CONSTRAINT area_counts_stream_id_area_id_window_start_window_end_key
         UNIQUE (stream_id, area_id, window_start, window_end)
 );
 CREATE INDEX IF NOT EXISTS idx_area_counts_window ON area_counts(area_id, window_start, window_end);
 
+-- updated_at: penanda baris yang berubah untuk refresh rollup inkremental (backend/rollup.py).
+-- Diisi trigger supaya semua penulis (worker sync / batched / replay) tidak perlu diubah.
+ALTER TABLE area_counts ADD COLUMN IF NOT EXISTS updated_at TIMESTAMPTZ NOT NULL DEFAULT now();  -- upgrade DB lama
+CREATE INDEX IF NOT EXISTS idx_area_counts_updated ON area_counts(updated_at);
+
+CREATE OR REPLACE FUNCTION touch_updated_at() RETURNS trigger AS $$
+BEGIN
+    NEW.updated_at := now();
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE TRIGGER trg_area_counts_touch
+    BEFORE UPDATE ON area_counts
+    FOR EACH ROW EXECUTE FUNCTION touch_updated_at();
+
+-- ========== rollup area_counts (per jam / per hari) ==========
+-- Dipelihara oleh job refresh di API (backend/rollup.py) dari area_counts;
+-- bucket_start jam = UTC, hari = ROLLUP_TZ.
+CREATE TABLE IF NOT EXISTS area_counts_hourly (
+    stream_id    INTEGER NOT NULL REFERENCES streams(stream_id) ON DELETE CASCADE,
+    area_id      INTEGER NOT NULL REFERENCES areas(area_id) ON DELETE CASCADE,
+    bucket_start TIMESTAMPTZ NOT NULL,
+    enters       INTEGER NOT NULL DEFAULT 0,
+    exits        INTEGER NOT NULL DEFAULT 0,
+    updated_at   TIMESTAMPTZ NOT NULL DEFAULT now(),
+    PRIMARY KEY (stream_id, area_id, bucket_start)
+);
+CREATE INDEX IF NOT EXISTS idx_area_counts_hourly_bucket ON area_counts_hourly(bucket_start);
+CREATE INDEX IF NOT EXISTS idx_area_counts_hourly_updated ON area_counts_hourly(updated_at);
+
+CREATE TABLE IF NOT EXISTS area_counts_daily (
+    stream_id    INTEGER NOT NULL REFERENCES streams(stream_id) ON DELETE CASCADE,
+    area_id      INTEGER NOT NULL REFERENCES areas(area_id) ON DELETE CASCADE,
+    bucket_start TIMESTAMPTZ NOT NULL,
+    enters       INTEGER NOT NULL DEFAULT 0,
+    exits        INTEGER NOT NULL DEFAULT 0,
+    updated_at   TIMESTAMPTZ NOT NULL DEFAULT now(),
+    PRIMARY KEY (stream_id, area_id, bucket_start)
+);
+CREATE INDEX IF NOT EXISTS idx_area_counts_daily_bucket ON area_counts_daily(bucket_start);
+
+-- watermark refresh: area_counts dengan updated_at >= watermark - overlap diproses ulang
+CREATE TABLE IF NOT EXISTS rollup_state (
+    name       TEXT PRIMARY KEY,
+    watermark  TIMESTAMPTZ NOT NULL,
+    tz         TEXT NOT NULL,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
 -- ========== area_live ==========
 CREATE TABLE IF NOT EXISTS area_live (
     stream_id      INTEGER NOT NULL REFERENCES streams(stream_id) ON DELETE CASCADE,
@@ -0,0 +1,309 @@
+# workers/db_writer.py
+"""
+Write-behind DB logger untuk worker.
+
+Interface sama dengan DBLogger (log_event_and_counts / upsert_live / close),
+tapi semua pemanggilan dari frame loop hanya memasukkan data ke buffer di
+memori (tanpa round-trip ke Postgres). Thread background melakukan flush:
+
+- area_events  : bulk INSERT (execute_values) semua event yang tertunda
+- tracks       : bulk INSERT ... ON CONFLICT DO NOTHING (FK area_events)
+- area_counts  : diagregasi per menit DI MEMORI lalu satu upsert per
+                 (stream, area, menit) dengan enters/exits += delta
+- area_live    : hanya nilai terakhir per (stream, area), dan hanya kalau berubah
+
+Setiap flush juga mem-publish perubahan (event ENTER/EXIT dan occupancy baru)
+via NOTIFY ke channel `area_updates`, yang diteruskan API ke dashboard (SSE).
+Perubahan occupancy langsung membangunkan thread flush supaya update live
+tetap sub-detik.
+
+Flush dipicu ukuran (batch_size event) atau waktu (flush_interval detik).
+Kalau DB down, batch dikembalikan ke buffer dan dicoba lagi dengan backoff;
+buffer event dibatasi max_pending (event tertua dibuang, tapi agregat
+area_counts tetap utuh sehingga jumlah per menit tidak hilang).
+"""
+import os, json, threading, time
+from collections import deque
+from datetime import datetime, timedelta, timezone
+
+import psycopg2
+from psycopg2.extras import execute_values
+
+
+NOTIFY_CHANNEL = "area_updates"
+NOTIFY_MAX_PAYLOAD = 7000     # batas Postgres 8000 byte per NOTIFY
+
+
+def _env(key, default=""):
+    # Prioritas DB_* lalu fallback ke POSTGRES_*
+    return os.getenv(key) or os.getenv(key.replace("DB_", "POSTGRES_")) or default
+
+
+def event_message(stream_id, area_id, track_id, ts, direction):
+    return {"type": "event", "stream_id": stream_id, "area_id": area_id,
+            "track_id": track_id, "ts": ts.isoformat(), "direction": direction}
+
+
+def live_message(stream_id, area_id, current_inside, updated_at):
+    return {"type": "live", "stream_id": stream_id, "area_id": area_id,
+            "current_inside": current_inside, "updated_at": updated_at.isoformat()}
+
+
+def publish_notifications(cur, messages):
+    """
+    Kirim messages (list dict) via pg_notify, dipaket sebagai JSON array
+    per payload <= NOTIFY_MAX_PAYLOAD byte. Terkirim saat transaksi commit.
+    """
+    chunk, size = [], 2
+    for msg in messages:
+        enc = json.dumps(msg, separators=(",", ":"))
+        if chunk and size + len(enc) + 1 > NOTIFY_MAX_PAYLOAD:
+            cur.execute("SELECT pg_notify(%s, %s)", (NOTIFY_CHANNEL, "[" + ",".join(chunk) + "]"))
+            chunk, size = [], 2
+        chunk.append(enc)
+        size += len(enc) + 1
+    if chunk:
+        cur.execute("SELECT pg_notify(%s, %s)", (NOTIFY_CHANNEL, "[" + ",".join(chunk) + "]"))
+
+
+class BatchedDBLogger:
+    def __init__(self, batch_size: int = 200, flush_interval: float = 2.0,
+                 max_pending: int = 50000, max_backoff: float = 30.0, notify: bool = True):
+        self.batch_size = max(int(batch_size), 1)
+        self.flush_interval = float(flush_interval)
+        self.max_pending = max(int(max_pending), 1)
+        self.max_backoff = float(max_backoff)
+        self.notify = notify
+
+        self._lock = threading.Condition()
+        self._events = deque()          # (stream_id, area_id, track_id, ts, DIRECTION)
+        self._tracks = set()            # (track_id, stream_id) yang belum ditulis
+        self._counts = {}               # (stream_id, area_id, window_start) -> [enters, exits]
+        self._live = {}                 # (stream_id, area_id) -> current_inside (belum ditulis)
+        self._live_sent = {}            # nilai area_live terakhir yang sudah tersimpan
+        self._closing = False
+
+        # statistik sederhana (bisa di-print / diekspor)
+        self.dropped_events = 0
+        self.flushed_events = 0
+        self.failed_flushes = 0
+        self.last_flush_s = 0.0
+        self.write_seconds = None       # Histogram opsional (workers.metrics), latency per flush
+
+        self.conn = None
+        self._thread = threading.Thread(target=self._run, name="db-writer", daemon=True)
+        self._thread.start()
+
+    # ---------- API dari frame loop (non-blocking) ----------
+    def log_event_and_counts(self, stream_id: int, area_id: int, track_id: int, direction: str, ts=None):
+        ts = ts or datetime.now(timezone.utc)
+        window_start = ts.replace(second=0, microsecond=0)
+        dir_l = direction.lower()
+        key = (int(stream_id), int(area_id), window_start)
+        with self._lock:
+            if len(self._events) >= self.max_pending:
+                self._events.popleft()
+                self.dropped_events += 1
+            self._events.append((int(stream_id), int(area_id), int(track_id), ts, direction.upper()))
+            self._tracks.add((int(track_id), int(stream_id)))
+            agg = self._counts.setdefault(key, [0, 0])
+            if dir_l == 'enter':
+                agg[0] += 1
+            elif dir_l == 'exit':
+                agg[1] += 1
+            if len(self._events) >= self.batch_size:
+                self._lock.notify()
+
+    def upsert_live(self, stream_id: int, area_id: int, current_inside: int):
+        key = (int(stream_id), int(area_id))
+        value = int(current_inside)
+        with self._lock:
+            if self._live_sent.get(key) == value and key not in self._live:
+                return      # tidak berubah -> tidak perlu UPSERT / NOTIFY
+            self._live[key] = value
+            self._lock.notify()     # occupancy berubah -> flush segera
+
+    @property
+    def pending(self):
+        with self._lock:
+            return len(self._events)
+
+    def close(self, timeout: float = 10.0):
+        """Flush terakhir lalu tutup koneksi (menunggu maksimal `timeout` detik)."""
+        with self._lock:
+            self._closing = True
+            self._lock.notify()
+        self._thread.join(timeout)
+        try:
+            if self.conn:
+                self.conn.close()
+        except Exception:
+            pass
+
+    # ---------- background thread ----------
+    def _connect(self):
+        try:
+            self.conn = psycopg2.connect(
+                host=_env("DB_HOST", "localhost"),
+                port=_env("DB_PORT", "5432"),
+                dbname=_env("DB_NAME", "people_counting"),
+                user=_env("DB_USER", "postgres"),
+                password=_env("DB_PASSWORD", ""),
+                connect_timeout=5,
+            )
+        except Exception as e:
+            print(f"[DB] connect failed: {e}")
+            self.conn = None
+        return self.conn is not None
+
+    def _take_batch(self):
+        events = [self._events.popleft() for _ in range(min(len(self._events), self.batch_size * 10))]
+        tracks, self._tracks = self._tracks, set()
+        counts, self._counts = self._counts, {}
+        live, self._live = self._live, {}
+        return events, tracks, counts, live
+
+    def _restore_batch(self, events, tracks, counts, live):
+        """Gagal flush: kembalikan batch ke depan buffer (tetap dalam batas max_pending)."""
+        self._events.extendleft(reversed(events))
+        while len(self._events) > self.max_pending:
+            self._events.popleft()
+            self.dropped_events += 1
+        self._tracks |= tracks
+        for key, (en, ex) in counts.items():
+            agg = self._counts.setdefault(key, [0, 0])
+            agg[0] += en; agg[1] += ex
+        for key, value in live.items():
+            self._live.setdefault(key, value)   # nilai yang lebih baru menang
+
+    def _has_work(self):
+        """Panggil dengan self._lock dipegang."""
+        return bool(self._events or self._counts or self._live)
+
+    def _write(self, events, tracks, counts, live):
+        cur = self.conn.cursor()
+        try:
+            if tracks:
+                execute_values(
+                    cur,
+                    "INSERT INTO tracks (track_id, stream_id) VALUES %s ON CONFLICT (track_id) DO NOTHING",
+                    sorted(tracks),
+                )
+            if events:
+                execute_values(
+                    cur,
+                    "INSERT INTO area_events (stream_id, area_id, track_id, ts, direction) VALUES %s",
+                    events,
+                    page_size=1000,
+                )
+            if counts:
+                rows = [
+                    (sid, aid, ws, ws + timedelta(minutes=1), en, ex)
+                    for (sid, aid, ws), (en, ex) in sorted(counts.items())
+                ]
+                execute_values(
+                    cur,
+                    """
+                    INSERT INTO area_counts (stream_id, area_id, window_start, window_end, enters, exits)
+                    VALUES %s
+                    ON CONFLICT (stream_id, area_id, window_start, window_end)
+                    DO UPDATE SET enters = area_counts.enters + EXCLUDED.enters,
+                                  exits  = area_counts.exits  + EXCLUDED.exits
+                    """,
+                    rows,
+                )
+            if live:
+                execute_values(
+                    cur,
+                    """
+                    INSERT INTO area_live (stream_id, area_id, current_inside, updated_at)
+                    VALUES %s
+                    ON CONFLICT (stream_id, area_id)
+                    DO UPDATE SET current_inside = EXCLUDED.current_inside,
+                                  updated_at     = NOW()
+                    """,
+                    [(sid, aid, v) for (sid, aid), v in sorted(live.items())],
+                    template="(%s, %s, %s, NOW())",
+                )
+            if self.notify and (events or live):
+                now = datetime.now(timezone.utc)
+                messages = [event_message(*ev) for ev in events]
+                messages += [live_message(sid, aid, v, now) for (sid, aid), v in sorted(live.items())]
+                publish_notifications(cur, messages)
+            self.conn.commit()
+        finally:
+            cur.close()
+
+    def _flush_once(self):
+        with self._lock:
+            if not self._has_work():
+                return True
+            batch = self._take_batch()
+
+        if (self.conn is None or self.conn.closed) and not self._connect():
+            with self._lock:
+                self._restore_batch(*batch)
+            return False
+        t0 = time.perf_counter()
+        try:
+            self._write(*batch)
+        except Exception as e:
+            print(f"[DB] batch flush failed ({len(batch[0])} events): {e}")
+            self.failed_flushes += 1
+            try:
+                self.conn.rollback()
+            except Exception:
+                try:
+                    self.conn.close()
+                except Exception:
+                    pass
+                self.conn = None
+            with self._lock:
+                self._restore_batch(*batch)
+            return False
+
+        self.last_flush_s = time.perf_counter() - t0
+        if self.write_seconds is not None:
+            self.write_seconds.observe(self.last_flush_s)
+        with self._lock:
+            self.flushed_events += len(batch[0])
+            self._live_sent.update(batch[3])
+        return True
+
+    def _run(self):
+        backoff = 0.0
+        close_attempts = 0
+        while True:
+            with self._lock:
+                if backoff > 0:
+                    # DB bermasalah: tunggu backoff penuh, hanya close() yang memotong
+                    deadline = time.monotonic() + backoff
+                    while not self._closing:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            break
+                        self._lock.wait(remaining)
+                elif not self._closing and len(self._events) < self.batch_size and not self._live:
+                    self._lock.wait(self.flush_interval)
+                closing = self._closing
+
+            ok = self._flush_once()
+            # sisa event (batch besar) langsung di-flush lagi tanpa menunggu
+            while ok and self.pending >= self.batch_size:
+                ok = self._flush_once()
+
+            if ok:
+                backoff = 0.0
+            else:
+                backoff = min(max(backoff * 2, 1.0), self.max_backoff)
+
+            if closing:
+                with self._lock:
+                    drained = not self._has_work()
+                if ok and drained:
+                    return
+                close_attempts += 1
+                if close_attempts >= 3:
+                    print(f"[DB] closing with {self.pending} unflushed events")
+                    return
+                backoff = 0.5
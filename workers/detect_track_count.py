@@ -1,9 +1,8 @@
 # workers/detect_track_count.py
-import os, time, json, argparse
+import os, time, json, argparse, threading
 from pathlib import Path
 import cv2
 import numpy as np
-from ultralytics import YOLO
 import sys
 from datetime import datetime, timezone
 
@@ -13,6 +12,20 @@ if str(REPO_ROOT) not in sys.path:
     sys.path.insert(0, str(REPO_ROOT))
 
 from workers.trackers.centroid import CentroidTracker
+from workers.trackers.array_centroid import ArrayCentroidTracker
+from workers.trackers.kalman import KalmanCentroidTracker
+from workers.pipeline import BlockingQueue, LatestQueue, RatePacer, start_stage
+from workers.geometry import (
+    geometry_cache_path, get_polygon_geometry, load_geometry_cache, save_geometry_cache,
+)
+from workers.db_writer import BatchedDBLogger, event_message, live_message, publish_notifications
+from workers.frame_ring import RING_FILENAME, FrameRingWriter, retire_ring
+from workers.overlay import get_overlay_renderer
+from workers.scheduler import MotionScheduler
+from workers.tiling import TiledROI
+from workers.detector import add_detector_args, load_detector_async
+from workers.metrics import SNAPSHOT_FILENAME, MetricsExporter, MetricsRegistry, WorkerMetrics, instrument_dblogger
+from workers.startup import StartupTimer
 
 # ---------- DB loader (opsional) ----------
 import psycopg2
@@ -64,6 +77,8 @@ class DBLogger:
     """Helper untuk menulis ENTER/EXIT ke DB: area_events + agregasi per-menit ke area_counts (tanpa area_live)."""
     def __init__(self):
         self.conn = None
+        self._live_sent = {}    # (stream_id, area_id) -> current_inside terakhir yang ditulis
+        self.write_seconds = None   # Histogram opsional (workers.metrics), latency per query
         self._connect()
 
     def _connect(self):
@@ -106,14 +121,15 @@ class DBLogger:
             except Exception:
                 pass
 
-    def log_event_and_counts(self, stream_id: int, area_id: int, track_id: int, direction: str):
+    def log_event_and_counts(self, stream_id: int, area_id: int, track_id: int, direction: str, ts=None):
         """
-        direction: 'enter' | 'exit'
+        direction: 'enter' | 'exit'; ts: datetime event (None = NOW())
         - Insert baris ke area_events (kolom: stream_id, area_id, track_id, ts, direction)
         - Upsert agregasi per-menit ke area_counts (kolom: window_start, window_end, enters, exits)
         """
         if not self._ensure():
             return
+        t0 = time.perf_counter()
         try:
             direction_db = direction.upper()
             dir_l = direction.lower()
@@ -124,14 +140,17 @@ class DBLogger:
             cur.execute(
                 """
                 INSERT INTO area_events (stream_id, area_id, track_id, ts, direction)
-                VALUES (%s, %s, %s, NOW(), %s)
+                VALUES (%s, %s, %s, COALESCE(%s::timestamptz, NOW()), %s)
+                RETURNING ts
                 """,
-                (stream_id, area_id, int(track_id), direction_db),
+                (stream_id, area_id, int(track_id), ts, direction_db),
             )
+            (ts,) = cur.fetchone()
+            publish_notifications(cur, [event_message(stream_id, area_id, int(track_id), ts, direction_db)])
 
             # 2) Upsert per-menit ke area_counts
-            #    window_start = awal menit sekarang, window_end = +1 menit
-            cur.execute("SELECT date_trunc('minute', NOW())")
+            #    window_start = awal menit event, window_end = +1 menit
+            cur.execute("SELECT date_trunc('minute', %s::timestamptz)", (ts,))
             (win_start,) = cur.fetchone()
             cur.execute("SELECT %s + interval '1 minute'", (win_start,))
             (win_end,) = cur.fetchone()
@@ -157,6 +176,8 @@ class DBLogger:
                     (stream_id, area_id, win_start, win_end),
                 )
             cur.close()
+            if self.write_seconds is not None:
+                self.write_seconds.observe(time.perf_counter() - t0)
         except Exception as e:
             print(f"[DB] log_event_and_counts failed: {e}")
             try:
@@ -166,8 +187,12 @@ class DBLogger:
                 pass
 
     def upsert_live(self, stream_id: int, area_id: int, current_inside: int):
+        key = (int(stream_id), int(area_id))
+        if self._live_sent.get(key) == int(current_inside):
+            return  # tidak berubah -> tidak perlu UPSERT / NOTIFY
         if not self._ensure():
             return
+        t0 = time.perf_counter()
         try:
             cur = self.conn.cursor()
             cur.execute("""
@@ -176,8 +201,14 @@ class DBLogger:
                 ON CONFLICT (stream_id, area_id)
                 DO UPDATE SET current_inside = EXCLUDED.current_inside,
                               updated_at     = NOW()
+                RETURNING updated_at
             """, (int(stream_id), int(area_id), int(current_inside)))
+            (updated_at,) = cur.fetchone()
+            publish_notifications(cur, [live_message(key[0], key[1], int(current_inside), updated_at)])
             cur.close()
+            self._live_sent[key] = int(current_inside)
+            if self.write_seconds is not None:
+                self.write_seconds.observe(time.perf_counter() - t0)
         except Exception as e:
             print(f"[DB] upsert_live failed: {e}")
             try:
@@ -194,73 +225,814 @@ class DBLogger:
         except Exception:
             pass
 
+def make_dblogger(args):
+    """--db-writer batched (default): write-behind, non-blocking; sync: DBLogger lama (inline)."""
+    if not args.db_log:
+        return None
+    if args.db_writer == "sync":
+        return DBLogger()
+    return BatchedDBLogger(batch_size=args.db_batch_size, flush_interval=args.db_flush_interval)
+
 # ---------- utils ----------
 def poly_norm_to_px(poly_norm, W, H):
     pts = (np.asarray(poly_norm, np.float32) * np.array([W, H], np.float32)).astype(int)
     return pts.reshape((-1, 1, 2))
 
-def atomic_write_jpeg(path: str, bgr_image, quality: int = 70):
-    ok, buf = cv2.imencode(".jpg", bgr_image, [int(cv2.IMWRITE_JPEG_QUALITY), int(quality)])
-    if not ok:
-        return
+def atomic_write_bytes(path: str, data):
     tmp = path + ".tmp"
     with open(tmp, "wb") as f:
-        f.write(buf.tobytes())
+        f.write(data)
         f.flush()
         os.fsync(f.fileno())
     os.replace(tmp, path)
 
-# --- geometry helpers ---
-def _ccw(A, B, C):
-    return (C[1]-A[1])*(B[0]-A[0]) > (B[1]-A[1])*(C[0]-A[0])
-
-def _seg_intersect(A, B, C, D):
-    # True jika segmen AB memotong segmen CD
-    return _ccw(A, C, D) != _ccw(B, C, D) and _ccw(A, B, C) != _ccw(A, B, D)
-
-def crossed_boundary(p_prev, p_now, poly_px):
-    """Return True jika garis p_prev→p_now memotong salah satu sisi polygon."""
-    if p_prev is None or p_now is None:
-        return False
-    pts = poly_px.reshape(-1, 2)
-    n = len(pts)
-    for i in range(n):
-        C = tuple(pts[i])
-        D = tuple(pts[(i+1) % n])
-        if _seg_intersect(tuple(p_prev), tuple(p_now), C, D):
+class FrameSink:
+    """
+    Tujuan frame hasil render untuk API (MJPEG):
+      ring : ring buffer mmap `latest.ring` (tanpa fsync, dibaca API lewat mmap)
+      file : latest.jpg via write + fsync + os.replace (fallback lama)
+      both : keduanya
+
+    due() memutuskan apakah frame ini perlu dirender sama sekali:
+      render=always    : selalu (dibatasi render_fps)
+      render=on-demand : hanya kalau API melaporkan ada viewer lewat ring;
+                         tanpa ring (transport=file) tidak bisa tahu -> selalu
+      render=off       : tidak pernah (headless, counting saja)
+    Counting tidak bergantung pada hasil due().
+    """
+    def __init__(self, outdir: str, transport: str = "file", quality: int = 70,
+                 render: str = "always", render_fps: float = 0.0, render_scale: float = 1.0):
+        self.quality = int(quality)
+        self.latest_path = os.path.join(outdir, "latest.jpg")
+        ring_path = os.path.join(outdir, RING_FILENAME)
+        self.write_file = transport in ("file", "both")
+        if transport in ("ring", "both"):
+            self.ring = FrameRingWriter(ring_path)
+        else:
+            self.ring = None
+            retire_ring(ring_path)   # jangan biarkan API membaca ring basi dari run sebelumnya
+        self.render = render
+        self.render_scale = float(render_scale)
+        self._min_interval = 1.0 / render_fps if render_fps and render_fps > 0 else 0.0
+        self._last_render = 0.0
+        self.skipped = 0
+
+    def has_viewers(self) -> bool:
+        if self.render == "off":
+            return False
+        if self.render == "always" or self.ring is None:
             return True
-    return False
+        return self.ring.viewers() > 0
+
+    def due(self) -> bool:
+        """True kalau frame saat ini perlu dirender + di-encode."""
+        if not self.has_viewers():
+            self.skipped += 1
+            return False
+        now = time.monotonic()
+        if now - self._last_render < self._min_interval:
+            self.skipped += 1
+            return False
+        self._last_render = now
+        return True
+
+    def write(self, bgr_image):
+        ok, buf = cv2.imencode(".jpg", bgr_image, [int(cv2.IMWRITE_JPEG_QUALITY), self.quality])
+        if not ok:
+            return
+        if self.ring is not None:
+            self.ring.write(buf)
+        if self.write_file:
+            atomic_write_bytes(self.latest_path, buf.tobytes())
 
-def inside_with_margin(poly_px, pt, margin_px: float = 0.0):
-    # gunakan measureDist=True agar dapat jarak signed; >=0 = inside/on-edge
-    dist = cv2.pointPolygonTest(poly_px, pt, True)  # signed distance (px)
-    return dist >= -float(margin_px)
+    def close(self):
+        if self.ring is not None:
+            self.ring.close(retire=True)
 
-# --- helper: rasio area bbox di dalam polygon (sampling grid) ---
-def bbox_inside_ratio(poly_px, box, margin=0.0, grid=4):
+def make_frame_sink(outdir: str, args):
+    return FrameSink(outdir, args.frame_transport, render=args.render,
+                     render_fps=args.render_fps, render_scale=args.render_scale)
+
+def build_polygon_geometry(poly_norm, W, H, args):
+    """
+    Polygon ternormalisasi -> (poly_px, roi_rect, mask) untuk resolusi W x H.
+    Menerapkan --poly-pad (dilate) dan --roi-scale.
+
+    Dengan --geometry-cache, hasilnya (plus SDF PolygonGeometry) dibaca dari /
+    ditulis ke .npz per (polygon, resolusi, poly_pad, roi_scale); saat cache hit,
+    get_polygon_geometry() berikutnya langsung memakai SDF dari disk.
+    """
+    if not args.geometry_cache:
+        return _derive_polygon_geometry(poly_norm, W, H, args)
+    path = geometry_cache_path(args.geometry_cache, poly_norm, W, H,
+                               poly_pad=int(args.poly_pad or 0), roi_scale=float(args.roi_scale or 0))
+    cached = load_geometry_cache(path)
+    if cached is not None:
+        poly_px, mask = cached["poly_px"], cached["mask"]
+        get_polygon_geometry(poly_px, mask, cached["sdf"])
+        return poly_px, tuple(int(v) for v in cached["roi_rect"]), mask
+
+    poly_px, roi_rect, mask = _derive_polygon_geometry(poly_norm, W, H, args)
+    geometry = get_polygon_geometry(poly_px, mask)
+    try:
+        save_geometry_cache(path, poly_px=poly_px, roi_rect=np.asarray(roi_rect), mask=mask, sdf=geometry.sdf)
+    except OSError as e:
+        print(f"[WARN] gagal menyimpan cache geometri {path}: {e}")
+    return poly_px, roi_rect, mask
+
+def _derive_polygon_geometry(poly_norm, W, H, args):
+    poly_px = poly_norm_to_px(poly_norm, W, H)
+
+    # polygon padding (opsional): melebar pakai dilate mask
+    if args.poly_pad and args.poly_pad > 0:
+        m = np.zeros((H, W), np.uint8)
+        cv2.fillPoly(m, [poly_px], 255)
+        k = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (args.poly_pad*2+1, args.poly_pad*2+1))
+        m = cv2.dilate(m, k, iterations=1)
+        cnts,_ = cv2.findContours(m, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        if cnts:
+            poly_px = max(cnts, key=cv2.contourArea)
+
+    # ROI bounding box dari polygon
+    x, y, w, h = cv2.boundingRect(poly_px)
+
+    # ROI scale (padding di sekeliling bbox)
+    if args.roi_scale and args.roi_scale > 1.0:
+        cx, cy = x + w/2, y + h/2
+        nw, nh = int(w * args.roi_scale), int(h * args.roi_scale)
+        x = max(int(cx - nw/2), 0); y = max(int(cy - nh/2), 0)
+        w = min(nw, W - x); h = min(nh, H - y)
+    roi_rect = (x, y, w, h)
+
+    # mask untuk gelapkan luar polygon
+    mask = np.zeros((H, W), np.uint8)
+    cv2.fillPoly(mask, [poly_px], 255)
+    return poly_px, roi_rect, mask
+
+def build_tracker(args):
+    """--tracker array (default): vektorisasi + Hungarian; kalman: + motion model; centroid: greedy lama."""
+    if args.tracker == "kalman":
+        return KalmanCentroidTracker(max_distance=args.trk_max_dist, max_miss=args.trk_max_miss,
+                                     process_noise=args.kf_process_noise, measure_noise=args.kf_measure_noise)
+    if args.tracker == "centroid":
+        return CentroidTracker(max_distance=args.trk_max_dist, max_miss=args.trk_max_miss)
+    return ArrayCentroidTracker(max_distance=args.trk_max_dist, max_miss=args.trk_max_miss)
+
+def build_scheduler(roi_rect, geometry, args):
+    """--scheduler motion: MotionScheduler per stream; fixed (default): None -> pakai --frame-skip."""
+    if args.scheduler != "motion":
+        return None
+    return MotionScheduler(roi_rect, geometry, thresh=args.motion_thresh, min_area=args.motion_min_area,
+                           edge_band=args.motion_edge_band, idle_fps=args.motion_idle_fps,
+                           max_gap=args.motion_max_gap)
+
+def build_tiler(roi_rect, geometry, args):
+    """--tile-size > 0: inference per tile resolusi asli (menggantikan --roi-upscale); 0 = ROI utuh."""
+    if args.tile_size <= 0:
+        return None
+    tiler = TiledROI(roi_rect, args.tile_size, overlap=args.tile_overlap, geometry=geometry,
+                     margin_px=args.tile_margin, merge_ios=args.tile_merge_ios)
+    print(f"[INFO] tiled inference: {len(tiler)} tile {args.tile_size}px (overlap={args.tile_overlap}) "
+          f"untuk ROI {roi_rect[2]}x{roi_rect[3]}")
+    return tiler
+
+def should_infer(scheduler, frame, frame_idx, args, now=None):
+    """Keputusan inference per frame: motion scheduler, atau throttle modulo --frame-skip."""
+    if scheduler is not None:
+        return scheduler.decide(frame, now)
+    return args.frame_skip <= 0 or (frame_idx % (args.frame_skip + 1)) == 1
+
+def skipped_detections(scheduler, last_detections, tracker):
     """
-    Perkiraan rasio area bbox yang berada di dalam polygon.
-    Sampling grid (grid x grid) dan hitung proporsi titik yg inside.
-    box = (x1,y1,x2,y2)
+    Input tracker untuk frame tanpa inference (None = cukup tracker.predict()):
+    - tracker dengan motion model (--tracker kalman): posisi diprediksi, kecuali
+      motion scheduler menilai scene diam (deteksi terakhir masih berlaku);
+    - --frame-skip dengan tracker lain: [] (tracker decay);
+    - motion scheduler: deteksi terakhir.
     """
-    x1, y1, x2, y2 = box
-    x1 = max(int(x1), 0); y1 = max(int(y1), 0)
-    x2 = int(x2); y2 = int(y2)
-    if x2 <= x1 or y2 <= y1:
+    if hasattr(tracker, "predict") and (scheduler is None or scheduler.level == "motion"):
+        return None
+    return last_detections if scheduler is not None else []
+
+def update_tracks(tracker, detections):
+    """detections None = frame tanpa inference -> posisi prediksi motion model."""
+    if detections is None:
+        return tracker.predict()
+    return tracker.update(detections)
+
+# ---------- detection ----------
+def iou(a, b):
+    """IoU sederhana antara dua bbox (x1,y1,x2,y2,...)."""
+    ax1, ay1, ax2, ay2 = a[:4]; bx1, by1, bx2, by2 = b[:4]
+    inter_x1, inter_y1 = max(ax1, bx1), max(ay1, by1)
+    inter_x2, inter_y2 = min(ax2, bx2), min(ay2, by2)
+    iw, ih = max(0, inter_x2 - inter_x1), max(0, inter_y2 - inter_y1)
+    inter = iw * ih
+    if inter <= 0:
         return 0.0
-    gx = max(int(grid), 1); gy = gx
-    inside = 0; total = gx * gy
-    for i in range(gx):
-        for j in range(gy):
-            # sample di pusat sel grid
-            sx = x1 + (i + 0.5) * (x2 - x1) / gx
-            sy = y1 + (j + 0.5) * (y2 - y1) / gy
-            if inside_with_margin(poly_px, (sx, sy), margin):
-                inside += 1
-    return inside / float(total)
+    area_a = (ax2 - ax1) * (ay2 - ay1)
+    area_b = (bx2 - bx1) * (by2 - by1)
+    return inter / (area_a + area_b - inter + 1e-6)
+
+def prepare_roi(frame, roi_rect, args):
+    """Crop ROI polygon dari frame (plus upscale opsional) sebagai input YOLO."""
+    x, y, w, h = roi_rect
+
+    # ambil ROI dari bbox polygon
+    roi = frame[y:y+h, x:x+w]
+    infer_img = roi
+
+    # (opsional) upscale ROI agar objek kecil lebih “terlihat”
+    if args.roi_upscale and args.roi_upscale > 1.0:
+        infer_img = cv2.resize(
+            roi, None, fx=args.roi_upscale, fy=args.roi_upscale, interpolation=cv2.INTER_CUBIC
+        )
+    return infer_img
+
+def parse_detections(result, roi_rect, args):
+    """
+    Ubah satu hasil YOLO (untuk satu ROI) menjadi list deteksi person
+    (koordinat global, cx/cy = bottom-center) yang sudah difilter dari rider.
+    """
+    x, y = roi_rect[:2]
+    persons, riders = [], []  # riders = gabungan bbox bicycle & motorcycle (proxy untuk pemotor/pesepeda)
+
+    if result.boxes is not None:
+        for b in result.boxes:
+            cls = int(b.cls[0])
+            x1, y1, x2, y2 = map(int, b.xyxy[0])
+
+            # scale back jika ROI di-upscale
+            if args.roi_upscale and args.roi_upscale > 1.0:
+                s = args.roi_upscale
+                x1 = int(x1 / s); y1 = int(y1 / s)
+                x2 = int(x2 / s); y2 = int(y2 / s)
+
+            # koordinat global
+            gx1, gy1, gx2, gy2 = x + x1, y + y1, x + x2, y + y2
+
+            if cls == 0:  # person
+                persons.append((gx1, gy1, gx2, gy2, float(b.conf[0])))
+            elif cls in (1, 3):  # bicycle atau motorcycle
+                riders.append((gx1, gy1, gx2, gy2))
+    return build_detections(persons, riders, args)
+
+def parse_tiled_detections(results, tiler, args):
+    """Hasil YOLO semua tile satu stream -> NMM lintas tile -> list deteksi person."""
+    boxes, confs, classes = tiler.merge(results)
+    persons, riders = [], []
+    for (x1, y1, x2, y2), conf, cls in zip(boxes.astype(int).tolist(), confs.tolist(), classes.tolist()):
+        if cls == 0:
+            persons.append((x1, y1, x2, y2, conf))
+        elif cls in (1, 3):
+            riders.append((x1, y1, x2, y2))
+    return build_detections(persons, riders, args)
+
+def build_detections(persons, riders, args):
+    """Filter rider lalu bentuk dict deteksi (cx/cy = bottom-center)."""
+    # buang 'person' yang overlap signifikan dengan kendaraan (indikasi rider)
+    clean_persons = []
+    for p in persons:
+        max_iou = max((iou(p, r) for r in riders), default=0.0)
+        if max_iou < args.rider_iou_th:
+            clean_persons.append(p)
+
+    detections = []
+    for gx1, gy1, gx2, gy2, _conf in clean_persons:
+        # (opsional) pakai bottom-center utk lebih stabil menyentuh ground
+        cx = (gx1 + gx2) // 2
+        cy = gy2  # bottom-center y
+        detections.append({
+            "x1": gx1, "y1": gy1, "x2": gx2, "y2": gy2,
+            "cx": cx, "cy": cy
+        })
+    return detections
+
+def predict_rois(model, images, args, imgsz=None):
+    """
+    Satu panggilan model.predict untuk satu atau beberapa ROI / tile sekaligus (batch).
+    0=person, 1=bicycle, 3=motorcycle (dataset COCO)
+    """
+    return model.predict(
+        images, imgsz=imgsz or args.imgsz, conf=args.conf, classes=[0, 1, 3], iou=0.5, verbose=False
+    )
+
+def detect_persons(model, frame, roi_rect, args, tiler=None):
+    """Jalankan YOLO pada ROI polygon (utuh, atau per tile bila ada tiler) lalu kembalikan deteksi person."""
+    if tiler is not None:
+        results = predict_rois(model, tiler.crops(frame), args, imgsz=tiler.imgsz)
+        return parse_tiled_detections(results, tiler, args)
+    results = predict_rois(model, prepare_roi(frame, roi_rect, args), args)
+    detections = []
+    for r in results:
+        detections.extend(parse_detections(r, roi_rect, args))
+    return detections
+
+def warmup_images(roi_rect, args, tiler=None):
+    """Input dummy (hitam) dengan ukuran yang sama persis dengan input inference asli."""
+    if tiler is not None:
+        return [np.zeros((th, tw, 3), np.uint8) for _tx, _ty, tw, th in tiler.tiles]
+    x, y, w, h = roi_rect
+    return [prepare_roi(np.zeros((y + h, x + w, 3), np.uint8), roi_rect, args)]
+
+def warmup_model(model, images, args, imgsz=None):
+    """
+    Inference dummy sebelum frame pertama: setup graph/allocator/letterbox
+    buffer dibayar di sini, bukan oleh frame pertama yang dihitung.
+    """
+    images = [im for im in images if im.size]
+    if not images or args.warmup_runs <= 0:
+        return
+    for _ in range(args.warmup_runs):
+        predict_rois(model, images, args, imgsz=imgsz)
+
+# ---------- counting ----------
+class PolygonCounter:
+    """
+    State ENTER/EXIT per track terhadap polygon.
+    Dipakai bersama oleh mode serial dan mode pipeline.
+    """
+    def __init__(self, geometry, args, dblogger=None):
+        self.geometry = geometry
+        self.poly_px = geometry.poly_px
+        self.args = args
+        self.dblogger = dblogger
+        self.inside_state = {}
+        self.prev_pos = {}
+        self.enter_count, self.exit_count = 0, 0
+        self.current_inside_ids = set()
+        self.entered_ids, self.exited_ids = set(), set()
+        self.enter_streak, self.exit_streak = {}, {}
+        # indeks sisi polygon -> [enters, exits] (label pintu masuk/keluar)
+        self.edge_counts = {}
+        # timestamp event (replay: dari PTS frame); None = waktu sekarang
+        self.event_ts = None
+
+    @property
+    def current_inside(self):
+        return len(self.current_inside_ids)
+
+    def reset(self):
+        """Reset state ketika loop ulang video MP4."""
+        self.inside_state.clear()
+        self.prev_pos.clear()
+        self.current_inside_ids.clear()
+        self.entered_ids.clear()
+        self.exited_ids.clear()
+        self.enter_count = 0
+        self.exit_count  = 0
+        self.enter_streak.clear()
+        self.exit_streak.clear()
+        self.edge_counts.clear()
+
+    def _log(self, tid, direction):
+        args = self.args
+        if self.dblogger and args.stream_id is not None and args.area_id is not None:
+            self.dblogger.log_event_and_counts(args.stream_id, args.area_id, tid, direction, ts=self.event_ts)
+
+    def _count(self, tid, direction, edge=-1):
+        """Catat ENTER/EXIT sekali per track (+ label sisi polygon bila diketahui)."""
+        if direction == 'enter':
+            if tid in self.entered_ids:
+                return
+            self.enter_count += 1
+            self.entered_ids.add(tid)
+        else:
+            if tid in self.exited_ids:
+                return
+            self.exit_count += 1
+            self.exited_ids.add(tid)
+        if edge >= 0:
+            self.edge_counts.setdefault(edge, [0, 0])[0 if direction == 'enter' else 1] += 1
+        self._log(tid, direction)
+
+    def update(self, tracked, frame_idx):
+        args = self.args
+        inside_state, prev_pos = self.inside_state, self.prev_pos
+
+        if args.count_mode == "ratio":
+            new_inside_ids = self._update_ratio(tracked, frame_idx)
+        else:
+            new_inside_ids = self._update_centroid(tracked, frame_idx)
+
+        # replace set aktif
+        self.current_inside_ids = new_inside_ids
+        current_inside = len(self.current_inside_ids)
+
+        # Upsert live occupancy ke DB (opsional)
+        if self.dblogger and args.db_log and args.stream_id is not None and args.area_id is not None:
+            self.dblogger.upsert_live(args.stream_id, args.area_id, current_inside)
+
+        # ---------- D) Housekeeping ----------
+        active_ids = {t["id"] for t in tracked}
+
+        for tid in list(inside_state.keys()):
+            if tid not in active_ids:
+                inside_state.pop(tid, None)
+                prev_pos.pop(tid, None)
+                self.enter_streak.pop(tid, None)
+                self.exit_streak.pop(tid, None)
+
+        self.current_inside_ids.intersection_update(active_ids)
+        return current_inside
+
+    def _update_ratio(self, tracked, frame_idx):
+        """
+        Mode --count-mode ratio: rasio luas bbox di dalam polygon (summed-area
+        table, O(1) per box) + hysteresis --in-ratio-in / --in-ratio-out dan
+        konfirmasi --confirm-frames frame berturut-turut.
+        """
+        args = self.args
+        inside_state, prev_pos = self.inside_state, self.prev_pos
+        boxes = [(t["x1"], t["y1"], t["x2"], t["y2"]) for t in tracked]
+        ratios = self.geometry.inside_ratio(boxes, args.poly_margin).tolist()
+        confirm = max(int(args.confirm_frames), 1)
+
+        new_inside_ids = set()
+        for t, ratio in zip(tracked, ratios):
+            tid = t["id"]
+
+            if tid not in inside_state:
+                # track baru: state awal langsung dari rasio, tanpa event
+                is_inside = ratio >= args.in_ratio_in
+            else:
+                is_inside = prev_inside = inside_state[tid]
+                if not prev_inside:
+                    # outside -> inside butuh ratio >= in_ratio_in selama N frame
+                    streak = self.enter_streak.get(tid, 0) + 1 if ratio >= args.in_ratio_in else 0
+                    self.enter_streak[tid] = streak
+                    if streak >= confirm:
+                        is_inside = True
+                        self.enter_streak[tid] = 0
+                        self._count(tid, 'enter')
+                else:
+                    # inside -> outside butuh ratio < in_ratio_out selama N frame
+                    streak = self.exit_streak.get(tid, 0) + 1 if ratio < args.in_ratio_out else 0
+                    self.exit_streak[tid] = streak
+                    if streak >= confirm:
+                        is_inside = False
+                        self.exit_streak[tid] = 0
+                        self._count(tid, 'exit')
+
+                if args.debug_cross and (is_inside != prev_inside or frame_idx % 30 == 0):
+                    print(
+                        f"[ratio] id={tid} ratio={ratio:.2f} inside_prev={prev_inside} inside_now={is_inside} "
+                        f"enter_streak={self.enter_streak.get(tid, 0)} exit_streak={self.exit_streak.get(tid, 0)}"
+                    )
+
+            inside_state[tid] = is_inside
+            prev_pos[tid] = (t["cx"], t["cy"])
+            if is_inside:
+                new_inside_ids.add(tid)
+        return new_inside_ids
+
+    def _update_centroid(self, tracked, frame_idx):
+        """Mode default: centroid (bottom-center) + margin + crossing tepi polygon."""
+        args = self.args
+        inside_state, prev_pos = self.inside_state, self.prev_pos
+
+        # jarak bertanda ke tepi utk posisi now & prev SEMUA track sekaligus (lookup SDF);
+        # titik di sekitar ambang margin dihitung eksak agar semantik margin tetap sama
+        n = len(tracked)
+        now_pts = [(t["cx"], t["cy"]) for t in tracked]
+        has_prev = [t["id"] in prev_pos for t in tracked]
+        prev_pts = [prev_pos.get(t["id"], p) for t, p in zip(tracked, now_pts)]
+        thresholds = (0.0, -float(args.poly_margin), float(args.cross_margin), -float(args.cross_margin))
+        dists = self.geometry.signed_distance(now_pts + prev_pts, thresholds).tolist()
+        dist_now_all, prev_dist_all = dists[:n], dists[n:]
+
+        # segmen prev→now vs semua sisi polygon, untuk semua track dalam satu hitungan NumPy
+        crossed_all, edge_all = self.geometry.crossings(prev_pts, now_pts)
+        crossed_all, edge_all = crossed_all.tolist(), edge_all.tolist()
+
+        # bangun ulang daftar ID yang benar-benar masih "inside" untuk frame ini
+        new_inside_ids = set()
+
+        for i, t in enumerate(tracked):
+            tid, cx, cy = t["id"], t["cx"], t["cy"]  # pakai cx,cy dari bottom-center
+            dist_now = dist_now_all[i]
+            prev_dist = prev_dist_all[i] if has_prev[i] else None
+
+            # Revert: gunakan centroid + margin saja untuk status inside
+            prev_inside = inside_state.get(tid, False)
+            is_inside = dist_now >= -float(args.poly_margin)
+
+            # ambil posisi sebelumnya
+            px, py = prev_pts[i]
+            crossed, edge = crossed_all[i], edge_all[i]
+
+            # state berubah?
+            state_changed = (prev_inside != is_inside)
+
+            # crossing berbasis geometri garis ATAU berbasis jarak/toleransi di tepi (tanpa delta)
+            crossing_simple = False
+            if prev_dist is not None:
+                sign_flip = (prev_dist <= 0 < dist_now) or (prev_dist >= 0 > dist_now)
+                near_edge = (abs(prev_dist) <= args.cross_margin) or (abs(dist_now) <= args.cross_margin)
+                crossing_simple = state_changed and (sign_flip or near_edge)
+
+            # final keputusan crossing
+            crossing_ok = crossed or crossing_simple
+
+            # ENTER: outside -> inside
+            if not prev_inside and is_inside and crossing_ok:
+                self._count(tid, 'enter', edge)
+
+            # EXIT: inside -> outside
+            if prev_inside and not is_inside and crossing_ok:
+                self._count(tid, 'exit', edge)
+
+            # (opsional) debug yang lebih informatif
+            if args.debug_cross and (crossed or state_changed or frame_idx % 30 == 0):
+                print(
+                    f"[cross] id={tid} prev=({px:.0f},{py:.0f}) now=({cx:.0f},{cy:.0f}) "
+                    f"prev_dist={prev_dist if prev_dist is not None else 'NA'} now_dist={dist_now:.2f} "
+                    f"inside_prev={prev_inside} inside_now={is_inside} "
+                    f"seg_crossed={crossed} edge={edge} simple_cross={crossing_simple} => crossing_ok={crossing_ok}"
+                )
+
+            # update state (tetap SETELAH keputusan enter/exit)
+            inside_state[tid] = is_inside
+            prev_pos[tid] = (cx, cy)
+
+            if is_inside:
+                new_inside_ids.add(tid)
+        return new_inside_ids
+
+# ---------- render ----------
+def render_frame(frame, tracked, poly_px, mask, counts, hud_text, scale: float = 1.0):
+    """
+    Gelapkan luar area + polygon (layer statis via OverlayRenderer), lalu bbox + ID
+    dan HUD. counts=(enter, exit, inside).
+    Beberapa area dalam satu frame (worker multi-stream): poly_px = list polygon,
+    mask = gabungan mask, counts = list [(label, (enter, exit, inside)), ...].
+    scale < 1: output diperkecil sehingga gambar + encode lebih murah.
+    Hasil adalah buffer renderer yang dipakai ulang -> encode sebelum render berikutnya.
+    """
+    vis = get_overlay_renderer(poly_px, mask, scale).compose(frame)
+
+    for t in tracked:
+        # draw bbox + id (tetap)
+        x1, y1, x2, y2 = (int(t[k] * scale) for k in ("x1", "y1", "x2", "y2"))
+        cv2.rectangle(vis, (x1, y1), (x2, y2), (0, 255, 0), 2)
+        cv2.putText(vis, f"ID {t['id']}", (x1, y1 - 6),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 2)
+
+    # counter overlay (satu baris per area)
+    y = 28
+    for label, (enter_count, exit_count, current_inside) in (counts if isinstance(counts, list) else [("", counts)]):
+        cv2.putText(vis, f"{label}ENTER={enter_count} EXIT={exit_count} INSIDE={current_inside}",
+                (12, y), cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 0, 255), 2)
+        y += 28
+
+    # info kecil
+    cv2.putText(vis, hud_text, (12, y - 4), cv2.FONT_HERSHEY_SIMPLEX, 0.55, (255, 255, 255), 1)
+    return vis
+
+def hud_text(args, fps_ema):
+    return (f"{Path(args.model).name} img{args.imgsz} conf={args.conf:.2f} "
+            f"fpsSet={args.fps:.1f} fpsRun={fps_ema:.1f} skip={args.frame_skip} "
+            f"roiScale={args.roi_scale} " +
+            (f"tile={args.tile_size}" if args.tile_size > 0 else f"up={args.roi_upscale}"))
+
+class FpsMeter:
+    """EMA dari fps runtime (ditampilkan di HUD)."""
+    def __init__(self, alpha: float = 0.2):
+        self.alpha = alpha
+        self.value = 0.0
+        self._prev = time.perf_counter()
+
+    def tick(self):
+        now = time.perf_counter()
+        dt = now - self._prev
+        if dt > 0:
+            self.value = (1 - self.alpha) * self.value + self.alpha * (1.0 / dt)
+        self._prev = now
+        return self.value
+
+# ---------- run loops ----------
+def warmup_stage(model, roi_rect, tiler, args, startup=None):
+    """Warm-up model dengan input seukuran ROI / tile stream ini (sebelum frame pertama)."""
+    warmup_model(model, warmup_images(roi_rect, args, tiler), args, imgsz=tiler.imgsz if tiler else None)
+    if startup is not None:
+        startup.mark("warmup")
+
+def run_serial(cap, model, tracker, counter, roi_rect, mask, sink, args, metrics, startup=None):
+    """Loop klasik: decode -> infer -> track -> count -> render -> tulis, semuanya berurutan."""
+    pacer = RatePacer(args.fps)
+    fps = FpsMeter()
+    infer_fps = FpsMeter()
+    scheduler = build_scheduler(roi_rect, counter.geometry, args)
+    tiler = build_tiler(roi_rect, counter.geometry, args)
+    warmup_stage(model, roi_rect, tiler, args, startup)
+    frame_idx = 0
+    detections = []
+
+    metrics.watch_fps(infer_fps)
+    metrics.watch_sink(sink)
+    metrics.watch_counter(counter)
+    metrics.watch_scheduler(scheduler)
+    stage = metrics.stage
+    clock = time.perf_counter
+
+    while True:
+        t0 = clock()
+        ok, frame = cap.read()
+        if not ok:
+            # reset state ketika loop ulang video MP4
+            counter.reset()
+            if scheduler is not None:
+                scheduler.reset()
+            cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            continue
+        frame_idx += 1
+        t1 = clock()
+        stage["decode"].observe(t1 - t0)
+
+        # frame skipping (--frame-skip throttle atau motion scheduler)
+        if should_infer(scheduler, frame, frame_idx, args):
+            detections = detect_persons(model, frame, roi_rect, args, tiler)
+            frame_dets = detections
+            infer_fps.tick()
+            metrics.inferences.inc()
+            stage["infer"].observe(clock() - t1)
+        else:
+            frame_dets = skipped_detections(scheduler, detections, tracker)
+
+        # update tracking (tracker boleh handle empty → decay, None → predict)
+        t2 = clock()
+        tracked = update_tracks(tracker, frame_dets)
+        t3 = clock()
+        counter.update(tracked, frame_idx)
+        stage["track"].observe(t3 - t2)
+        stage["count"].observe(clock() - t3)
+        metrics.frames.inc()
+        metrics.tracks.set(len(tracked))
+        if startup is not None:
+            startup.first_count()
+            startup = None
+
+        # log count ke terminal tiap --log-every frame (default mati; angka yang sama ada di pc_* metrics)
+        if args.log_every and frame_idx % args.log_every == 0:
+            print(f"[Frame {frame_idx}] ENTER={counter.enter_count} EXIT={counter.exit_count} INSIDE={counter.current_inside}")
+
+        fps_ema = fps.tick()
+        if sink.due():
+            t4 = clock()
+            counts = (counter.enter_count, counter.exit_count, counter.current_inside)
+            vis = render_frame(frame, tracked, counter.poly_px, mask, counts,
+                               hud_text(args, fps_ema), scale=sink.render_scale)
+            t5 = clock()
+            # kirim frame ke API (ring buffer / latest.jpg)
+            sink.write(vis)
+            stage["render"].observe(t5 - t4)
+            stage["encode"].observe(clock() - t5)
+
+        # pace output (agar MJPEG stabil & tak berkedip)
+        pacer.wait()
+
+def run_pipeline(cap, model, tracker, counter, roi_rect, mask, sink, args, metrics, startup=None):
+    """
+    Mode pipeline: decode, inference, counting(+DB) dan render/encode di thread
+    terpisah. Hop decode -> infer dan count -> render memakai LatestQueue
+    (drop-oldest): inference selalu ambil frame terbaru dan render tidak pernah
+    mem-block counting. Hop infer -> count memakai BlockingQueue: hasil deteksi
+    tidak pernah dibuang (tracker/counter harus melihat setiap frame yang
+    di-infer), kalau counting/DB tertinggal inference yang menunggu.
+    """
+    stop = threading.Event()
+    frame_q = LatestQueue(maxsize=1)                        # decode -> infer
+    det_q = BlockingQueue(maxsize=args.pipeline_depth)      # infer  -> count (tanpa drop)
+    render_q = LatestQueue(maxsize=1)                       # count  -> render
+    infer_fps = FpsMeter()
+    scheduler = build_scheduler(roi_rect, counter.geometry, args)
+    tiler = build_tiler(roi_rect, counter.geometry, args)
+    warmup_stage(model, roi_rect, tiler, args, startup)
+    sched_epoch = [0]
+
+    metrics.watch_fps(infer_fps)
+    metrics.watch_sink(sink)
+    metrics.watch_counter(counter)
+    metrics.watch_scheduler(scheduler)
+    for name, q in (("frames", frame_q), ("detections", det_q), ("render", render_q)):
+        metrics.watch_queue(name, q)
+    stage = metrics.stage
+    clock = time.perf_counter
+
+    # untuk file lokal, decode di-pace ke fps asli video agar perilakunya seperti live stream
+    src_fps = cap.get(cv2.CAP_PROP_FPS) if os.path.exists(args.video) else 0
+    decode_pacer = RatePacer(src_fps if src_fps and src_fps < 240 else 0)
+
+    def decode_stage():
+        frame_idx, epoch = 0, 0
+        while not stop.is_set():
+            t0 = clock()
+            ok, frame = cap.read()
+            if not ok:
+                # loop MP4: naikkan epoch supaya stage counting reset state
+                epoch += 1
+                cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+                continue
+            stage["decode"].observe(clock() - t0)
+            frame_idx += 1
+            frame_q.put((frame_idx, epoch, frame))
+            decode_pacer.wait()
+
+    def infer_stage():
+        detections = []
+        while not stop.is_set():
+            item = frame_q.get(timeout=0.5)
+            if item is None:
+                continue
+            frame_idx, epoch, frame = item
+            if scheduler is not None and epoch != sched_epoch[0]:
+                scheduler.reset()
+                sched_epoch[0] = epoch
+            if should_infer(scheduler, frame, frame_idx, args):
+                t0 = clock()
+                detections = detect_persons(model, frame, roi_rect, args, tiler)
+                stage["infer"].observe(clock() - t0)
+                frame_dets = detections
+                infer_fps.tick()
+                metrics.inferences.inc()
+            else:
+                frame_dets = skipped_detections(scheduler, detections, tracker)
+            item = (frame_idx, epoch, frame, frame_dets)
+            while not det_q.put(item, timeout=0.5):
+                if stop.is_set():
+                    return
+
+    def count_stage():
+        nonlocal startup
+        cur_epoch = 0
+        while not stop.is_set():
+            item = det_q.get(timeout=0.5)
+            if item is None:
+                continue
+            frame_idx, epoch, frame, detections = item
+            if epoch != cur_epoch:
+                counter.reset()
+                cur_epoch = epoch
+            t0 = clock()
+            tracked = update_tracks(tracker, detections)
+            t1 = clock()
+            counter.update(tracked, frame_idx)
+            stage["track"].observe(t1 - t0)
+            stage["count"].observe(clock() - t1)
+            metrics.frames.inc()
+            metrics.tracks.set(len(tracked))
+            if startup is not None:
+                startup.first_count()
+                startup = None
+            if args.log_every and frame_idx % args.log_every == 0:
+                print(f"[Frame {frame_idx}] ENTER={counter.enter_count} EXIT={counter.exit_count} INSIDE={counter.current_inside}")
+            if sink.due():
+                counts = (counter.enter_count, counter.exit_count, counter.current_inside)
+                render_q.put((frame, tracked, counts))
+
+    def render_stage():
+        pacer = RatePacer(args.fps)
+        while not stop.is_set():
+            item = render_q.get(timeout=0.5)
+            if item is None:
+                continue
+            frame, tracked, counts = item
+            t0 = clock()
+            vis = render_frame(frame, tracked, counter.poly_px, mask, counts,
+                               hud_text(args, infer_fps.value), scale=sink.render_scale)
+            t1 = clock()
+            sink.write(vis)
+            stage["render"].observe(t1 - t0)
+            stage["encode"].observe(clock() - t1)
+            pacer.wait()
+
+    threads = [
+        start_stage("decode", decode_stage, stop),
+        start_stage("infer", infer_stage, stop),
+        start_stage("count", count_stage, stop),
+        start_stage("render", render_stage, stop),
+    ]
+    try:
+        while not stop.is_set():
+            stop.wait(5.0)
+            if args.debug_pipeline:
+                print(f"[pipeline] infer_fps={infer_fps.value:.1f} dropped: "
+                      f"frames={frame_q.dropped} renders={render_q.dropped} "
+                      f"dets_blocked={det_q.blocked_seconds:.1f}s "
+                      f"render_skipped={sink.skipped}")
+                if scheduler is not None:
+                    print(f"[pipeline] scheduler {scheduler.stats()}")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stop.set()
+        for q in (frame_q, det_q, render_q):
+            q.close()
+        for t in threads:
+            t.join(timeout=2.0)
 
 # ---------- main ----------
-def main():
+def build_arg_parser():
     ap = argparse.ArgumentParser(description="Detection + Tracking + Counting in Polygon (MJPEG latest.jpg)")
     # Input video & output
     ap.add_argument("--video",
@@ -276,6 +1048,11 @@ def main():
     ap.add_argument("--imgsz",
         type=int,
         default=960)
+    add_detector_args(ap)
+    ap.add_argument("--warmup-runs",
+        type=int,
+        default=1,
+        help="inference dummy seukuran ROI/tile saat startup sebelum frame pertama (0 = mati)")
     ap.add_argument("--conf",
         type=float,
         default=0.15)
@@ -283,10 +1060,54 @@ def main():
         type=int,
         default=8,
         help="target output FPS to latest.jpg")
+    ap.add_argument("--frame-transport",
+        choices=["ring", "file", "both"],
+        default="file",
+        help="kirim frame ke API via latest.jpg (default, write + fsync + rename), ring buffer mmap "
+             "(latest.ring, tanpa fsync; hanya API yang bisa membaca), atau keduanya")
+    ap.add_argument("--render",
+        choices=["on-demand", "always", "off"],
+        default="always",
+        help="always (default): render + encode setiap frame (dibatasi --render-fps), latest.jpg/ring selalu terisi; "
+             "on-demand: hanya saat ada viewer MJPEG lewat API (butuh --frame-transport ring/both, "
+             "consumer lain latest.jpg tidak dapat frame); off: headless, counting saja")
+    ap.add_argument("--render-fps",
+        type=float,
+        default=0.0,
+        help="batas fps render/encode, terpisah dari loop counting (0 = setiap frame yang dihitung)")
+    ap.add_argument("--render-scale",
+        type=float,
+        default=1.0,
+        help="skala resolusi frame output (mis. 0.5 = render & encode di setengah resolusi)")
     ap.add_argument("--frame-skip",
         type=int,
         default=0,
-        help="skip N frames between inference")
+        help="skip N frames between inference (--scheduler fixed)")
+    ap.add_argument("--scheduler",
+        choices=["fixed", "motion"],
+        default="fixed",
+        help="fixed: throttle --frame-skip; motion: skip predict saat ROI diam / frame HLS diulang, "
+             "inference tiap frame saat ada gerak di dekat tepi polygon")
+    ap.add_argument("--motion-thresh",
+        type=int,
+        default=18,
+        help="selisih gray (0..255) per piksel agar dianggap bergerak")
+    ap.add_argument("--motion-min-area",
+        type=float,
+        default=0.002,
+        help="fraksi piksel bergerak (ROI / pita tepi) agar dianggap ada gerak")
+    ap.add_argument("--motion-edge-band",
+        type=float,
+        default=40.0,
+        help="lebar pita (px) di kedua sisi tepi polygon yang memicu inference tiap frame")
+    ap.add_argument("--motion-idle-fps",
+        type=float,
+        default=2.0,
+        help="rate inference maksimum saat gerak hanya jauh dari tepi polygon")
+    ap.add_argument("--motion-max-gap",
+        type=float,
+        default=2.0,
+        help="paksa inference minimal tiap N detik walau scene diam")
     ap.add_argument("--roi-scale",
         type=float,
         default=1.0,
@@ -295,11 +1116,54 @@ def main():
         type=float,
         default=1.0,
         help="upscale ROI before YOLO (1.0 = off)")
+    ap.add_argument("--tile-size",
+        type=int,
+        default=0,
+        help="inference ROI per tile NxN px resolusi asli, satu batch predict + merge lintas tile (0 = off; ganti --roi-upscale)")
+    ap.add_argument("--tile-overlap",
+        type=float,
+        default=0.2,
+        help="overlap antar tile (fraksi ukuran tile)")
+    ap.add_argument("--tile-margin",
+        type=float,
+        default=48.0,
+        help="tile yang tidak menyentuh polygon + margin (px) ini dilewati")
+    ap.add_argument("--tile-merge-ios",
+        type=float,
+        default=0.6,
+        help="intersection-over-smaller minimum untuk menggabung box dari tile berbeda")
 
     ap.add_argument("--poly-pad",
         type=int,
         default=0,
         help="expand polygon outward in pixels")
+    ap.add_argument("--geometry-cache",
+        default=".cache/geometry",
+        help="folder cache geometri polygon (contour pad, ROI, mask, SDF) per polygon + resolusi; '' = mati")
+
+    # Tracker
+    ap.add_argument("--tracker",
+        choices=["array", "kalman", "centroid"],
+        default="array",
+        help="array (default) = state NumPy + assignment optimal (Hungarian); kalman = array + prediksi "
+             "constant-velocity (posisi tetap jalan di frame tanpa inference); centroid = greedy lama "
+             "(default sebelumnya, untuk mereproduksi hasil lama)")
+    ap.add_argument("--kf-process-noise",
+        type=float,
+        default=1.0,
+        help="--tracker kalman: std percepatan (px/frame^2); lebih besar = lebih cepat ikut belokan")
+    ap.add_argument("--kf-measure-noise",
+        type=float,
+        default=4.0,
+        help="--tracker kalman: std noise posisi deteksi (px)")
+    ap.add_argument("--trk-max-dist",
+        type=int,
+        default=60,
+        help="jarak maksimum (px) antar centroid agar dianggap track yang sama")
+    ap.add_argument("--trk-max-miss",
+        type=int,
+        default=40,
+        help="jumlah frame tanpa match sebelum track dihapus")
 
     # DB / polygon
     ap.add_argument("--stream-id",
@@ -321,7 +1185,7 @@ def main():
         help="toleransi (px) untuk cek inside polygon agar tidak jitter")
     ap.add_argument("--debug-cross",
         action="store_true",
-        help="print log crossing (px,py)->(cx,cy) dan hasil crossed_boundary")
+        help="print log crossing (px,py)->(cx,cy), jarak ke tepi dan sisi polygon yang dipotong (seg_crossed/edge)")
     ap.add_argument("--cross-margin",
         type=int,
         default=8,
@@ -329,8 +1193,25 @@ def main():
     ap.add_argument("--db-log",
         action="store_true",
         help="tulis ENTER/EXIT ke tabel area_events (butuh stream-id & area-id)")
+    ap.add_argument("--db-writer",
+        choices=["batched", "sync"],
+        default="batched",
+        help="batched (default) = antrian + flush bulk di thread background (baris DB terlambat s.d. "
+             "--db-flush-interval); sync = query langsung di frame loop (default sebelumnya)")
+    ap.add_argument("--db-batch-size",
+        type=int,
+        default=200,
+        help="flush ke DB setiap N event (mode batched)")
+    ap.add_argument("--db-flush-interval",
+        type=float,
+        default=2.0,
+        help="flush ke DB paling lambat tiap N detik (mode batched)")
 
     # Hysteresis & confirm logic
+    ap.add_argument("--count-mode",
+        choices=["centroid", "ratio"],
+        default="centroid",
+        help="centroid = titik bottom-center + crossing tepi; ratio = rasio luas bbox di polygon + hysteresis")
     ap.add_argument("--in-ratio-in",
         type=float,
         default=0.6,
@@ -347,11 +1228,68 @@ def main():
         type=float,
         default=6.0,
         help="minimal selisih jarak ke tepi (px) agar crossing dianggap valid (hindari 'menyentuh' garis)")
-    
-    args = ap.parse_args()
 
-    os.makedirs(args.outdir, exist_ok=True)
-    latest_path = os.path.join(args.outdir, "latest.jpg")
+    # Pipeline mode
+    ap.add_argument("--pipeline",
+        action="store_true",
+        help="jalankan decode / inference / counting / render di thread terpisah (frame & render drop-oldest, hasil deteksi tidak pernah di-drop)")
+    ap.add_argument("--pipeline-depth",
+        type=int,
+        default=4,
+        help="kapasitas queue hasil inference -> counting (mode --pipeline); kalau penuh inference menunggu")
+    ap.add_argument("--debug-pipeline",
+        action="store_true",
+        help="print fps inference, jumlah frame yang di-drop & waktu inference menunggu counting tiap 5 detik")
+
+    # Metrics (format Prometheus)
+    ap.add_argument("--metrics-interval",
+        type=float,
+        default=5.0,
+        help="tulis snapshot metrics.json ke folder output tiap N detik (dibaca API /metrics); 0 = mati")
+    ap.add_argument("--log-every",
+        type=int,
+        default=0,
+        help="print ENTER/EXIT/INSIDE ke terminal tiap N frame (0 = mati; pakai pc_* metrics untuk monitoring)")
+    ap.add_argument("--metrics-port",
+        type=int,
+        default=0,
+        help="layani GET /metrics langsung dari worker di port ini (0 = tidak)")
+
+    # Replay offline
+    ap.add_argument("--replay",
+        action="store_true",
+        help="proses file video sekali secepat mungkin (tanpa pacing / latest.jpg), timestamp event dari PTS")
+    ap.add_argument("--replay-start",
+        default="",
+        help="waktu mulai rekaman ISO 8601 (default: meta.txt ffmpeg_extract.sh, lalu mtime file)")
+    ap.add_argument("--replay-out",
+        default="",
+        help="tulis event ke CSV ini (bisa bersamaan dengan --db-log untuk bulk load ke DB)")
+    ap.add_argument("--replay-batch",
+        type=int,
+        default=8,
+        help="jumlah frame per model.predict saat replay")
+    ap.add_argument("--replay-workers",
+        type=int,
+        default=1,
+        help="jumlah proses paralel (tiap proses memuat model sendiri)")
+    ap.add_argument("--replay-segment",
+        type=float,
+        default=0.0,
+        help="panjang segmen per task (detik); 0 = dibagi rata ke --replay-workers")
+    ap.add_argument("--replay-overlap",
+        type=float,
+        default=10.0,
+        help="warm-up sebelum tiap segmen (detik) untuk membangun state tracker & counter")
+    return ap
+
+def main():
+    startup = StartupTimer()
+    args = build_arg_parser().parse_args()
+    startup.mark("imports")
+
+    # --- model: dimuat di background (import ultralytics/torch + bobot) selama video & polygon disiapkan ---
+    model_future = None if args.replay else load_detector_async(args)
 
     # --- open video ---
     cap = cv2.VideoCapture(args.video)
@@ -359,6 +1297,7 @@ def main():
     if not ok:
         raise SystemExit("Gagal buka video/stream")
     H, W = frame.shape[:2]
+    startup.mark("video")
 
     # --- ambil polygon ---
     if args.poly:
@@ -374,283 +1313,51 @@ def main():
 
     if coord_sys != "image_norm":
         print(f"[WARN] coord_system={coord_sys} belum didukung, diasumsikan image_norm 0..1")
+    startup.mark("polygon")
 
-    poly_px = poly_norm_to_px(poly_norm, W, H)
-
-    # polygon padding (opsional): melebar pakai dilate mask
-    if args.poly_pad and args.poly_pad > 0:
-        m = np.zeros((H, W), np.uint8)
-        cv2.fillPoly(m, [poly_px], 255)
-        k = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (args.poly_pad*2+1, args.poly_pad*2+1))
-        m = cv2.dilate(m, k, iterations=1)
-        cnts,_ = cv2.findContours(m, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-        if cnts:
-            poly_px = max(cnts, key=cv2.contourArea)
-
-    # ROI bounding box dari polygon
-    x, y, w, h = cv2.boundingRect(poly_px)
+    if args.replay:
+        # offline: sekali jalan tanpa pacing / output frame, event bertimestamp PTS
+        from workers.replay import run_replay
+        cap.release()
+        run_replay(args, poly_norm)
+        return
 
-    # ROI scale (padding di sekeliling bbox)
-    if args.roi_scale and args.roi_scale > 1.0:
-        cx, cy = x + w/2, y + h/2
-        nw, nh = int(w * args.roi_scale), int(h * args.roi_scale)
-        x = max(int(cx - nw/2), 0); y = max(int(cy - nh/2), 0)
-        w = min(nw, W - x); h = min(nh, H - y)
+    os.makedirs(args.outdir, exist_ok=True)
+    sink = make_frame_sink(args.outdir, args)
 
-    # mask untuk gelapkan luar polygon
-    mask = np.zeros((H, W), np.uint8)
-    cv2.fillPoly(mask, [poly_px], 255)
+    poly_px, roi_rect, mask = build_polygon_geometry(poly_norm, W, H, args)
+    geometry = get_polygon_geometry(poly_px, mask)
+    startup.mark("geometry")
 
-    dblogger = DBLogger() if args.db_log else None
+    dblogger = make_dblogger(args)
 
     # --- model & tracker ---
-    model = YOLO(args.model)
-    tracker = CentroidTracker(max_distance=60, max_miss=40)  # silakan tuning
+    model = model_future.result()
+    startup.mark("model")
+    tracker = build_tracker(args)  # silakan tuning via --trk-max-dist / --trk-max-miss
 
     # --- counting state ---
-    inside_state = {}
-    prev_pos = {}
-    enter_count, exit_count = 0, 0
-    current_inside_ids = set()
-    entered_ids, exited_ids = set(), set()
-    enter_streak, exit_streak = {}, {}
-
-    # pacing & loop
-    target_dt = 1.0 / args.fps if args.fps > 0 else 0
-    prev_tick = time.perf_counter()
-    frame_idx = 0
-    fps_ema = 0.0
-    ema_alpha = 0.2
-    loop_prev = time.perf_counter()
-
-    while True:
-        ok, frame = cap.read()
-        if not ok:
-            # reset state ketika loop ulang video MP4
-            inside_state.clear()
-            prev_pos.clear()
-            current_inside_ids.clear()
-            entered_ids.clear()
-            exited_ids.clear()
-            enter_count = 0
-            exit_count  = 0
-            # enter/exit BIARKAN cumulative (sesuai kebutuhan laporan); kalau mau reset, kosongkan juga set & counter
-            cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
-            continue
-        frame_idx += 1
-
-        vis = frame.copy()
-
-        # ambil ROI dari bbox polygon
-        roi = frame[y:y+h, x:x+w]
-        infer_img = roi
-
-        # (opsional) upscale ROI agar objek kecil lebih “terlihat”
-        if args.roi_upscale and args.roi_upscale > 1.0:
-            infer_img = cv2.resize(
-                roi, None, fx=args.roi_upscale, fy=args.roi_upscale, interpolation=cv2.INTER_CUBIC
-            )
-
-        # frame skipping (simple throttle)
-        do_infer = True
-        if args.frame_skip > 0 and (frame_idx % (args.frame_skip + 1)) != 1:
-            do_infer = False
+    counter = PolygonCounter(geometry, args, dblogger)
 
-        detections = []
-        if do_infer:
-            # 0=person, 1=bicycle, 3=motorcycle (dataset COCO)
-            results = model.predict(
-                infer_img, imgsz=args.imgsz, conf=args.conf, classes=[0, 1, 3], iou=0.5, verbose=False
-            )
-
-            persons, riders = [], []  # riders = gabungan bbox bicycle & motorcycle (proxy untuk pemotor/pesepeda)
-
-            for r in results:
-                if r.boxes is None:
-                    continue
-                for b in r.boxes:
-                    cls = int(b.cls[0])
-                    x1, y1, x2, y2 = map(int, b.xyxy[0])
-
-                    # scale back jika ROI di-upscale
-                    if args.roi_upscale and args.roi_upscale > 1.0:
-                        s = args.roi_upscale
-                        x1 = int(x1 / s); y1 = int(y1 / s)
-                        x2 = int(x2 / s); y2 = int(y2 / s)
-
-                    # koordinat global
-                    gx1, gy1, gx2, gy2 = x + x1, y + y1, x + x2, y + y2
-
-                    if cls == 0:  # person
-                        persons.append((gx1, gy1, gx2, gy2, float(b.conf[0])))
-                    elif cls in (1, 3):  # bicycle atau motorcycle
-                        riders.append((gx1, gy1, gx2, gy2))
-
-            # fungsi IoU sederhana
-            def iou(a, b):
-                ax1, ay1, ax2, ay2 = a[:4]; bx1, by1, bx2, by2 = b[:4]
-                inter_x1, inter_y1 = max(ax1, bx1), max(ay1, by1)
-                inter_x2, inter_y2 = min(ax2, bx2), min(ay2, by2)
-                iw, ih = max(0, inter_x2 - inter_x1), max(0, inter_y2 - inter_y1)
-                inter = iw * ih
-                if inter <= 0:
-                    return 0.0
-                area_a = (ax2 - ax1) * (ay2 - ay1)
-                area_b = (bx2 - bx1) * (by2 - by1)
-                return inter / (area_a + area_b - inter + 1e-6)
-
-            # buang 'person' yang overlap signifikan dengan kendaraan (indikasi rider)
-            clean_persons = []
-            for p in persons:
-                max_iou = max((iou(p, r) for r in riders), default=0.0)
-                if max_iou < args.rider_iou_th:
-                    clean_persons.append(p)
-
-            # simpan hanya person yang lolos filter + berada di dalam polygon
-            for gx1, gy1, gx2, gy2, _conf in clean_persons:
-                # (opsional) pakai bottom-center utk lebih stabil menyentuh ground
-                cx = (gx1 + gx2) // 2
-                cy = gy2  # bottom-center y
-                detections.append({
-                    "x1": gx1, "y1": gy1, "x2": gx2, "y2": gy2,
-                    "cx": cx, "cy": cy
-                })
-
-        # update tracking (tracker boleh handle empty → decay)
-        tracked = tracker.update(detections)
-
-        # bangun ulang daftar ID yang benar-benar masih "inside" untuk frame ini
-        new_inside_ids = set()
-
-        for t in tracked:
-            tid, cx, cy = t["id"], t["cx"], t["cy"]  # pakai cx,cy dari bottom-center
-            # Revert: gunakan centroid + margin saja untuk status inside
-            prev_inside = inside_state.get(tid, False)
-            is_inside = inside_with_margin(poly_px, (cx, cy), args.poly_margin)
-
-            # ambil posisi sebelumnya
-            px, py = prev_pos.get(tid, (cx, cy))
-            crossed = crossed_boundary((px, py), (cx, cy), poly_px)
-
-            # jarak bertanda ke tepi utk prev & now (px)
-            dist_now = cv2.pointPolygonTest(poly_px, (cx, cy), True)
-
-            prev_dist = None
-            if tid in prev_pos:
-                px, py = prev_pos[tid]
-                prev_dist = cv2.pointPolygonTest(poly_px, (px, py), True)
-
-            # state berubah?
-            state_changed = (prev_inside != is_inside)
-
-            # crossing berbasis geometri garis ATAU berbasis jarak/toleransi di tepi (tanpa delta)
-            crossing_simple = False
-            if prev_dist is not None:
-                sign_flip = (prev_dist <= 0 < dist_now) or (prev_dist >= 0 > dist_now)
-                near_edge = (abs(prev_dist) <= args.cross_margin) or (abs(dist_now) <= args.cross_margin)
-                crossing_simple = state_changed and (sign_flip or near_edge)
-
-            # final keputusan crossing
-            crossing_ok = crossed or crossing_simple
-
-            # ENTER: outside -> inside
-            if not prev_inside and is_inside and crossing_ok and tid not in entered_ids:
-                enter_count += 1
-                entered_ids.add(tid)
-                # DB log + counts
-                if dblogger and args.stream_id is not None and args.area_id is not None:
-                    dblogger.log_event_and_counts(args.stream_id, args.area_id, tid, 'enter')
-
-            # EXIT: inside -> outside
-            if prev_inside and not is_inside and crossing_ok and tid not in exited_ids:
-                exit_count += 1
-                exited_ids.add(tid)
-                # DB log + counts
-                if dblogger and args.stream_id is not None and args.area_id is not None:
-                    dblogger.log_event_and_counts(args.stream_id, args.area_id, tid, 'exit')
-
-            # (opsional) debug yang lebih informatif
-            if args.debug_cross and (crossed or state_changed or frame_idx % 30 == 0):
-                print(
-                    f"[cross] id={tid} prev=({px:.0f},{py:.0f}) now=({cx:.0f},{cy:.0f}) "
-                    f"prev_dist={prev_dist if prev_dist is not None else 'NA'} now_dist={dist_now:.2f} "
-                    f"inside_prev={prev_inside} inside_now={is_inside} "
-                    f"seg_crossed={crossed} simple_cross={crossing_simple} => crossing_ok={crossing_ok}"
-                )
-
-            # update state (tetap SETELAH keputusan enter/exit)
-            inside_state[tid] = is_inside
-            prev_pos[tid] = (cx, cy)
-
-            if is_inside:
-                new_inside_ids.add(tid)
-
-            # draw bbox + id (tetap)
-            cv2.rectangle(vis, (t["x1"], t["y1"]), (t["x2"], t["y2"]), (0, 255, 0), 2)
-            cv2.putText(vis, f"ID {tid}", (t["x1"], t["y1"] - 6),
-                        cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 2)
-
-        # replace set aktif
-        current_inside_ids = new_inside_ids
-        current_inside = len(current_inside_ids)
-
-        # Upsert live occupancy ke DB (opsional)
-        if dblogger and args.db_log and args.stream_id is not None and args.area_id is not None:
-            dblogger.upsert_live(args.stream_id, args.area_id, current_inside)
-
-
-        # ---------- D) Housekeeping ----------
-        active_ids = {t["id"] for t in tracked}
-
-        for tid in list(inside_state.keys()):
-            if tid not in active_ids:
-                inside_state.pop(tid, None)
-                prev_pos.pop(tid, None)
-                enter_streak.pop(tid, None)
-                exit_streak.pop(tid, None)
-
-        current_inside_ids.intersection_update(active_ids)
-
-        # overlay polygon & gelapkan luar area
-        cv2.polylines(vis, [poly_px], True, (0, 255, 255), 2)
-        vis[mask == 0] = (vis[mask == 0] * 0.35).astype(np.uint8)
-
-        # counter overlay
-        cv2.putText(vis, f"ENTER={enter_count} EXIT={exit_count} INSIDE={current_inside}",
-                (12, 28), cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 0, 255), 2)
-
-        # --- tambahan log ke terminal ---
-        print(f"[Frame {frame_idx}] ENTER={enter_count} EXIT={exit_count} INSIDE={current_inside}")
-
-        # update runtime FPS EMA
-        now_loop = time.perf_counter()
-        dt_loop = now_loop - loop_prev
-        if dt_loop > 0:
-            fps_ema = (1 - ema_alpha) * fps_ema + ema_alpha * (1.0 / dt_loop)
-        loop_prev = now_loop
-
-        # info kecil
-        cv2.putText(vis, f"{Path(args.model).name} img{args.imgsz} conf={args.conf:.2f} "
-                         f"fpsSet={args.fps:.1f} fpsRun={fps_ema:.1f} skip={args.frame_skip} "
-                         f"roiScale={args.roi_scale} up={args.roi_upscale}",
-                    (12, 52), cv2.FONT_HERSHEY_SIMPLEX, 0.55, (255, 255, 255), 1)
-
-        # tulis latest.jpg (atomic)
-        atomic_write_jpeg(latest_path, vis, quality=70)
-
-        # pace output (agar MJPEG stabil & tak berkedip)
-        if target_dt > 0:
-            now = time.perf_counter()
-            dt = now - prev_tick
-            if dt < target_dt:
-                time.sleep(target_dt - dt)
-            prev_tick = time.perf_counter()
+    # --- metrics (snapshot untuk API /metrics dan/atau endpoint sendiri) ---
+    registry = MetricsRegistry({"worker": Path(args.outdir).name})
+    metrics = WorkerMetrics(registry, stream_id=args.stream_id, area_id=args.area_id)
+    instrument_dblogger(registry, dblogger)
+    exporter = MetricsExporter(registry, os.path.join(args.outdir, SNAPSHOT_FILENAME),
+                               interval=args.metrics_interval, port=args.metrics_port)
+    startup.bind(registry)
 
+    run = run_pipeline if args.pipeline else run_serial
     try:
-        if args.db_log and 'dblogger' in locals() and dblogger:
-            dblogger.close()
-    except Exception:
-        pass
+        run(cap, model, tracker, counter, roi_rect, mask, sink, args, metrics, startup)
+    finally:
+        exporter.close()
+        sink.close()
+        try:
+            if dblogger:
+                dblogger.close()
+        except Exception:
+            pass
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,405 @@
+# workers/detect_track_count_multi.py
+"""
+Satu proses worker untuk BANYAK stream sekaligus.
+
+- Satu instance YOLO dipakai bersama (hemat memori & warm-up).
+- Tiap stream (kamera) punya SATU capture + thread decode (LatestQueue,
+  drop-oldest), dipakai bersama semua area aktif di stream tsb.
+- Per tick: ROI dari semua area yang stream-nya punya frame baru dikumpulkan
+  lalu diproses dalam SATU model.predict (batch), hasilnya dikembalikan ke
+  tracker + counter milik area masing-masing.
+- Output frame satu per stream (semua polygon digambar di frame yang sama)
+  ke <outdir-root>/<slug nama stream dari tabel streams>/.
+
+Contoh:
+    # ambil semua area aktif (join streams) dari DB
+    python workers/detect_track_count_multi.py --db-log
+
+    # atau tentukan manual: stream_id:area_id:video
+    python workers/detect_track_count_multi.py \
+        --stream 1:1:https://.../Malioboro_10_Kepatihan.stream/playlist.m3u8 \
+        --stream 3:2:samples/output/nolkm-utara/nolkm-utara.mp4
+"""
+import os, re, json, time, argparse, threading
+from pathlib import Path
+import sys
+
+import cv2
+
+# Tambahkan REPO ROOT ke sys.path agar "workers.*" bisa diimport
+REPO_ROOT = Path(__file__).resolve().parents[1]
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+import psycopg2
+
+from workers.pipeline import LatestQueue, RatePacer, start_stage
+from workers.geometry import get_polygon_geometry
+from workers.detector import load_detector_async
+from workers.metrics import SNAPSHOT_FILENAME, MetricsExporter, MetricsRegistry, WorkerMetrics, instrument_dblogger
+from workers.startup import StartupTimer
+from workers.detect_track_count import (
+    FpsMeter, PolygonCounter, _env, build_arg_parser,
+    build_polygon_geometry, build_scheduler, build_tiler, build_tracker, hud_text, load_polygon_from_db, make_dblogger, make_frame_sink,
+    parse_detections, parse_tiled_detections, predict_rois, prepare_roi, render_frame, should_infer, skipped_detections,
+    update_tracks, warmup_images, warmup_model,
+)
+
+
+def load_stream_areas_from_db(stream_ids=None):
+    """
+    Ambil semua area aktif beserta URL stream-nya.
+    Return list of dict(stream_id, area_id, name, video, poly_norm, coord_system).
+    """
+    conn = psycopg2.connect(
+        host=_env("DB_HOST", "localhost"),
+        port=_env("DB_PORT", "5432"),
+        dbname=_env("DB_NAME", "people_counting"),
+        user=_env("DB_USER", "postgres"),
+        password=_env("DB_PASSWORD", ""),
+    )
+    cur = conn.cursor()
+    cur.execute(
+        """
+        SELECT a.stream_id, a.area_id, s.name, s.url, a.polygon_geojson
+        FROM areas a
+        JOIN streams s ON s.stream_id = a.stream_id
+        WHERE a.is_active = TRUE AND s.url IS NOT NULL
+        ORDER BY a.stream_id, a.area_id
+        """
+    )
+    rows = cur.fetchall()
+    cur.close(); conn.close()
+
+    out = []
+    for stream_id, area_id, name, url, geo in rows:
+        if stream_ids and stream_id not in stream_ids:
+            continue
+        feat = geo if isinstance(geo, dict) else json.loads(geo)
+        out.append({
+            "stream_id": stream_id,
+            "area_id": area_id,
+            "name": name,
+            "video": url,
+            "poly_norm": feat["geometry"]["coordinates"][0],
+            "coord_system": feat.get("properties", {}).get("coord_system", "image_norm"),
+        })
+    return out
+
+
+def parse_stream_arg(value: str):
+    """'stream_id:area_id:video' -> dict. Video boleh mengandung ':' (URL)."""
+    parts = value.split(":", 2)
+    if len(parts) != 3:
+        raise argparse.ArgumentTypeError("format --stream: STREAM_ID:AREA_ID:VIDEO")
+    try:
+        stream_id, area_id = int(parts[0]), int(parts[1])
+    except ValueError:
+        raise argparse.ArgumentTypeError("STREAM_ID dan AREA_ID harus integer")
+    return {"stream_id": stream_id, "area_id": area_id, "video": parts[2]}
+
+
+def slugify(name: str) -> str:
+    # sama seperti samples/ffmpeg_extract.sh: Malioboro_10_Kepatihan -> malioboro-10-kepatihan
+    return re.sub(r"[^a-z0-9]+", "-", name.lower()).strip("-")
+
+
+class StreamSource:
+    """
+    Satu kamera (stream_id): capture + thread decode + output frame, dipakai
+    bersama semua area aktif di stream tsb. Kamera dengan N area tetap hanya
+    di-pull/di-decode sekali dan overlay-nya digambar sekali per frame.
+    """
+    def __init__(self, spec, args, outdir, registry):
+        self.stream_id = spec["stream_id"]
+        self.video = spec["video"]
+        self.name = spec.get("name") or f"stream-{self.stream_id}"
+        self.areas = []                 # AreaSlot, diisi setelah geometri tiap area dibangun
+        self.frames = LatestQueue(maxsize=1)
+
+        self.cap = cv2.VideoCapture(self.video)
+        ok, frame = self.cap.read()
+        if not ok:
+            raise RuntimeError(f"Gagal buka video/stream: {self.video}")
+        self.height, self.width = frame.shape[:2]
+
+        os.makedirs(outdir, exist_ok=True)
+        self.outdir = outdir
+        self.sink = make_frame_sink(outdir, args)
+
+        self.metrics = WorkerMetrics(registry, stages=("decode", "render", "encode"), counting=False,
+                                     stream_id=self.stream_id)
+        self.metrics.watch_queue("frames", self.frames)
+        self.metrics.watch_sink(self.sink)
+        self.polys = None
+        self.mask = None
+
+    def add_area(self, slot):
+        self.areas.append(slot)
+        # layer overlay statis: semua polygon stream ini + gabungan mask-nya
+        self.polys = [a.poly_px for a in self.areas]
+        self.mask = slot.mask if self.mask is None else cv2.bitwise_or(self.mask, slot.mask)
+
+    def decode_loop(self, stop: threading.Event):
+        # file lokal di-pace ke fps asli video agar perilakunya seperti live stream
+        src_fps = self.cap.get(cv2.CAP_PROP_FPS) if os.path.exists(self.video) else 0
+        pacer = RatePacer(src_fps if src_fps and src_fps < 240 else 0)
+        decode_seconds = self.metrics.stage["decode"]
+        frame_idx, epoch = 0, 0
+        while not stop.is_set():
+            t0 = time.perf_counter()
+            ok, frame = self.cap.read()
+            if not ok:
+                # loop MP4 (reset state di tick berikutnya)
+                epoch += 1
+                self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+                continue
+            decode_seconds.observe(time.perf_counter() - t0)
+            frame_idx += 1
+            self.frames.put((frame_idx, epoch, frame))
+            pacer.wait()
+
+
+class AreaSlot:
+    """State milik satu (stream, area): geometri, tracker, counter, scheduler; frame dari StreamSource."""
+    def __init__(self, spec, source, args, dblogger, registry):
+        # salin args global lalu override stream_id/area_id untuk area ini
+        self.args = argparse.Namespace(**vars(args))
+        self.args.stream_id = spec["stream_id"]
+        self.args.area_id = spec["area_id"]
+        self.args.video = spec["video"]
+        self.source = source
+
+        if spec.get("coord_system", "image_norm") != "image_norm":
+            print(f"[WARN] {source.name}/area {spec['area_id']}: coord_system={spec['coord_system']} "
+                  f"belum didukung, diasumsikan image_norm 0..1")
+
+        self.poly_px, self.roi_rect, self.mask = build_polygon_geometry(
+            spec["poly_norm"], source.width, source.height, self.args)
+        self.tracker = build_tracker(self.args)
+        geometry = get_polygon_geometry(self.poly_px, self.mask)
+        self.counter = PolygonCounter(geometry, self.args, dblogger)
+        self.scheduler = build_scheduler(self.roi_rect, geometry, self.args)
+        self.tiler = build_tiler(self.roi_rect, geometry, self.args)
+        self.detections = []
+        self.tracked = []
+        self.epoch = 0
+        self.frame_idx = 0
+
+        self.metrics = WorkerMetrics(registry, stages=("infer", "track", "count"),
+                                     stream_id=self.args.stream_id, area_id=self.args.area_id)
+        self.metrics.watch_counter(self.counter)
+        self.metrics.watch_scheduler(self.scheduler)
+
+
+def load_stream_names(stream_ids):
+    """stream_id -> nama di tabel streams (untuk --stream, supaya folder output = slug nama stream)."""
+    conn = psycopg2.connect(
+        host=_env("DB_HOST", "localhost"),
+        port=_env("DB_PORT", "5432"),
+        dbname=_env("DB_NAME", "people_counting"),
+        user=_env("DB_USER", "postgres"),
+        password=_env("DB_PASSWORD", ""),
+    )
+    cur = conn.cursor()
+    cur.execute("SELECT stream_id, name FROM streams WHERE stream_id = ANY(%s)", (list(stream_ids),))
+    names = dict(cur.fetchall())
+    cur.close(); conn.close()
+    return names
+
+
+def resolve_specs(args):
+    if args.stream:
+        names = load_stream_names({s["stream_id"] for s in args.stream})
+        specs = []
+        for s in args.stream:
+            poly_norm, coord_sys = load_polygon_from_db(s["stream_id"], s["area_id"])
+            if not poly_norm:
+                raise SystemExit(f"Polygon tidak tersedia untuk stream={s['stream_id']} area={s['area_id']}")
+            specs.append({**s, "name": names.get(s["stream_id"]), "poly_norm": poly_norm, "coord_system": coord_sys})
+        return specs
+    return load_stream_areas_from_db(set(args.stream_ids) if args.stream_ids else None)
+
+
+def main():
+    ap = build_arg_parser()
+    ap.description = "Multi-stream Detection + Tracking + Counting (satu model, batched inference)"
+    ap.add_argument("--stream",
+        type=parse_stream_arg,
+        action="append",
+        help="STREAM_ID:AREA_ID:VIDEO (boleh diulang). Kosong = semua area aktif dari DB")
+    ap.add_argument("--stream-ids",
+        type=int,
+        nargs="*",
+        help="filter stream_id saat memuat dari DB")
+    ap.add_argument("--outdir-root",
+        default="samples/output",
+        help="output frame (latest.ring / latest.jpg) tiap stream ditulis ke <outdir-root>/<slug nama stream>/ "
+             "(stream-<id> bila stream tidak ada di tabel streams)")
+    startup = StartupTimer()
+    args = ap.parse_args()
+    startup.mark("imports")
+
+    specs = resolve_specs(args)
+    if not specs:
+        raise SystemExit("Tidak ada stream/area aktif untuk diproses.")
+    startup.mark("polygon")
+
+    # --- satu model untuk semua stream, dimuat di background selama stream dibuka ---
+    model_future = load_detector_async(args, calib_source=specs[0]["video"])
+
+    dblogger = make_dblogger(args)
+    registry = MetricsRegistry({"worker": "multi"})
+    instrument_dblogger(registry, dblogger)
+
+    # satu StreamSource (capture/decode/output) per stream_id, area-area-nya berbagi frame
+    sources, slots = {}, []
+    for spec in specs:
+        source = sources.get(spec["stream_id"])
+        if source is None:
+            slug = slugify(spec.get("name") or f"stream-{spec['stream_id']}")
+            source = sources[spec["stream_id"]] = StreamSource(spec, args, os.path.join(args.outdir_root, slug),
+                                                               registry)
+        elif spec["video"] != source.video:
+            print(f"[WARN] stream={spec['stream_id']} area={spec['area_id']}: video {spec['video']} diabaikan, "
+                  f"memakai {source.video}")
+        slot = AreaSlot(spec, source, args, dblogger, registry)
+        source.add_area(slot)
+        slots.append(slot)
+        print(f"[multi] stream={slot.args.stream_id} area={slot.args.area_id} -> {source.outdir}")
+    sources = list(sources.values())
+    startup.mark("streams")
+
+    model = model_future.result()
+    startup.mark("model")
+    # warm-up dengan batch yang sama bentuknya dengan tick sungguhan (semua ROI / tile sekaligus)
+    warmup_model(model, [im for s in slots for im in warmup_images(s.roi_rect, s.args, s.tiler)], args,
+                 imgsz=slots[0].tiler.imgsz if args.tile_size > 0 else None)
+    startup.mark("warmup")
+
+    stop = threading.Event()
+    threads = [start_stage(f"decode-{s.stream_id}", s.decode_loop, stop, stop) for s in sources]
+
+    pacer = RatePacer(args.fps)
+    fps = FpsMeter()
+    infer_fps = FpsMeter()
+    for slot in slots:
+        slot.metrics.watch_fps(infer_fps)
+    os.makedirs(args.outdir_root, exist_ok=True)
+    exporter = MetricsExporter(registry, os.path.join(args.outdir_root, SNAPSHOT_FILENAME),
+                               interval=args.metrics_interval, port=args.metrics_port)
+    startup.bind(registry)
+    clock = time.perf_counter
+    tick = 0
+    try:
+        while not stop.is_set():
+            # kumpulkan frame terbaru dari stream yang punya frame baru; satu frame untuk semua area-nya
+            fresh, batch = [], []
+            for source in sources:
+                item = source.frames.get(timeout=0)
+                if item is not None:
+                    fresh.append((source, item))
+                    batch.extend((slot, item) for slot in source.areas)
+            if not batch:
+                stop.wait(0.005)
+                continue
+            tick += 1
+
+            # keputusan inference per stream (--frame-skip atau motion scheduler)
+            infer_batch = []
+            for slot, (frame_idx, epoch, frame) in batch:
+                if epoch != slot.epoch:
+                    slot.counter.reset()
+                    if slot.scheduler is not None:
+                        slot.scheduler.reset()
+                    slot.epoch = epoch
+                slot.frame_idx += 1
+                if should_infer(slot.scheduler, frame, slot.frame_idx, slot.args):
+                    infer_batch.append(slot)
+
+            # satu predict untuk semua ROI
+            results = {}
+            if infer_batch:
+                t0 = clock()
+                frames = {id(slot): item[2] for slot, item in batch}
+                if args.tile_size > 0:
+                    # semua tile dari semua stream dalam satu batch, lalu dipecah lagi per stream
+                    images, spans = [], []
+                    for s in infer_batch:
+                        crops = s.tiler.crops(frames[id(s)])
+                        spans.append((len(images), len(images) + len(crops)))
+                        images.extend(crops)
+                    preds = predict_rois(model, images, args, imgsz=infer_batch[0].tiler.imgsz)
+                    for slot, (a, b) in zip(infer_batch, spans):
+                        results[id(slot)] = parse_tiled_detections(preds[a:b], slot.tiler, slot.args)
+                else:
+                    images = [prepare_roi(frames[id(s)], s.roi_rect, s.args) for s in infer_batch]
+                    for slot, r in zip(infer_batch, predict_rois(model, images, args)):
+                        results[id(slot)] = parse_detections(r, slot.roi_rect, slot.args)
+                # latency inference = satu batch untuk semua stream di dalamnya
+                infer_s = clock() - t0
+                for slot in infer_batch:
+                    slot.metrics.stage["infer"].observe(infer_s)
+                    slot.metrics.inferences.inc()
+                infer_fps.tick()
+            fps_ema = fps.tick()
+
+            log_tick = args.log_every and tick % args.log_every == 0
+            summary = []
+            for slot, (frame_idx, epoch, frame) in batch:
+                stage = slot.metrics.stage
+                if id(slot) in results:
+                    slot.detections = frame_dets = results[id(slot)]
+                else:
+                    frame_dets = skipped_detections(slot.scheduler, slot.detections, slot.tracker)
+                t0 = clock()
+                slot.tracked = tracked = update_tracks(slot.tracker, frame_dets)
+                t1 = clock()
+                counter = slot.counter
+                counter.update(tracked, frame_idx)
+                stage["track"].observe(t1 - t0)
+                stage["count"].observe(clock() - t1)
+                slot.metrics.frames.inc()
+                slot.metrics.tracks.set(len(tracked))
+                if log_tick:
+                    summary.append(f"s{slot.args.stream_id}/a{slot.args.area_id}: "
+                                   f"ENTER={counter.enter_count} EXIT={counter.exit_count} INSIDE={counter.current_inside}")
+
+            # render + encode sekali per stream: semua polygon, track dan counter area-nya di satu frame
+            for source, (frame_idx, epoch, frame) in fresh:
+                if not source.sink.due():
+                    continue
+                t0 = clock()
+                multi_area = len(source.areas) > 1
+                counts = [(f"a{a.args.area_id} " if multi_area else "",
+                           (a.counter.enter_count, a.counter.exit_count, a.counter.current_inside))
+                          for a in source.areas]
+                vis = render_frame(frame, [t for a in source.areas for t in a.tracked], source.polys, source.mask,
+                                   counts, hud_text(args, fps_ema), scale=source.sink.render_scale)
+                t1 = clock()
+                source.sink.write(vis)
+                source.metrics.stage["render"].observe(t1 - t0)
+                source.metrics.stage["encode"].observe(clock() - t1)
+
+            if log_tick:
+                print(f"[Tick {tick}] batch={len(infer_batch)} | " + " | ".join(summary))
+            if startup is not None:
+                startup.first_count()
+                startup = None
+            pacer.wait()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stop.set()
+        exporter.close()
+        for source in sources:
+            source.frames.close()
+            source.sink.close()
+        for t in threads:
+            t.join(timeout=2.0)
+        if dblogger:
+            dblogger.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,246 @@
+# workers/detector.py
+"""
+Backend detector untuk semua worker (--backend torch | onnx | openvino).
+
+- torch (default): ultralytics YOLO langsung dari bobot .pt (perilaku lama).
+- onnx / openvino: bobot di-export SEKALI lewat `YOLO.export` lalu disimpan
+  di cache disk (--model-cache), key = nama + sidik bobot (ukuran + mtime) +
+  backend + int8 + imgsz. Model hasil export dimuat lagi lewat ultralytics
+  (AutoBackend -> ONNX Runtime / OpenVINO), jadi `model.predict(...)` dan
+  format `result.boxes` tetap sama dan kode parsing di worker tidak berubah.
+- --int8: kuantisasi statis INT8 dengan kalibrasi frame dari sumber video
+  (--int8-calib, default video worker itu sendiri):
+    onnx     -> onnxruntime.quantization.quantize_static (format QDQ)
+    openvino -> nncf.quantize pada IR hasil export
+
+Export memakai dynamic shape (batch & ukuran input bebas) karena worker
+mengirim batch ROI / tile dengan imgsz berbeda. Export ditulis ke folder
+staging lalu di-rename atomik, jadi beberapa proses (mis. replay paralel)
+aman memakai cache yang sama. Hapus folder cache untuk kalibrasi ulang.
+
+Dependency opsional: `pip install onnx onnxruntime` / `pip install openvino nncf`.
+
+ultralytics (dan torch) baru diimport saat model dimuat; load_detector_async
+menjalankannya di thread background supaya overlap dengan buka video dan
+ambil polygon dari DB saat startup.
+"""
+import hashlib, os, shutil
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+BACKENDS = ("torch", "onnx", "openvino")
+DEFAULT_CACHE_DIR = ".cache/models"
+CALIB_FRAMES = 64
+CALIB_STRIDE = 5        # ambil tiap N frame supaya kalibrasi tidak dari satu momen saja
+
+
+def add_detector_args(ap):
+    """Flag backend detector (dipakai parser semua worker)."""
+    ap.add_argument("--backend",
+        choices=BACKENDS,
+        default="torch",
+        help="runtime inference: torch (ultralytics .pt), onnx (ONNX Runtime) atau openvino")
+    ap.add_argument("--int8",
+        action="store_true",
+        help="pakai model INT8 hasil kuantisasi statis (hanya --backend onnx/openvino)")
+    ap.add_argument("--int8-calib",
+        default="",
+        help="video / folder gambar untuk kalibrasi INT8 (default: --video)")
+    ap.add_argument("--model-cache",
+        default=DEFAULT_CACHE_DIR,
+        help="folder cache model hasil export")
+    return ap
+
+
+def _yolo():
+    from ultralytics import YOLO    # import berat (torch), ditunda sampai benar-benar dipakai
+    return YOLO
+
+
+# ---------- cache ----------
+def _fingerprint(weights: Path) -> str:
+    st = weights.stat()
+    return hashlib.sha1(f"{weights.resolve()}:{st.st_size}:{st.st_mtime_ns}".encode()).hexdigest()[:10]
+
+
+def cache_key(weights, backend: str, imgsz: int, int8: bool = False) -> str:
+    weights = Path(weights)
+    return f"{weights.stem}-{_fingerprint(weights)}-{backend}{'-int8' if int8 else ''}-{int(imgsz)}"
+
+
+def _exported_path(folder: Path, stem: str, backend: str) -> Path:
+    if backend == "onnx":
+        return folder / f"{stem}.onnx"
+    return folder / f"{stem}_openvino_model"
+
+
+def cached_model_path(weights, backend: str, imgsz: int, int8: bool = False, cache_dir=DEFAULT_CACHE_DIR):
+    """Path model hasil export di cache (belum tentu ada)."""
+    folder = Path(cache_dir) / cache_key(weights, backend, imgsz, int8)
+    return _exported_path(folder, Path(weights).stem, backend)
+
+
+# ---------- kalibrasi INT8 ----------
+def letterbox_blob(bgr, imgsz: int):
+    """Preprocess setara ultralytics: letterbox persegi (pad 114), RGB, CHW float32 0..1, batch 1."""
+    h, w = bgr.shape[:2]
+    r = min(imgsz / h, imgsz / w)
+    nw, nh = int(round(w * r)), int(round(h * r))
+    img = cv2.resize(bgr, (nw, nh), interpolation=cv2.INTER_LINEAR)
+    top, left = (imgsz - nh) // 2, (imgsz - nw) // 2
+    canvas = np.full((imgsz, imgsz, 3), 114, np.uint8)
+    canvas[top:top + nh, left:left + nw] = img
+    blob = canvas[:, :, ::-1].transpose(2, 0, 1)[None].astype(np.float32) / 255.0
+    return np.ascontiguousarray(blob)
+
+
+def calibration_frames(source, n: int = CALIB_FRAMES, stride: int = CALIB_STRIDE):
+    """Frame BGR untuk kalibrasi: semua gambar di folder, atau tiap `stride` frame dari video."""
+    frames = []
+    src = Path(str(source))
+    if src.is_dir():
+        for p in sorted(src.iterdir()):
+            if p.suffix.lower() in (".jpg", ".jpeg", ".png", ".bmp"):
+                img = cv2.imread(str(p))
+                if img is not None:
+                    frames.append(img)
+            if len(frames) >= n:
+                break
+        return frames
+    cap = cv2.VideoCapture(str(source))
+    idx = 0
+    while len(frames) < n:
+        ok, frame = cap.read()
+        if not ok:
+            break
+        if idx % stride == 0:
+            frames.append(frame)
+        idx += 1
+    cap.release()
+    return frames
+
+
+def _quantize_onnx(path: Path, blobs):
+    import onnx
+    from onnxruntime.quantization import CalibrationDataReader, QuantFormat, QuantType, quantize_static
+
+    src = onnx.load(str(path))
+    input_name = src.graph.input[0].name
+
+    class _Reader(CalibrationDataReader):
+        def __init__(self):
+            self._it = iter(blobs)
+
+        def get_next(self):
+            blob = next(self._it, None)
+            return None if blob is None else {input_name: blob}
+
+    tmp = path.with_name(path.stem + "-int8.onnx")
+    quantize_static(str(path), str(tmp), _Reader(), quant_format=QuantFormat.QDQ,
+                    per_channel=True, activation_type=QuantType.QUInt8, weight_type=QuantType.QInt8)
+    # metadata ultralytics (names, stride, imgsz) ikut disalin supaya AutoBackend membacanya
+    q = onnx.load(str(tmp))
+    del q.metadata_props[:]
+    q.metadata_props.extend(src.metadata_props)
+    onnx.save(q, str(path))
+    tmp.unlink()
+
+
+def _quantize_openvino(folder: Path, blobs):
+    import nncf
+    import openvino as ov
+
+    xml = next(folder.glob("*.xml"))
+    model = ov.Core().read_model(str(xml))
+    quantized = nncf.quantize(model, nncf.Dataset(blobs), preset=nncf.QuantizationPreset.MIXED,
+                              subset_size=len(blobs))
+    tmp_xml = xml.with_name(xml.stem + "-int8.xml")
+    ov.save_model(quantized, str(tmp_xml), compress_to_fp16=False)
+    del model, quantized
+    os.replace(tmp_xml, xml)
+    os.replace(tmp_xml.with_suffix(".bin"), xml.with_suffix(".bin"))
+
+
+# ---------- export ----------
+def export_model(weights, backend: str, imgsz: int, int8: bool = False,
+                 cache_dir=DEFAULT_CACHE_DIR, calib_source=None) -> Path:
+    """
+    Export bobot .pt ke backend (kalau belum ada di cache). Return path model
+    yang bisa langsung dimuat `YOLO(path)`.
+    """
+    weights = Path(weights)
+    target = cached_model_path(weights, backend, imgsz, int8, cache_dir)
+    if target.exists():
+        return target
+    if int8 and not calib_source:
+        raise SystemExit("--int8 butuh sumber kalibrasi (--int8-calib atau --video)")
+
+    folder = target.parent
+    staging = folder.with_name(f".{folder.name}.{os.getpid()}.tmp")
+    shutil.rmtree(staging, ignore_errors=True)
+    staging.mkdir(parents=True)
+    try:
+        # export ultralytics menulis di samping bobot -> kerjakan di salinan dalam staging
+        shutil.copy2(weights, staging / weights.name)
+        print(f"[detector] export {weights.name} -> {backend}{' int8' if int8 else ''} imgsz={imgsz} ...")
+        exported = Path(_yolo()(str(staging / weights.name)).export(
+            format=backend, imgsz=int(imgsz), dynamic=True, half=False, device="cpu"))
+        (staging / weights.name).unlink()
+        if int8:
+            frames = calibration_frames(calib_source)
+            if not frames:
+                raise SystemExit(f"Tidak ada frame kalibrasi dari {calib_source}")
+            blobs = [letterbox_blob(f, int(imgsz)) for f in frames]
+            if backend == "onnx":
+                _quantize_onnx(exported, blobs)
+            else:
+                _quantize_openvino(exported, blobs)
+            print(f"[detector] INT8 dikalibrasi dengan {len(blobs)} frame dari {calib_source}")
+        try:
+            os.replace(staging, folder)
+        except OSError:
+            # proses lain selesai lebih dulu -> pakai hasil mereka
+            if not target.exists():
+                raise
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
+    return target
+
+
+def _weights_path(model: str) -> Path:
+    """Path file .pt lokal; nama hub (mis. yolov8n.pt) diunduh dulu oleh ultralytics."""
+    p = Path(model)
+    if p.is_file():
+        return p
+    return Path(_yolo()(model).ckpt_path)
+
+
+def resolve_model(args, calib_source=None) -> str:
+    """Path model yang dimuat worker sesuai --backend (export + cache bila perlu)."""
+    if args.backend == "torch":
+        if args.int8:
+            print("[WARN] --int8 diabaikan untuk --backend torch")
+        return args.model
+    if Path(args.model).suffix != ".pt":
+        return args.model       # sudah berupa model hasil export
+    return str(export_model(_weights_path(args.model), args.backend, args.imgsz, args.int8,
+                            args.model_cache, args.int8_calib or calib_source or getattr(args, "video", None)))
+
+
+def load_detector(args, calib_source=None):
+    """YOLO untuk backend terpilih; interface predict() sama untuk semua backend."""
+    path = resolve_model(args, calib_source)
+    if args.backend != "torch":
+        print(f"[detector] backend={args.backend}{' int8' if args.int8 else ''}: {path}")
+    return _yolo()(path, task="detect")
+
+
+def load_detector_async(args, calib_source=None):
+    """load_detector di thread background. Return Future; .result() saat model dibutuhkan."""
+    pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="detector-load")
+    future = pool.submit(load_detector, args, calib_source)
+    pool.shutdown(wait=False)
+    return future
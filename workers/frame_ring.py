@@ -0,0 +1,183 @@
+# workers/frame_ring.py
+"""
+Ring buffer frame JPEG berbasis file memory-mapped (`latest.ring`), untuk
+mengirim frame dari worker ke API tanpa write + fsync + os.replace per frame.
+
+Kalau file diletakkan di tmpfs (/dev/shm atau volume tmpfs Docker), ini
+praktis shared memory antar proses/container. Satu writer, banyak reader,
+tanpa lock:
+
+    header (64 B) : magic, version, slots, slot_size, flags, seq, updated_ns,
+                    viewers, viewers_seen_ns
+    slot i        : begin_seq, end_seq, length, data[slot_size]
+
+Frame ke-`seq` ditulis ke slot `seq % slots` dengan urutan begin_seq ->
+data -> length -> end_seq -> header.seq (seqlock per slot). Reader memvalidasi
+begin_seq == end_seq == seq sebelum DAN sesudah menyalin data, jadi frame
+yang sobek (sedang ditimpa) atau basi terdeteksi dan dibuang.
+
+Writer tidak pernah mengubah ukuran file yang sedang di-map: kalau frame tidak
+muat, ring baru dibuat lalu os.replace; ring lama diberi flag RETIRED supaya
+reader membuka ulang.
+
+Arah sebaliknya, API menulis jumlah viewer + heartbeat ke header (offset 40),
+sehingga worker bisa melewati render/encode saat tidak ada yang menonton.
+"""
+import mmap, os, struct, time
+
+RING_FILENAME = "latest.ring"
+MAGIC = b"FRNG"
+VERSION = 1
+FLAG_RETIRED = 1
+
+_HEADER = struct.Struct("<4sIIIIxxxxQQ")   # magic, version, slots, slot_size, flags, seq, updated_ns
+_HEADER_SIZE = 64
+_FLAGS_OFF = 16
+_SEQ_OFF = 24
+_VIEWERS = struct.Struct("<I4xQ")           # viewers, seen_ns (ditulis API)
+_VIEWERS_OFF = 40
+_SLOT_HEAD = struct.Struct("<QQI")          # begin_seq, end_seq, length
+_SLOT_HEAD_SIZE = 32
+
+DEFAULT_SLOTS = 4
+DEFAULT_SLOT_SIZE = 1 << 20                 # 1 MiB; JPEG 1080p q70 biasanya < 400 KB
+VIEWER_TIMEOUT_S = 3.0                      # heartbeat viewer lebih tua dari ini = tidak ada viewer
+
+
+def _slot_stride(slot_size):
+    return (_SLOT_HEAD_SIZE + slot_size + 63) // 64 * 64
+
+
+def _looks_like_jpeg(buf):
+    # validasi murah tambahan: SOI di awal, EOI di akhir
+    return len(buf) >= 4 and buf[:2] == b"\xff\xd8" and buf[-2:] == b"\xff\xd9"
+
+
+def retire_ring(path):
+    """Tandai ring di `path` sebagai tidak aktif (reader akan fallback / buka ulang)."""
+    try:
+        with open(path, "r+b") as f:
+            mm = mmap.mmap(f.fileno(), 0)
+    except (OSError, ValueError):
+        return
+    try:
+        if len(mm) >= _HEADER_SIZE and mm[:4] == MAGIC:
+            flags = struct.unpack_from("<I", mm, _FLAGS_OFF)[0]
+            struct.pack_into("<I", mm, _FLAGS_OFF, flags | FLAG_RETIRED)
+    finally:
+        mm.close()
+
+
+class FrameRingWriter:
+    def __init__(self, path, slots: int = DEFAULT_SLOTS, slot_size: int = DEFAULT_SLOT_SIZE):
+        self.path = path
+        self.seq = 0
+        self._mm = None
+        self._create(max(int(slots), 2), int(slot_size))
+
+    def _create(self, slots, slot_size):
+        stride = _slot_stride(slot_size)
+        tmp = self.path + ".tmp"
+        with open(tmp, "w+b") as f:
+            f.truncate(_HEADER_SIZE + slots * stride)
+            mm = mmap.mmap(f.fileno(), 0)
+        _HEADER.pack_into(mm, 0, MAGIC, VERSION, slots, slot_size, 0, self.seq, time.time_ns())
+        # ring lama (worker sebelumnya / slot terlalu kecil) -> retired, lalu ganti atomik
+        retire_ring(self.path)
+        os.replace(tmp, self.path)
+        if self._mm is not None:
+            self._mm.close()
+        self._mm = mm
+        self.slots, self.slot_size, self._stride = slots, slot_size, stride
+
+    def write(self, data) -> int:
+        """Tulis satu frame (bytes / ndarray uint8 hasil cv2.imencode). Return seq frame."""
+        buf = memoryview(data).cast("B")
+        n = len(buf)
+        if n > self.slot_size:
+            self._create(self.slots, max(n * 2, self.slot_size * 2))
+        mm = self._mm
+        seq = self.seq + 1
+        off = _HEADER_SIZE + (seq % self.slots) * self._stride
+        data_off = off + _SLOT_HEAD_SIZE
+
+        struct.pack_into("<Q", mm, off, seq)                # begin: slot sedang ditulis
+        mm[data_off:data_off + n] = buf
+        struct.pack_into("<QI", mm, off + 8, seq, n)        # end + length: slot lengkap
+        struct.pack_into("<QQ", mm, _SEQ_OFF, seq, time.time_ns())
+        self.seq = seq
+        return seq
+
+    def viewers(self, timeout_s: float = VIEWER_TIMEOUT_S) -> int:
+        """Jumlah viewer yang dilaporkan API (0 kalau heartbeat sudah basi)."""
+        n, seen_ns = _VIEWERS.unpack_from(self._mm, _VIEWERS_OFF)
+        if time.time_ns() - seen_ns > timeout_s * 1e9:
+            return 0
+        return n
+
+    def close(self, retire: bool = False):
+        if self._mm is None:
+            return
+        if retire:
+            struct.pack_into("<I", self._mm, _FLAGS_OFF, FLAG_RETIRED)
+        self._mm.close()
+        self._mm = None
+
+
+class FrameRingReader:
+    """
+    Reader lock-free. Membaca header langsung dari mapping (tanpa syscall);
+    data frame hanya disalin sekali saat ada seq baru. `writable=True` dibutuhkan
+    untuk mark_viewers().
+    """
+    def __init__(self, path, writable: bool = False):
+        self.path = path
+        with open(path, "r+b" if writable else "rb") as f:
+            access = mmap.ACCESS_WRITE if writable else mmap.ACCESS_READ
+            self._mm = mmap.mmap(f.fileno(), 0, access=access)
+        magic, version, self.slots, self.slot_size, _flags, _seq, _ts = _HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC or version != VERSION:
+            self._mm.close()
+            raise ValueError(f"bukan frame ring v{VERSION}: {path}")
+        self._stride = _slot_stride(self.slot_size)
+        self.torn = 0       # jumlah frame yang dibuang karena sobek / tertimpa
+
+    @property
+    def retired(self) -> bool:
+        return bool(struct.unpack_from("<I", self._mm, _FLAGS_OFF)[0] & FLAG_RETIRED)
+
+    @property
+    def seq(self) -> int:
+        return struct.unpack_from("<Q", self._mm, _SEQ_OFF)[0]
+
+    @property
+    def updated_ns(self) -> int:
+        return struct.unpack_from("<Q", self._mm, _SEQ_OFF + 8)[0]
+
+    def read(self, last_seq: int = 0):
+        """
+        Frame terbaru kalau seq-nya > last_seq. Return (seq, bytes) atau None
+        (tidak ada frame baru, atau frame sobek karena sedang ditimpa writer).
+        """
+        mm = self._mm
+        seq = self.seq
+        if seq <= last_seq:
+            return None
+        off = _HEADER_SIZE + (seq % self.slots) * self._stride
+        begin, end, n = _SLOT_HEAD.unpack_from(mm, off)
+        if begin != seq or end != seq or n > self.slot_size:
+            self.torn += 1
+            return None
+        data_off = off + _SLOT_HEAD_SIZE
+        data = mm[data_off:data_off + n]
+        if struct.unpack_from("<Q", mm, off)[0] != seq or not _looks_like_jpeg(data):
+            self.torn += 1
+            return None
+        return seq, data
+
+    def mark_viewers(self, n: int):
+        """Laporkan jumlah viewer + heartbeat ke writer (dipanggil berkala selama ada viewer)."""
+        _VIEWERS.pack_into(self._mm, _VIEWERS_OFF, int(n), time.time_ns())
+
+    def close(self):
+        self._mm.close()
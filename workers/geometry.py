@@ -0,0 +1,217 @@
+# workers/geometry.py
+"""
+Cache geometri polygon untuk query per-frame yang murah.
+
+Polygon ROI statis selama worker hidup, jadi signed distance field (SDF)
+cukup dibangun sekali (distance transform dari mask polygon). Setelah itu
+cek inside/margin/jarak-ke-tepi untuk SEMUA titik track cukup satu lookup
+array, bukan cv2.pointPolygonTest per titik.
+
+Hasil turunan polygon (contour setelah --poly-pad, ROI rect, mask, SDF) juga
+bisa disimpan ke disk (.npz, key = hash polygon + resolusi + parameter),
+sehingga worker yang restart tidak perlu dilate / distance transform ulang.
+"""
+import hashlib, json, math, os
+
+import cv2
+import numpy as np
+
+# Batas atas |SDF lookup - pointPolygonTest| (px). Titik yang jatuh dalam pita
+# ini di sekitar ambang keputusan dihitung ulang secara eksak, jadi keputusan
+# --poly-margin / --cross-margin identik dengan tes eksak. Sumber error:
+# - snap titik ke piksel (np.rint): jarak ke tepi 1-Lipschitz -> <= sqrt(2)/2
+# - rasterisasi mask (fillPoly): piksel yang pusatnya sampai sqrt(2)/2 px dari
+#   tepi bisa masuk kelas mana saja
+# - distance transform: jarak ke PUSAT piksel kelas lawan terdekat, yang ada
+#   di balik tepi -> + <= 1 px
+# Terukur di polygon seed (200k titik acak, 3 resolusi): maks ~2.08 px.
+# Cek: python benchmarks/bench_geometry.py
+SDF_TOLERANCE = 1.0 + math.sqrt(2.0)
+
+
+def polygon_edges(poly_px):
+    """Sisi polygon sebagai (C, D) array (E,2): sisi i = titik i -> titik (i+1) % n."""
+    pts = np.asarray(poly_px, np.float64).reshape(-1, 2)
+    return pts, np.roll(pts, -1, axis=0)
+
+
+def segments_cross_edges(p_prev, p_now, C, D):
+    """
+    Uji potong segmen p_prev->p_now (K,2) terhadap semua sisi C->D (E,2)
+    sekaligus. Logika sama dengan _seg_intersect/_ccw di worker, tapi
+    dibroadcast ke matrix (K,E).
+    Return (crossed (K,) bool, edge (K,) int: indeks sisi pertama yang
+    dipotong, -1 kalau tidak ada).
+    """
+    A = np.asarray(p_prev, np.float64).reshape(-1, 1, 2)
+    B = np.asarray(p_now, np.float64).reshape(-1, 1, 2)
+    C = C[None]
+    D = D[None]
+
+    def ccw(P, Q, R):
+        return (R[..., 1] - P[..., 1]) * (Q[..., 0] - P[..., 0]) > (Q[..., 1] - P[..., 1]) * (R[..., 0] - P[..., 0])
+
+    hits = (ccw(A, C, D) != ccw(B, C, D)) & (ccw(A, B, C) != ccw(A, B, D))   # (K,E)
+    crossed = hits.any(axis=1)
+    edge = np.where(crossed, hits.argmax(axis=1), -1)
+    return crossed, edge
+
+
+def build_sdf(poly_px, mask):
+    """
+    Signed distance field (H,W) float32 dari mask polygon.
+
+    distanceTransform menganggap luar gambar sebagai "bukan nol", jadi untuk
+    polygon yang menempel ke tepi frame jarak inside ke sisi di tepi itu tidak
+    terlihat (error bisa ratusan px). Karena itu DT dihitung di kanvas yang
+    dilebarkan sampai memuat seluruh polygon + 1 px luar, lalu di-crop.
+    """
+    H, W = mask.shape[:2]
+    pts = np.asarray(poly_px).reshape(-1, 2)
+    pad = 1 + int(max(0, -pts[:, 0].min(), -pts[:, 1].min(), pts[:, 0].max() - (W - 1), pts[:, 1].max() - (H - 1)))
+    canvas = cv2.copyMakeBorder(mask, pad, pad, pad, pad, cv2.BORDER_CONSTANT, value=0)
+    if pad > 1:
+        # bagian polygon di luar frame ikut dianggap inside
+        cv2.fillPoly(canvas, [(pts + pad).astype(np.int32).reshape(-1, 1, 2)], 255)
+    inside = cv2.distanceTransform(canvas, cv2.DIST_L2, cv2.DIST_MASK_PRECISE)
+    outside = cv2.distanceTransform(cv2.bitwise_not(canvas), cv2.DIST_L2, cv2.DIST_MASK_PRECISE)
+    crop = (slice(pad, pad + H), slice(pad, pad + W))
+    return np.where(mask > 0, inside[crop], -outside[crop]).astype(np.float32)
+
+
+class PolygonGeometry:
+    """
+    poly_px: contour polygon (N,1,2) int, mask: uint8 (H,W) 255 = inside.
+    signed distance: >=0 inside/on-edge, <0 outside (sama seperti
+    cv2.pointPolygonTest(..., True)).
+    """
+    def __init__(self, poly_px, mask, sdf=None):
+        self.poly_px = poly_px
+        self.mask = mask
+        self.H, self.W = mask.shape[:2]
+        if sdf is None:
+            sdf = build_sdf(poly_px, mask)
+        self.sdf = sdf
+        self.edge_start, self.edge_end = polygon_edges(poly_px)
+        self._sat = {}      # margin_px -> summed-area table (H+1,W+1) dari mask inside
+
+    def _exact(self, pts):
+        poly = self.poly_px
+        return np.array(
+            [cv2.pointPolygonTest(poly, (float(x), float(y)), True) for x, y in pts],
+            dtype=np.float32,
+        )
+
+    def signed_distance(self, pts, thresholds=()):
+        """
+        Signed distance (px) untuk array titik (K,2) sekaligus.
+        Titik di luar frame, atau yang nilainya dalam SDF_TOLERANCE dari salah
+        satu `thresholds`, dihitung eksak supaya keputusan ambang identik
+        dengan pointPolygonTest.
+        """
+        pts = np.asarray(pts, np.float32).reshape(-1, 2)
+        if len(pts) == 0:
+            return np.empty(0, np.float32)
+        xi = np.rint(pts[:, 0]).astype(np.int64)
+        yi = np.rint(pts[:, 1]).astype(np.int64)
+        in_frame = (xi >= 0) & (xi < self.W) & (yi >= 0) & (yi < self.H)
+
+        dist = np.zeros(len(pts), np.float32)
+        dist[in_frame] = self.sdf[yi[in_frame], xi[in_frame]]
+
+        refine = ~in_frame
+        for th in thresholds:
+            refine |= np.abs(dist - th) <= SDF_TOLERANCE
+        if refine.any():
+            dist[refine] = self._exact(pts[refine])
+        return dist
+
+    def crossings(self, p_prev, p_now):
+        """
+        Batched crossing test untuk semua track: segmen p_prev[i]->p_now[i]
+        terhadap semua sisi polygon. Return (crossed (K,), edge (K,)).
+        Indeks sisi bisa dipakai untuk memberi label pintu masuk/keluar.
+        """
+        if len(p_prev) == 0:
+            return np.zeros(0, bool), np.zeros(0, np.int64)
+        return segments_cross_edges(p_prev, p_now, self.edge_start, self.edge_end)
+
+    def summed_area_table(self, margin_px: float = 0.0):
+        """Integral image dari (sdf >= -margin), dibangun sekali per nilai margin."""
+        key = float(margin_px)
+        sat = self._sat.get(key)
+        if sat is None:
+            inside = (self.sdf >= -key).astype(np.uint8)
+            sat = self._sat[key] = cv2.integral(inside, sdepth=cv2.CV_32S)
+        return sat
+
+    def inside_ratio(self, boxes, margin_px: float = 0.0):
+        """
+        Rasio EKSAK luas bbox (x1,y1,x2,y2) yang berada di dalam polygon
+        (+margin), O(1) per box via summed-area table. Bagian bbox di luar
+        frame dihitung sebagai outside.
+        """
+        boxes = np.asarray(boxes, np.int64).reshape(-1, 4)
+        if len(boxes) == 0:
+            return np.zeros(0, np.float32)
+        sat = self.summed_area_table(margin_px)
+        area = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+        x1 = np.clip(boxes[:, 0], 0, self.W); x2 = np.clip(boxes[:, 2], 0, self.W)
+        y1 = np.clip(boxes[:, 1], 0, self.H); y2 = np.clip(boxes[:, 3], 0, self.H)
+        inside = sat[y2, x2] - sat[y1, x2] - sat[y2, x1] + sat[y1, x1]
+        ratio = np.zeros(len(boxes), np.float32)
+        valid = area > 0
+        ratio[valid] = inside[valid] / area[valid]
+        return ratio
+
+    def inside(self, pts, margin_px: float = 0.0):
+        """Inside polygon (+margin) per titik: signed distance >= -margin."""
+        margin = float(margin_px)
+        return self.signed_distance(pts, thresholds=(-margin,)) >= -margin
+
+
+_GEOMETRY_CACHE = {}
+_GEOMETRY_CACHE_MAX = 8     # multi-stream worker: satu entry per (stream, area)
+
+
+def get_polygon_geometry(poly_px, mask, sdf=None):
+    """
+    PolygonGeometry dibangun ulang hanya bila polygon / resolusi berubah
+    (mis. setelah POST /api/config/area dan worker reload polygon).
+    `sdf` = SDF dari cache disk (lewati distance transform).
+    """
+    key = (np.ascontiguousarray(poly_px).tobytes(), mask.shape)
+    geom = _GEOMETRY_CACHE.pop(key, None)
+    if geom is None:
+        geom = PolygonGeometry(poly_px, mask, sdf)
+        while len(_GEOMETRY_CACHE) >= _GEOMETRY_CACHE_MAX:
+            _GEOMETRY_CACHE.pop(next(iter(_GEOMETRY_CACHE)))
+    _GEOMETRY_CACHE[key] = geom     # urutan insert = LRU
+    return geom
+
+
+# ---------- cache disk ----------
+GEOMETRY_CACHE_VERSION = 2     # v2: SDF dihitung di kanvas yang memuat seluruh polygon
+
+
+def geometry_cache_path(cache_dir, poly_norm, W, H, **params):
+    """Path .npz untuk polygon ternormalisasi + resolusi + parameter turunan (poly_pad, roi_scale)."""
+    blob = json.dumps({"v": GEOMETRY_CACHE_VERSION, "poly": np.round(np.asarray(poly_norm, np.float64), 6).tolist(),
+                       "size": [int(W), int(H)], **params}, sort_keys=True)
+    return os.path.join(cache_dir, hashlib.sha1(blob.encode()).hexdigest()[:16] + ".npz")
+
+
+def load_geometry_cache(path):
+    """dict array (poly_px, roi_rect, mask, sdf) atau None kalau tidak ada / rusak."""
+    try:
+        with np.load(path) as data:
+            return {k: data[k] for k in data.files}
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def save_geometry_cache(path, **arrays):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp.npz"
+    np.savez(tmp, **arrays)
+    os.replace(tmp, path)
@@ -0,0 +1,350 @@
+# workers/metrics.py
+"""
+Metrics ringan format Prometheus (text exposition 0.0.4) tanpa dependency
+tambahan, dipakai worker dan API.
+
+- Counter / Gauge / Histogram: tiap child (kombinasi label) hanya ditulis
+  oleh SATU thread (stage pipeline sendiri), jadi observe() tanpa lock:
+  satu bisect + dua penjumlahan, praktis gratis dibanding satu frame.
+- *_fn: nilai dibaca dari callback saat scrape (panjang queue, dropped,
+  pending DB, viewer), nol biaya di hot loop.
+- Worker menulis snapshot JSON (`metrics.json`) di folder output-nya secara
+  berkala (MetricsExporter); API (`GET /metrics`) menggabungkan snapshot semua
+  worker dengan metrics miliknya sendiri. Opsional worker juga bisa di-scrape
+  langsung lewat HTTP (`--metrics-port`).
+"""
+import bisect, json, math, os, threading, time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+SNAPSHOT_FILENAME = "metrics.json"
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# detik; dari ~sub-ms (track/count) sampai detik (inference CPU model besar)
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+
+class Counter:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, n=1.0):
+        self.value += n
+
+
+class Gauge:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def set(self, v):
+        self.value = v
+
+    def inc(self, n=1.0):
+        self.value += n
+
+    def dec(self, n=1.0):
+        self.value -= n
+
+
+class Histogram:
+    __slots__ = ("bounds", "counts", "sum", "count")
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.bounds = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.bounds) + 1)     # per bucket (non-kumulatif), terakhir = +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, v):
+        self.counts[bisect.bisect_left(self.bounds, v)] += 1
+        self.sum += v
+        self.count += 1
+
+    def snapshot(self):
+        cum, buckets = 0, []
+        for le, n in zip(self.bounds + (math.inf,), list(self.counts)):
+            cum += n
+            buckets.append([le, cum])
+        return {"buckets": buckets, "sum": self.sum, "count": cum}
+
+
+class _FnValue:
+    __slots__ = ("fn",)
+
+    def __init__(self, fn):
+        self.fn = fn
+
+    @property
+    def value(self):
+        try:
+            return float(self.fn())
+        except Exception:
+            return math.nan
+
+
+class MetricsRegistry:
+    """
+    Kumpulan metric family. `const_labels` ditempel ke semua sample (mis.
+    stream_id/area_id untuk worker single-stream).
+    """
+    def __init__(self, const_labels=None):
+        self.const_labels = {k: str(v) for k, v in (const_labels or {}).items()}
+        self._families = {}     # name -> [type, help, {label_tuple: child}]
+        self._lock = threading.Lock()
+
+    def _child(self, kind, name, help, labels, factory):
+        key = tuple(sorted((k, str(v)) for k, v in labels.items()))
+        with self._lock:
+            fam = self._families.get(name)
+            if fam is None:
+                fam = self._families[name] = [kind, help, {}]
+            elif fam[0] != kind:
+                raise ValueError(f"metric {name} sudah terdaftar sebagai {fam[0]}")
+            child = fam[2].get(key)
+            if child is None:
+                child = fam[2][key] = factory()
+            return child
+
+    def counter(self, name, help, **labels) -> Counter:
+        return self._child("counter", name, help, labels, Counter)
+
+    def gauge(self, name, help, **labels) -> Gauge:
+        return self._child("gauge", name, help, labels, Gauge)
+
+    def histogram(self, name, help, buckets=LATENCY_BUCKETS, **labels) -> Histogram:
+        return self._child("histogram", name, help, labels, lambda: Histogram(buckets))
+
+    def counter_fn(self, name, help, fn, **labels):
+        """Counter yang nilainya dibaca dari fn() saat scrape (mis. LatestQueue.dropped)."""
+        child = self._child("counter", name, help, labels, lambda: _FnValue(fn))
+        child.fn = fn
+        return child
+
+    def gauge_fn(self, name, help, fn, **labels):
+        child = self._child("gauge", name, help, labels, lambda: _FnValue(fn))
+        child.fn = fn
+        return child
+
+    def collect(self):
+        """Snapshot semua family: list dict {name, type, help, samples: [[labels, value], ...]}."""
+        with self._lock:
+            families = [(name, kind, help, list(children.items()))
+                        for name, (kind, help, children) in self._families.items()]
+        out = []
+        for name, kind, help, children in families:
+            samples = []
+            for key, child in children:
+                labels = {**self.const_labels, **dict(key)}
+                value = child.snapshot() if kind == "histogram" else child.value
+                samples.append([labels, value])
+            out.append({"name": name, "type": kind, "help": help, "samples": samples})
+        return out
+
+
+def merge_families(*collections):
+    """Gabungkan beberapa hasil collect() (satu family per nama, sample digabung)."""
+    merged = {}
+    for families in collections:
+        for fam in families:
+            cur = merged.get(fam["name"])
+            if cur is None:
+                merged[fam["name"]] = {**fam, "samples": list(fam["samples"])}
+            elif cur["type"] == fam["type"]:
+                cur["samples"].extend(fam["samples"])
+    return list(merged.values())
+
+
+def _fmt_value(v):
+    if v is None or (isinstance(v, float) and math.isnan(v)):
+        return "NaN"
+    if v == math.inf:
+        return "+Inf"
+    if v == -math.inf:
+        return "-Inf"
+    if float(v).is_integer():
+        return str(int(v))
+    return repr(float(v))
+
+
+def _fmt_labels(labels):
+    if not labels:
+        return ""
+    parts = []
+    for k, v in sorted(labels.items()):
+        v = str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        parts.append(f'{k}="{v}"')
+    return "{" + ",".join(parts) + "}"
+
+
+def render(families) -> str:
+    """collect() / merge_families() -> text format Prometheus."""
+    lines = []
+    for fam in sorted(families, key=lambda f: f["name"]):
+        name = fam["name"]
+        lines.append(f"# HELP {name} {fam['help']}")
+        lines.append(f"# TYPE {name} {fam['type']}")
+        for labels, value in fam["samples"]:
+            if fam["type"] == "histogram":
+                for le, n in value["buckets"]:
+                    lines.append(f"{name}_bucket{_fmt_labels({**labels, 'le': _fmt_value(le)})} {n}")
+                lines.append(f"{name}_sum{_fmt_labels(labels)} {_fmt_value(value['sum'])}")
+                lines.append(f"{name}_count{_fmt_labels(labels)} {value['count']}")
+            else:
+                lines.append(f"{name}{_fmt_labels(labels)} {_fmt_value(value)}")
+    return "\n".join(lines) + "\n"
+
+
+def write_snapshot(path, families):
+    # json default menulis inf/NaN sebagai Infinity/NaN (dibaca balik oleh json.load)
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump({"ts": time.time(), "families": families}, f, separators=(",", ":"))
+    os.replace(tmp, path)
+
+
+def read_snapshot(path, max_age_s: float = 30.0):
+    """Family dari snapshot worker; None kalau tidak ada / basi (worker mati) / rusak."""
+    try:
+        with open(path) as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if time.time() - data.get("ts", 0) > max_age_s:
+        return None
+    return data.get("families", [])
+
+
+class MetricsExporter:
+    """
+    Thread background: tulis snapshot JSON ke `snapshot_path` tiap `interval`
+    detik (dibaca API), dan/atau layani `GET /metrics` di `port`.
+    """
+    def __init__(self, registry, snapshot_path=None, interval: float = 5.0, port: int = 0, host: str = "0.0.0.0"):
+        self.registry = registry
+        self.snapshot_path = snapshot_path if interval and interval > 0 else None
+        self.interval = float(interval)
+        self._stop = threading.Event()
+        self._thread = None
+        self._server = None
+
+        if port:
+            registry_ = registry
+
+            class _Handler(BaseHTTPRequestHandler):
+                def do_GET(self):
+                    if self.path.split("?")[0] != "/metrics":
+                        self.send_error(404)
+                        return
+                    body = render(registry_.collect()).encode()
+                    self.send_response(200)
+                    self.send_header("Content-Type", CONTENT_TYPE)
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+
+                def log_message(self, *args):
+                    pass
+
+            self._server = ThreadingHTTPServer((host, int(port)), _Handler)
+            self._server.daemon_threads = True
+            threading.Thread(target=self._server.serve_forever, name="metrics-http", daemon=True).start()
+
+        if self.snapshot_path:
+            self._thread = threading.Thread(target=self._run, name="metrics-snapshot", daemon=True)
+            self._thread.start()
+
+    def _write(self):
+        try:
+            write_snapshot(self.snapshot_path, self.registry.collect())
+        except OSError as e:
+            print(f"[metrics] gagal menulis snapshot {self.snapshot_path}: {e}")
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._write()
+
+    def close(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=2.0)
+        if self.snapshot_path:
+            try:
+                os.remove(self.snapshot_path)   # worker berhenti -> API tidak melaporkan angka basi
+            except OSError:
+                pass
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+
+
+class WorkerMetrics:
+    """
+    Metric standar satu (stream, area) di worker. Hot loop cukup memanggil
+    `stage[name].observe(detik)`, `frames.inc()`, `inferences.inc()` dan
+    `tracks.set(n)`; sisanya dibaca lewat callback saat scrape.
+
+    Worker multi-stream memecahnya: stage per kamera (decode/render/encode,
+    `counting=False`) dan stage per area (infer/track/count) lewat `stages`.
+    """
+    STAGES = ("decode", "infer", "track", "count", "render", "encode")
+
+    def __init__(self, registry, stages=STAGES, counting: bool = True, **labels):
+        labels = {k: "" if v is None else v for k, v in labels.items()}
+        self.registry = registry
+        self.labels = labels
+        self.stage = {
+            s: registry.histogram("pc_stage_seconds", "Latency per stage worker (detik)", stage=s, **labels)
+            for s in stages
+        }
+        if counting:
+            self.frames = registry.counter("pc_frames_total", "Frame yang diproses (counting)", **labels)
+            self.inferences = registry.counter("pc_inferences_total", "Frame yang menjalankan model.predict",
+                                               **labels)
+            self.tracks = registry.gauge("pc_tracks_active", "Jumlah track aktif hasil tracker", **labels)
+
+    def watch_fps(self, fps_meter):
+        self.registry.gauge_fn("pc_inference_fps", "FPS inference (EMA)", lambda: fps_meter.value, **self.labels)
+
+    def watch_queue(self, name, queue):
+        self.registry.gauge_fn("pc_queue_depth", "Isi queue antar stage", lambda: len(queue),
+                               queue=name, **self.labels)
+        self.registry.counter_fn("pc_frames_dropped_total", "Item yang dibuang queue drop-oldest",
+                                 lambda: queue.dropped, queue=name, **self.labels)
+        if hasattr(queue, "blocked_seconds"):
+            self.registry.counter_fn("pc_queue_blocked_seconds_total",
+                                     "Waktu producer menunggu queue tanpa drop (back-pressure)",
+                                     lambda: queue.blocked_seconds, queue=name, **self.labels)
+
+    def watch_sink(self, sink):
+        self.registry.counter_fn("pc_render_skipped_total", "Frame yang tidak dirender (tanpa viewer / rate limit)",
+                                 lambda: sink.skipped, **self.labels)
+
+    def watch_counter(self, counter):
+        self.registry.gauge_fn("pc_inside_current", "Orang di dalam polygon saat ini",
+                               lambda: counter.current_inside, **self.labels)
+
+    def watch_scheduler(self, scheduler):
+        if scheduler is None:
+            return
+        for reason in ("dup", "static", "rate"):
+            self.registry.counter_fn("pc_inference_skipped_total", "Inference yang dilewati motion scheduler",
+                                     lambda r=reason: getattr(scheduler, f"skipped_{r}"), reason=reason, **self.labels)
+
+
+def instrument_dblogger(registry, dblogger):
+    """Latency tulis DB + statistik antrian write-behind (sekali per proses worker)."""
+    if dblogger is None:
+        return
+    dblogger.write_seconds = registry.histogram("pc_db_write_seconds",
+                                                "Latency tulis DB (flush batch / query sync)")
+    if hasattr(dblogger, "pending"):
+        registry.gauge_fn("pc_db_queue_depth", "Event yang menunggu flush ke DB", lambda: dblogger.pending)
+        registry.counter_fn("pc_db_events_flushed_total", "Event yang sudah tersimpan di DB",
+                            lambda: dblogger.flushed_events)
+        registry.counter_fn("pc_db_events_dropped_total", "Event yang dibuang karena buffer penuh",
+                            lambda: dblogger.dropped_events)
+        registry.counter_fn("pc_db_flush_failures_total", "Flush batch yang gagal",
+                            lambda: dblogger.failed_flushes)
@@ -0,0 +1,101 @@
+# workers/overlay.py
+"""
+Renderer overlay polygon dengan layer statis yang dihitung sekali per
+polygon / resolusi output.
+
+Versi lama per frame: frame.copy() + cv2.polylines + 2x boolean-mask gather
+`vis[mask == 0]`, perkalian float, lalu scatter balik. Di sini:
+
+- dim      : LUT uint8 (v * dim, hasil identik dengan versi float) diterapkan
+             ke seluruh frame langsung ke buffer output, lalu bagian dalam
+             polygon (hanya di bounding box-nya) disalin dari frame asli via
+             cv2.copyTo. Integer-only, tanpa array bool / float sementara.
+- outline  : piksel garis polygon (thickness 2) + warnanya (sudah di-dim untuk
+             sisi luar) disimpan sebagai indeks flat -> satu assignment.
+- buffer   : output (dan frame hasil resize bila scale != 1) dialokasikan
+             sekali dan dipakai ulang.
+
+Box / teks tetap digambar pemanggil di atas hasil compose().
+"""
+import cv2
+import numpy as np
+
+DIM_FACTOR = 0.35
+OUTLINE_COLOR = (0, 255, 255)
+OUTLINE_THICKNESS = 2
+
+
+class OverlayRenderer:
+    """
+    poly_px (N,1,2) dan mask (H,W) dalam koordinat frame asli; scale < 1
+    menghasilkan output yang lebih kecil (layer statis ikut di-scale).
+    Beberapa area di satu frame: poly_px = list polygon, mask = gabungan mask-nya.
+
+    PENTING: compose() mengembalikan buffer yang sama setiap frame; encode /
+    salin hasilnya sebelum memanggil compose() berikutnya.
+    """
+    def __init__(self, poly_px, mask, scale: float = 1.0, dim: float = DIM_FACTOR,
+                 outline_color=OUTLINE_COLOR, outline_thickness: int = OUTLINE_THICKNESS):
+        self.scale = float(scale)
+        polys = list(poly_px) if isinstance(poly_px, (list, tuple)) else [poly_px]
+        H, W = mask.shape[:2]
+        if self.scale != 1.0:
+            W, H = max(int(round(W * self.scale)), 1), max(int(round(H * self.scale)), 1)
+            mask = cv2.resize(mask, (W, H), interpolation=cv2.INTER_NEAREST)
+            polys = [np.rint(np.asarray(p) * self.scale).astype(np.int32) for p in polys]
+        self.size = (W, H)
+        self.polys = polys
+        self.mask = mask
+
+        # LUT dim: sama persis dengan (v * dim).astype(np.uint8)
+        self.lut = (np.arange(256) * dim).astype(np.uint8)
+
+        # bagian dalam polygon hanya perlu disalin di dalam bounding box-nya
+        x, y, w, h = cv2.boundingRect(np.concatenate([p.reshape(-1, 2) for p in polys]).reshape(-1, 1, 2))
+        x0, y0 = max(x, 0), max(y, 0)
+        x1, y1 = min(x + w, W), min(y + h, H)
+        self._inner = (slice(y0, y1), slice(x0, x1)) if x1 > x0 and y1 > y0 else None
+        self._inner_mask = np.ascontiguousarray(mask[self._inner]) if self._inner else None
+
+        # outline statis, termasuk efek dim untuk piksel garis di luar polygon
+        line = np.zeros((H, W), np.uint8)
+        cv2.polylines(line, [p.reshape(-1, 1, 2) for p in polys], True, 255, outline_thickness)
+        self._outline_idx = np.flatnonzero(line)
+        colors = np.tile(np.array(outline_color, np.uint8), (len(self._outline_idx), 1))
+        outside = mask.reshape(-1)[self._outline_idx] == 0
+        colors[outside] = self.lut[colors[outside]]
+        self._outline_color = colors
+
+        self._vis = np.empty((H, W, 3), np.uint8)
+        self._scaled = np.empty((H, W, 3), np.uint8) if self.scale != 1.0 else None
+
+    def compose(self, frame):
+        """Frame BGR -> buffer output dengan area luar polygon di-dim + outline polygon."""
+        if self._scaled is not None:
+            src = cv2.resize(frame, self.size, dst=self._scaled, interpolation=cv2.INTER_AREA)
+        else:
+            src = frame
+        vis = self._vis
+        cv2.LUT(src, self.lut, dst=vis)
+        if self._inner is not None:
+            ys, xs = self._inner
+            cv2.copyTo(src[ys, xs], self._inner_mask, vis[ys, xs])
+        vis.reshape(-1, 3)[self._outline_idx] = self._outline_color
+        return vis
+
+
+_RENDERER_CACHE = {}
+_RENDERER_CACHE_MAX = 8
+
+
+def get_overlay_renderer(poly_px, mask, scale: float = 1.0):
+    """OverlayRenderer per (polygon, resolusi, scale), dibangun ulang hanya kalau berubah."""
+    polys = poly_px if isinstance(poly_px, (list, tuple)) else [poly_px]
+    key = (tuple(np.ascontiguousarray(p).tobytes() for p in polys), mask.shape, float(scale))
+    renderer = _RENDERER_CACHE.pop(key, None)
+    if renderer is None:
+        renderer = OverlayRenderer(poly_px, mask, scale)
+        while len(_RENDERER_CACHE) >= _RENDERER_CACHE_MAX:
+            _RENDERER_CACHE.pop(next(iter(_RENDERER_CACHE)))
+    _RENDERER_CACHE[key] = renderer     # urutan insert = LRU
+    return renderer
@@ -0,0 +1,159 @@
+# workers/pipeline.py
+"""
+Building blocks untuk mode pipeline (decode -> inference -> counting -> render).
+
+Setiap stage jalan di thread sendiri. Hop yang boleh lossy (decode -> infer,
+count -> render) memakai LatestQueue: antrian berukuran tetap yang tidak
+pernah mem-block producer; kalau penuh, item PALING LAMA dibuang. Dengan
+begitu inference selalu dapat frame terbaru dan stage render yang lambat
+tidak pernah menahan stage counting.
+
+Hop infer -> count memakai BlockingQueue: tidak pernah membuang item. Kalau
+counting/DB tertinggal, inference yang menunggu (back-pressure) dan frame
+dibuang di hop decode -> infer, sehingga tracker & counter tetap melihat
+setiap hasil deteksi secara berurutan.
+"""
+import threading
+import time
+from collections import deque
+
+
+class QueueClosed(Exception):
+    """Dilempar get() ketika queue sudah ditutup dan kosong."""
+
+
+class LatestQueue:
+    def __init__(self, maxsize: int = 1):
+        self.maxsize = max(int(maxsize), 1)
+        self._items = deque()
+        self._cond = threading.Condition()
+        self._closed = False
+        self.dropped = 0
+
+    def put(self, item) -> bool:
+        """Masukkan item tanpa blocking. Return True kalau ada item lama yang dibuang."""
+        with self._cond:
+            dropped = False
+            if len(self._items) >= self.maxsize:
+                self._items.popleft()
+                self.dropped += 1
+                dropped = True
+            self._items.append(item)
+            self._cond.notify()
+            return dropped
+
+    def get(self, timeout: float = None):
+        """Ambil item tertua yang masih ada; None kalau timeout."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while not self._items:
+                if self._closed:
+                    raise QueueClosed()
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return None
+                self._cond.wait(remaining)
+            return self._items.popleft()
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def __len__(self):
+        with self._cond:
+            return len(self._items)
+
+
+class BlockingQueue:
+    """
+    Queue berukuran tetap tanpa drop: put() menunggu sampai ada tempat.
+    Interface get/close/len/dropped sama dengan LatestQueue (dropped selalu 0);
+    waktu producer menunggu dicatat di blocked_seconds.
+    """
+    def __init__(self, maxsize: int = 1):
+        self.maxsize = max(int(maxsize), 1)
+        self._items = deque()
+        self._cond = threading.Condition()
+        self._closed = False
+        self.dropped = 0
+        self.blocked_seconds = 0.0
+
+    def put(self, item, timeout: float = None) -> bool:
+        """Masukkan item; False kalau timeout (item TIDAK masuk, panggil lagi). QueueClosed kalau ditutup."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            if len(self._items) >= self.maxsize and not self._closed:
+                t0 = time.monotonic()
+                try:
+                    while len(self._items) >= self.maxsize and not self._closed:
+                        remaining = None if deadline is None else deadline - time.monotonic()
+                        if remaining is not None and remaining <= 0:
+                            return False
+                        self._cond.wait(remaining)
+                finally:
+                    self.blocked_seconds += time.monotonic() - t0
+            if self._closed:
+                raise QueueClosed()
+            self._items.append(item)
+            self._cond.notify_all()
+            return True
+
+    def get(self, timeout: float = None):
+        """Ambil item tertua; None kalau timeout."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while not self._items:
+                if self._closed:
+                    raise QueueClosed()
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return None
+                self._cond.wait(remaining)
+            item = self._items.popleft()
+            self._cond.notify_all()
+            return item
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def __len__(self):
+        with self._cond:
+            return len(self._items)
+
+
+def start_stage(name: str, fn, stop_event: threading.Event, *args):
+    """
+    Jalankan fn(*args) di daemon thread. Exception di dalam stage di-print
+    lalu stop_event di-set supaya seluruh pipeline ikut berhenti.
+    """
+    def _run():
+        try:
+            fn(*args)
+        except QueueClosed:
+            pass
+        except Exception as e:
+            print(f"[pipeline] stage '{name}' crashed: {e!r}")
+        finally:
+            stop_event.set()
+
+    t = threading.Thread(target=_run, name=f"stage-{name}", daemon=True)
+    t.start()
+    return t
+
+
+class RatePacer:
+    """Pacing sederhana ke target fps (sama seperti pola time.sleep di worker)."""
+    def __init__(self, fps: float):
+        self.target_dt = 1.0 / fps if fps and fps > 0 else 0
+        self.prev_tick = time.perf_counter()
+
+    def wait(self):
+        if self.target_dt > 0:
+            now = time.perf_counter()
+            dt = now - self.prev_tick
+            if dt < self.target_dt:
+                time.sleep(self.target_dt - dt)
+            self.prev_tick = time.perf_counter()
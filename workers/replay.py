@@ -0,0 +1,395 @@
+# workers/replay.py
+"""
+Mode replay offline (`detect_track_count.py --replay`): hitung ulang rekaman
+mp4 sekali jalan secepat mungkin, tanpa pacing --fps, tanpa latest.jpg/ring.
+
+- Timestamp event = waktu mulai rekaman + PTS frame (bukan jam dinding).
+  Waktu mulai dari --replay-start, atau meta.txt hasil
+  samples/ffmpeg_extract.sh (captured_at - duration_s), atau mtime file.
+- Beberapa frame digabung ke satu model.predict (--replay-batch).
+- --replay-workers N: video dipecah menjadi segmen (--replay-segment detik)
+  yang diproses paralel di process pool. Tiap segmen mulai --replay-overlap
+  detik lebih awal sebagai warm-up (tracker + state inside/outside dibangun,
+  event di warm-up dibuang), jadi setiap frame menghasilkan event tepat dari
+  satu segmen. Track ID disambung antar segmen dengan mencocokkan posisi track
+  di frame batas (Hungarian, gating --trk-max-dist).
+- Output: CSV (--replay-out) dan/atau bulk load ke DB (--db-log, tanpa NOTIFY
+  dan tanpa menyentuh area_live). Load DB idempoten: dalam satu transaksi,
+  event (stream, area) di rentang rekaman [mulai, selesai) diganti hasil
+  replay dan area_counts menit-menit yang tersentuh dihitung ulang dari
+  area_events, jadi replay ulang rekaman yang sama tidak menggandakan count.
+  Gagal tulis -> rollback dan exit code != 0.
+"""
+import argparse, csv, math, os, time
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+import cv2
+import numpy as np
+import psycopg2
+from psycopg2.extras import execute_values
+
+from workers.detector import load_detector, resolve_model
+from workers.trackers.assignment import linear_assignment
+
+
+class EventCollector:
+    """Pengganti dblogger di dalam segmen: event disimpan di memori, hanya saat `active`."""
+    def __init__(self):
+        self.events = []        # (track_id lokal, ts, DIRECTION)
+        self.active = False
+
+    def log_event_and_counts(self, stream_id, area_id, track_id, direction, ts=None):
+        if self.active:
+            self.events.append((int(track_id), ts, direction.upper()))
+
+    def upsert_live(self, stream_id, area_id, current_inside):
+        pass    # data historis: area_live tidak disentuh
+
+    def close(self):
+        pass
+
+
+def track_snapshot(tracker):
+    """
+    Posisi track yang terlihat di update terakhir {id: (cx, cy)}
+    (ArrayCentroidTracker/Kalman atau CentroidTracker). Track yang sedang
+    miss tidak ikut, supaya ID lama tidak diwariskan ke orang baru.
+    """
+    if hasattr(tracker, "ids"):
+        visible = tracker.miss == 0
+        return {tid: tuple(c) for tid, c in zip(tracker.ids[visible].tolist(), tracker.centers[visible].tolist())}
+    return {tid: (t["cx"], t["cy"]) for tid, t in tracker.tracks.items() if t["miss"] == 0}
+
+
+def detect_frames(model, frames, roi_rect, args, tiler=None):
+    """Deteksi untuk beberapa frame sekaligus (satu predict), list deteksi per frame."""
+    from workers import detect_track_count as dtc
+    if not frames:
+        return []
+    if tiler is not None:
+        images, spans = [], []
+        for frame in frames:
+            crops = tiler.crops(frame)
+            spans.append((len(images), len(images) + len(crops)))
+            images.extend(crops)
+        preds = dtc.predict_rois(model, images, args, imgsz=tiler.imgsz)
+        return [dtc.parse_tiled_detections(preds[a:b], tiler, args) for a, b in spans]
+    images = [dtc.prepare_roi(frame, roi_rect, args) for frame in frames]
+    return [dtc.parse_detections(r, roi_rect, args) for r in dtc.predict_rois(model, images, args)]
+
+
+def process_segment(args, poly_norm, seg, start_ts):
+    """
+    Proses frame [seg.start, seg.end) (end None = sampai EOF) dengan warm-up dari
+    seg.warm_start. Dijalankan di proses pool, jadi semua state dibangun di sini.
+    Timestamp event = start_ts (waktu PTS 0) + PTS frame.
+    """
+    from workers import detect_track_count as dtc
+    from workers.geometry import get_polygon_geometry
+
+    t0 = time.perf_counter()
+    cap = cv2.VideoCapture(args.video)
+    if not cap.isOpened():
+        raise RuntimeError(f"Gagal buka video: {args.video}")
+    W = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+    H = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    fps = cap.get(cv2.CAP_PROP_FPS) or 25.0
+    if seg["warm_start"] > 0:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, seg["warm_start"])
+
+    poly_px, roi_rect, mask = dtc.build_polygon_geometry(poly_norm, W, H, args)
+    geometry = get_polygon_geometry(poly_px, mask)
+    collector = EventCollector()
+    counter = dtc.PolygonCounter(geometry, args, collector)
+    tracker = dtc.build_tracker(args)
+    scheduler = dtc.build_scheduler(roi_rect, geometry, args)
+    tiler = dtc.build_tiler(roi_rect, geometry, args)
+    model = load_detector(args)
+
+    start, end = seg["start"], seg["end"]
+    idx = seg["warm_start"]     # indeks (0-based) frame berikutnya
+    start_tracks = {}
+    detections = []
+    inferred = frames = 0
+    eof = False
+
+    while not eof and (end is None or idx < end):
+        # kumpulkan satu batch frame + keputusan inference-nya
+        batch = []
+        while len(batch) < args.replay_batch and (end is None or idx < end):
+            ok, frame = cap.read()
+            if not ok:
+                eof = True
+                break
+            pts_ms = cap.get(cv2.CAP_PROP_POS_MSEC)
+            if pts_ms <= 0 and idx > 0:
+                pts_ms = idx * 1000.0 / fps
+            # frame_idx absolut (1-based) -> --frame-skip memilih frame yang sama di semua segmen
+            infer = dtc.should_infer(scheduler, frame, idx + 1, args, now=pts_ms / 1000.0)
+            level = scheduler.level if scheduler is not None else None
+            batch.append((idx, pts_ms, frame, infer, level))
+            idx += 1
+        if not batch:
+            break
+
+        results = iter(detect_frames(model, [b[2] for b in batch if b[3]], roi_rect, args, tiler))
+        for i, pts_ms, frame, infer, level in batch:
+            if i == start:
+                start_tracks = track_snapshot(tracker)
+                collector.active = True
+            if infer:
+                detections = frame_dets = next(results)
+                inferred += 1
+            else:
+                if scheduler is not None:
+                    scheduler.level = level     # level saat keputusan frame ini diambil
+                frame_dets = dtc.skipped_detections(scheduler, detections, tracker)
+            counter.event_ts = start_ts + timedelta(milliseconds=pts_ms)
+            counter.update(dtc.update_tracks(tracker, frame_dets), i + 1)
+            frames += 1
+
+    cap.release()
+    return {
+        "index": seg["index"],
+        "events": collector.events,
+        "start_tracks": start_tracks,
+        "end_tracks": track_snapshot(tracker),
+        "frames": frames,
+        "inferred": inferred,
+        "last_frame": idx,
+        "elapsed_s": time.perf_counter() - t0,
+    }
+
+
+def plan_segments(total_frames, fps, args):
+    """Bagi [0, total_frames) menjadi segmen + warm-up overlap. end None = sampai EOF."""
+    if args.replay_workers <= 1 or total_frames <= 0:
+        return [{"index": 0, "warm_start": 0, "start": 0, "end": None}]
+    if args.replay_segment > 0:
+        seg_len = int(args.replay_segment * fps)
+    else:
+        seg_len = math.ceil(total_frames / args.replay_workers)
+    seg_len = max(seg_len, 1)
+    overlap = int(args.replay_overlap * fps)
+    segs = []
+    for k, start in enumerate(range(0, total_frames, seg_len)):
+        end = start + seg_len
+        segs.append({"index": k, "warm_start": max(start - overlap, 0), "start": start,
+                     "end": end if end < total_frames else None})
+    return segs
+
+
+def stitch_segments(results, max_dist):
+    """
+    Satukan event semua segmen (urut) dengan track ID global. Track di awal
+    segmen k dicocokkan dengan track di akhir segmen k-1 (frame batas yang sama).
+    Return list (track_id, ts, direction).
+    """
+    next_gid = 1
+    prev_end = {}       # id global -> posisi di akhir segmen sebelumnya
+    merged = []
+    for res in results:
+        mapping = {}
+        start_tracks = res["start_tracks"]
+        if prev_end and start_tracks:
+            lids, gids = list(start_tracks), list(prev_end)
+            a = np.array([start_tracks[k] for k in lids], np.float64)
+            b = np.array([prev_end[k] for k in gids], np.float64)
+            dist = np.hypot(a[:, 0, None] - b[None, :, 0], a[:, 1, None] - b[None, :, 1])
+            gate = dist <= max_dist
+            big = (max_dist + 1.0) * (min(dist.shape) + 1)
+            rows, cols = linear_assignment(np.where(gate, dist, big))
+            for r, c in zip(rows.tolist(), cols.tolist()):
+                if gate[r, c]:
+                    mapping[lids[r]] = gids[c]
+
+        def gid_of(lid):
+            nonlocal next_gid
+            if lid not in mapping:
+                mapping[lid] = next_gid
+                next_gid += 1
+            return mapping[lid]
+
+        merged.extend((gid_of(tid), ts, direction) for tid, ts, direction in res["events"])
+        prev_end = {gid_of(lid): pos for lid, pos in res["end_tracks"].items()}
+    return merged
+
+
+def replay_start_time(args, duration_s):
+    """Waktu (UTC) untuk PTS 0."""
+    if args.replay_start:
+        ts = datetime.fromisoformat(args.replay_start.replace("Z", "+00:00"))
+        return ts.astimezone(timezone.utc)     # naive = zona waktu lokal
+    meta = Path(args.video).with_name("meta.txt")
+    if meta.exists():
+        info = dict(line.strip().split("=", 1) for line in meta.read_text().splitlines() if "=" in line)
+        if "captured_at" in info:
+            # ffmpeg_extract.sh menulis captured_at SETELAH rekaman selesai
+            end = datetime.fromisoformat(info["captured_at"].replace("Z", "+00:00"))
+            return end - timedelta(seconds=float(info.get("duration_s", duration_s)))
+    mtime = datetime.fromtimestamp(os.path.getmtime(args.video), timezone.utc)
+    return mtime - timedelta(seconds=duration_s)
+
+
+def replace_replay_range(conn, args, rows, start_ts, end_ts):
+    """
+    Ganti data (stream, area) di [start_ts, end_ts) dengan event replay, dalam
+    transaksi `conn` (pemanggil yang commit / rollback):
+
+    - area_events di rentang dihapus (tracks replay sebelumnya yang jadi yatim
+      ikut dihapus), lalu event replay di-insert dengan track_id baru;
+    - area_counts menit [floor(start_ts), ceil(end_ts)) di-nol-kan lalu diisi
+      ulang dari area_events (event live di menit tepi ikut terhitung). Baris
+      di-update, bukan dihapus, supaya updated_at berubah dan rollup ikut.
+
+    Return (event dihapus, event tersimpan, track_id pertama).
+    """
+    sid, aid = args.stream_id, args.area_id
+    lo = start_ts.replace(second=0, microsecond=0)
+    hi = end_ts.replace(second=0, microsecond=0)
+    if hi < end_ts:
+        hi += timedelta(minutes=1)
+    cur = conn.cursor()
+    # satu replay per (stream, area) pada satu waktu
+    cur.execute("SELECT pg_advisory_xact_lock(%s, %s)", (sid, aid))
+    cur.execute(
+        "DELETE FROM area_events WHERE stream_id = %s AND area_id = %s AND ts >= %s AND ts < %s RETURNING track_id",
+        (sid, aid, start_ts, end_ts),
+    )
+    old_tracks = sorted({r[0] for r in cur.fetchall() if r[0] is not None})
+    deleted = cur.rowcount
+    if old_tracks:
+        cur.execute(
+            """
+            DELETE FROM tracks t
+            WHERE t.track_id = ANY(%s)
+              AND NOT EXISTS (SELECT 1 FROM area_events e WHERE e.track_id = t.track_id)
+              AND NOT EXISTS (SELECT 1 FROM detections d WHERE d.track_id = t.track_id)
+            """,
+            (old_tracks,),
+        )
+
+    # offset track_id supaya tidak bentrok dengan tracks yang sudah ada di DB
+    cur.execute("SELECT COALESCE(MAX(track_id), 0) FROM tracks")
+    base = int(cur.fetchone()[0])
+    if rows:
+        execute_values(cur, "INSERT INTO tracks (track_id, stream_id) VALUES %s ON CONFLICT (track_id) DO NOTHING",
+                       sorted({(base + tid, sid) for tid, _ts, _d in rows}))
+        execute_values(cur, "INSERT INTO area_events (stream_id, area_id, track_id, ts, direction) VALUES %s",
+                       [(sid, aid, base + tid, ts, direction) for tid, ts, direction in rows], page_size=1000)
+
+    cur.execute(
+        """
+        UPDATE area_counts SET enters = 0, exits = 0
+        WHERE stream_id = %(sid)s AND area_id = %(aid)s AND window_start >= %(lo)s AND window_start < %(hi)s
+          AND (enters, exits) <> (0, 0)
+        """,
+        {"sid": sid, "aid": aid, "lo": lo, "hi": hi},
+    )
+    cur.execute(
+        """
+        INSERT INTO area_counts (stream_id, area_id, window_start, window_end, enters, exits)
+        SELECT stream_id, area_id, date_trunc('minute', ts), date_trunc('minute', ts) + interval '1 minute',
+               COUNT(*) FILTER (WHERE direction = 'ENTER'), COUNT(*) FILTER (WHERE direction = 'EXIT')
+        FROM area_events
+        WHERE stream_id = %(sid)s AND area_id = %(aid)s AND ts >= %(lo)s AND ts < %(hi)s
+        GROUP BY stream_id, area_id, date_trunc('minute', ts)
+        ON CONFLICT (stream_id, area_id, window_start, window_end)
+        DO UPDATE SET enters = EXCLUDED.enters, exits = EXCLUDED.exits
+        """,
+        {"sid": sid, "aid": aid, "lo": lo, "hi": hi},
+    )
+
+    cur.execute("SELECT COUNT(*) FROM area_events WHERE stream_id = %s AND area_id = %s AND ts >= %s AND ts < %s",
+                (sid, aid, start_ts, end_ts))
+    stored = int(cur.fetchone()[0])
+    cur.close()
+    return deleted, stored, base + 1
+
+
+def write_events(args, events, start_ts, end_ts):
+    """
+    Tulis event hasil replay ke CSV dan/atau DB (replace rentang [start_ts, end_ts)).
+    Return False kalau load DB gagal / tidak lengkap (transaksi di-rollback).
+    """
+    rows = sorted(events, key=lambda r: r[1])
+    if rows:
+        end_ts = max(end_ts, rows[-1][1] + timedelta(milliseconds=1))
+
+    if args.replay_out:
+        os.makedirs(os.path.dirname(os.path.abspath(args.replay_out)), exist_ok=True)
+        with open(args.replay_out, "w", newline="") as f:
+            w = csv.writer(f)
+            w.writerow(["stream_id", "area_id", "track_id", "ts", "direction"])
+            for tid, ts, direction in rows:
+                w.writerow([args.stream_id, args.area_id, tid, ts.isoformat(), direction])
+        print(f"[replay] {len(rows)} event -> {args.replay_out}")
+
+    if args.db_log:
+        from workers.detect_track_count import _env
+        try:
+            conn = psycopg2.connect(
+                host=_env("DB_HOST", "localhost"),
+                port=_env("DB_PORT", "5432"),
+                dbname=_env("DB_NAME", "people_counting"),
+                user=_env("DB_USER", "postgres"),
+                password=_env("DB_PASSWORD", ""),
+            )
+        except psycopg2.Error as e:
+            print(f"[replay] GAGAL konek DB: {e}")
+            return False
+        try:
+            with conn:      # commit kalau sukses, rollback kalau exception
+                deleted, stored, first_tid = replace_replay_range(conn, args, rows, start_ts, end_ts)
+                if stored != len(rows):
+                    raise RuntimeError(f"{stored}/{len(rows)} event tersimpan")
+        except (psycopg2.Error, RuntimeError) as e:
+            print(f"[replay] GAGAL load DB, tidak ada yang diubah (rollback): {e}")
+            return False
+        finally:
+            conn.close()
+        print(f"[replay] {stored}/{len(rows)} event -> DB, rentang {start_ts.isoformat()} .. {end_ts.isoformat()} "
+              f"diganti ({deleted} event lama dihapus, track_id mulai {first_tid})")
+    return True
+
+
+def run_replay(args, poly_norm):
+    cap = cv2.VideoCapture(args.video)
+    total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    fps = cap.get(cv2.CAP_PROP_FPS) or 25.0
+    cap.release()
+    duration_s = total / fps if total > 0 else 0.0
+    start_ts = replay_start_time(args, duration_s)
+    end_ts = start_ts + timedelta(seconds=duration_s)
+    segs = plan_segments(total, fps, args)
+    print(f"[replay] {args.video}: {total} frame @ {fps:.2f} fps ({duration_s:.0f} s), "
+          f"mulai {start_ts.isoformat()}, {len(segs)} segmen x {max(args.replay_workers, 1)} worker")
+
+    # export / cache model backend sekali di sini, bukan di tiap proses segmen
+    args = argparse.Namespace(**vars(args))
+    args.model = resolve_model(args)
+
+    t0 = time.perf_counter()
+    if len(segs) == 1:
+        results = [process_segment(args, poly_norm, segs[0], start_ts)]
+    else:
+        # spawn: tiap worker memuat model sendiri (aman untuk CUDA / torch threads)
+        ctx = mp.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=args.replay_workers, mp_context=ctx) as pool:
+            futures = [pool.submit(process_segment, args, poly_norm, seg, start_ts) for seg in segs]
+            results = [f.result() for f in futures]
+    elapsed = time.perf_counter() - t0
+
+    events = stitch_segments(results, float(args.trk_max_dist))
+    frames = sum(r["frames"] for r in results)
+    inferred = sum(r["inferred"] for r in results)
+    enters = sum(1 for e in events if e[2] == "ENTER")
+    print(f"[replay] {frames} frame ({inferred} inference) dalam {elapsed:.1f} s "
+          f"= {frames / max(elapsed, 1e-9):.1f} fps ({duration_s / max(elapsed, 1e-9):.1f}x realtime); "
+          f"ENTER={enters} EXIT={len(events) - enters}")
+    if not write_events(args, events, start_ts, end_ts):
+        raise SystemExit(1)
+    return events
@@ -0,0 +1,118 @@
+# workers/scheduler.py
+"""
+Penjadwal inference berbasis gerak (--scheduler motion).
+
+Sebelum model.predict, ROI diperkecil (lebar MOTION_WIDTH px, grayscale +
+blur) lalu dibandingkan dengan:
+
+- frame sebelumnya   -> identik = frame diulang oleh sumber HLS, skip
+                       (kecuali masih ada gerak yang tertunda karena rate limit);
+- frame terakhir yang di-inference (referensi) -> piksel yang berubah
+  > motion_thresh dihitung di seluruh ROI dan di pita sekitar tepi polygon.
+
+Keputusan:
+    gerak di pita tepi (>= motion_min_area)  -> inference tiap frame
+    gerak di tempat lain                     -> maks. motion_idle_fps
+    diam                                     -> skip, kecuali sudah
+                                                motion_max_gap detik
+
+Karena pembanding adalah frame referensi (bukan frame sebelumnya), gerakan
+lambat tetap terakumulasi sampai melewati ambang. Untuk frame yang di-skip
+pemanggil memakai ulang deteksi terakhir (scene belum berubah, jadi deteksi
+masih berlaku): track yang terlihat tidak menua, sedangkan track yang sudah
+pergi tetap menua dan dihapus seperti biasa.
+"""
+import time
+
+import cv2
+import numpy as np
+
+MOTION_WIDTH = 192
+
+
+class MotionScheduler:
+    def __init__(self, roi_rect, geometry, thresh: int = 18, min_area: float = 0.002,
+                 edge_band: float = 40.0, idle_fps: float = 2.0, max_gap: float = 2.0):
+        x, y, w, h = roi_rect
+        self.roi_rect = roi_rect
+        s = min(1.0, MOTION_WIDTH / max(w, 1))
+        self.size = (max(int(round(w * s)), 1), max(int(round(h * s)), 1))
+        self.thresh = int(thresh)
+        self.min_area = float(min_area)
+        self.idle_interval = 1.0 / idle_fps if idle_fps > 0 else float("inf")
+        self.max_gap = float(max_gap)
+
+        # pita |signed distance| <= edge_band di sekitar tepi polygon, resolusi kecil
+        band = (np.abs(geometry.sdf[y:y + h, x:x + w]) <= edge_band).astype(np.uint8) * 255
+        self.edge_band = cv2.resize(band, self.size, interpolation=cv2.INTER_NEAREST)
+        self.edge_px = max(cv2.countNonZero(self.edge_band), 1)
+        self.total_px = self.size[0] * self.size[1]
+
+        self.ref = None         # ROI kecil saat inference terakhir
+        self.prev = None        # ROI kecil frame sebelumnya
+        self.pending = False    # gerak terdeteksi tapi inference ditunda (rate limit)
+        self.last_infer = float("-inf")
+        self.level = "idle"     # idle | motion | edge (untuk HUD / debug)
+
+        self.inferred = 0
+        self.skipped_dup = 0
+        self.skipped_static = 0
+        self.skipped_rate = 0
+
+    def reset(self):
+        """Lupakan referensi (mis. video di-loop ulang) -> frame berikutnya di-inference."""
+        self.ref = None
+        self.prev = None
+        self.pending = False
+        self.last_infer = float("-inf")
+
+    def _small(self, frame):
+        x, y, w, h = self.roi_rect
+        small = cv2.resize(frame[y:y + h, x:x + w], self.size, interpolation=cv2.INTER_AREA)
+        gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        return cv2.GaussianBlur(gray, (3, 3), 0)
+
+    def _infer(self, small, now):
+        self.ref = small
+        self.pending = False
+        self.last_infer = now
+        self.inferred += 1
+        return True
+
+    def decide(self, frame, now=None) -> bool:
+        """True = jalankan model.predict untuk frame ini."""
+        now = time.monotonic() if now is None else now
+        small = self._small(frame)
+        prev, self.prev = self.prev, small
+        if not self.pending and prev is not None and cv2.norm(small, prev, cv2.NORM_INF) == 0:
+            self.skipped_dup += 1
+            return False
+        if self.ref is None:
+            return self._infer(small, now)
+
+        _, moving = cv2.threshold(cv2.absdiff(small, self.ref), self.thresh, 255, cv2.THRESH_BINARY)
+        edge_frac = cv2.countNonZero(cv2.bitwise_and(moving, self.edge_band)) / self.edge_px
+        all_frac = cv2.countNonZero(moving) / self.total_px
+        gap = now - self.last_infer
+
+        if edge_frac >= self.min_area:
+            self.level = "edge"
+            return self._infer(small, now)
+        if all_frac >= self.min_area:
+            self.level = "motion"
+            if gap >= self.idle_interval:
+                return self._infer(small, now)
+            self.pending = True
+            self.skipped_rate += 1
+            return False
+        self.level = "idle"
+        self.pending = False
+        if gap >= self.max_gap:
+            return self._infer(small, now)
+        self.skipped_static += 1
+        return False
+
+    def stats(self) -> str:
+        total = self.inferred + self.skipped_dup + self.skipped_static + self.skipped_rate
+        return (f"infer={self.inferred}/{total} skip(dup={self.skipped_dup} "
+                f"static={self.skipped_static} rate={self.skipped_rate}) level={self.level}")
@@ -0,0 +1,68 @@
+# workers/startup.py
+"""
+Ukur cold start worker: durasi tiap fase startup (import, buka video, ambil
+polygon, geometri, model, warm-up) dan waktu sampai frame pertama dihitung
+(time-to-first-count), diukur dari saat PROSES dimulai (bukan dari main()),
+jadi waktu import Python/numpy/cv2 ikut terhitung.
+
+Ringkasan dicetak sekali di stdout saat count pertama; setelah bind(registry)
+juga tersedia sebagai gauge `pc_startup_seconds{phase}` dan
+`pc_time_to_first_count_seconds`.
+"""
+import os, time
+
+
+def process_start_time():
+    """time.time() saat proses dimulai (Linux: /proc/self/stat); fallback ke sekarang."""
+    try:
+        with open("/proc/self/stat") as f:
+            # field 22 (starttime, clock ticks sejak boot); nama proses bisa berisi spasi -> split setelah ')'
+            start_ticks = int(f.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/uptime") as f:
+            uptime = float(f.read().split()[0])
+        started = time.time() - uptime + start_ticks / os.sysconf("SC_CLK_TCK")
+        return min(started, time.time())
+    except (OSError, ValueError, IndexError):
+        return time.time()
+
+
+class StartupTimer:
+    def __init__(self, t0=None):
+        self.t0 = process_start_time() if t0 is None else t0
+        self._last = self.t0
+        self.phases = {}            # nama fase -> detik (urut sesuai mark)
+        self.first_count_s = None
+        self._registry = None
+
+    def mark(self, phase: str):
+        """Tutup fase `phase` (durasi sejak mark sebelumnya)."""
+        now = time.time()
+        self.phases[phase] = self.phases.get(phase, 0.0) + (now - self._last)
+        self._last = now
+        if self._registry is not None:
+            self._export(phase)
+
+    def first_count(self):
+        """Panggil setelah counter.update pertama; cetak ringkasan sekali."""
+        if self.first_count_s is not None:
+            return
+        self.first_count_s = time.time() - self.t0
+        if self._registry is not None:
+            self._export_first_count()
+        parts = " | ".join(f"{name} {dt:.2f}s" for name, dt in self.phases.items())
+        print(f"[startup] {parts} | first count {self.first_count_s:.2f}s setelah proses mulai", flush=True)
+
+    def bind(self, registry):
+        self._registry = registry
+        for phase in self.phases:
+            self._export(phase)
+        if self.first_count_s is not None:
+            self._export_first_count()
+
+    def _export(self, phase):
+        self._registry.gauge("pc_startup_seconds", "Durasi fase startup worker (detik)",
+                             phase=phase).set(self.phases[phase])
+
+    def _export_first_count(self):
+        self._registry.gauge("pc_time_to_first_count_seconds",
+                             "Waktu dari proses mulai sampai frame pertama dihitung (detik)").set(self.first_count_s)
@@ -0,0 +1,170 @@
+# workers/trackers/array_centroid.py
+import numpy as np
+
+from workers.trackers.assignment import linear_assignment
+
+
+class ArrayCentroidTracker:
+    """
+    Versi vektorisasi dari CentroidTracker.
+
+    - State track disimpan di array NumPy kontigu (ids, boxes, centers, miss),
+      bukan dict per track.
+    - Matrix jarak detections x tracks dibangun sekaligus dengan NumPy.
+    - Assignment optimal (Hungarian) dengan gating max_distance, jadi tidak
+      tergantung urutan deteksi seperti greedy lama (mengurangi ID swap).
+
+    Kontrak update(detections) sama dengan CentroidTracker: input list dict
+    (x1,y1,x2,y2,cx,cy), output list dict track yang match/baru di frame ini
+    (urut sesuai deteksi) dengan tambahan "id" dan "miss".
+    """
+    _STATE = ("_ids", "_boxes", "_centers", "_miss")    # array per slot (ikut _reserve & compaction)
+
+    def __init__(self, max_distance=60, max_miss=20, capacity=64):
+        self.next_id = 1
+        self.max_distance = max_distance
+        self.max_miss = max_miss
+        capacity = max(int(capacity), 1)
+        self._ids = np.zeros(capacity, np.int64)
+        self._boxes = np.zeros((capacity, 4), np.int64)
+        self._centers = np.zeros((capacity, 2), np.int64)
+        self._miss = np.zeros(capacity, np.int32)
+        self._n = 0
+
+    def __len__(self):
+        return self._n
+
+    # view read-only ke state aktif (tanpa copy)
+    @property
+    def ids(self):
+        return self._ids[:self._n]
+
+    @property
+    def boxes(self):
+        return self._boxes[:self._n]
+
+    @property
+    def centers(self):
+        return self._centers[:self._n]
+
+    @property
+    def miss(self):
+        return self._miss[:self._n]
+
+    def _reserve(self, need):
+        cap = len(self._ids)
+        if need <= cap:
+            return
+        new_cap = max(need, cap * 2)
+        for name in self._STATE:
+            old = getattr(self, name)
+            arr = np.zeros((new_cap,) + old.shape[1:], old.dtype)
+            arr[:self._n] = old[:self._n]
+            setattr(self, name, arr)
+
+    def _match(self, det_centers):
+        """Return slot track untuk tiap deteksi (-1 = tidak ada match dalam max_distance)."""
+        n, D = self._n, len(det_centers)
+        det_slot = np.full(D, -1, np.int64)
+        if n == 0 or D == 0:
+            return det_slot
+
+        det_c = det_centers.astype(np.float32)
+        trk_c = self._centers[:n].astype(np.float32)
+        dx = det_c[:, 0, None] - trk_c[None, :, 0]
+        dy = det_c[:, 1, None] - trk_c[None, :, 1]
+        dist2 = dx * dx + dy * dy                            # (D, n), tanpa sqrt
+        gate = dist2 <= float(self.max_distance) ** 2
+        if not gate.any():
+            return det_slot
+
+        # pasangan tanpa ambiguitas (satu-satunya kandidat di baris & kolomnya)
+        # langsung di-assign; sisanya baru masuk solver
+        row_deg = gate.sum(axis=1)
+        col_deg = gate.sum(axis=0)
+        unique = gate & (row_deg[:, None] == 1) & (col_deg[None, :] == 1)
+        r_u, c_u = np.nonzero(unique)
+        det_slot[r_u] = c_u
+
+        rows_left = np.nonzero((row_deg > 0) & (det_slot < 0))[0]
+        cols_left = np.setdiff1d(np.nonzero(col_deg > 0)[0], c_u, assume_unique=True)
+        if len(rows_left) == 0 or len(cols_left) == 0:
+            return det_slot
+
+        sub_gate = gate[np.ix_(rows_left, cols_left)]
+        sub_dist = np.sqrt(dist2[np.ix_(rows_left, cols_left)], dtype=np.float64)
+        # pasangan di luar gate diberi cost yang selalu lebih mahal dari total
+        # semua pasangan valid -> solver memaksimalkan jumlah match dulu
+        big = (self.max_distance + 1.0) * (min(sub_gate.shape) + 1)
+        rows, cols = linear_assignment(np.where(sub_gate, sub_dist, big))
+        ok = sub_gate[rows, cols]
+        det_slot[rows_left[rows[ok]]] = cols_left[cols[ok]]
+        return det_slot
+
+    def update_arrays(self, det_boxes, det_centers):
+        """
+        det_boxes (D,4) int, det_centers (D,2) int.
+        Return (ids, boxes, centers) untuk track yang match/baru, urut sesuai deteksi.
+        """
+        det_boxes = np.asarray(det_boxes, np.int64).reshape(-1, 4)
+        det_centers = np.asarray(det_centers, np.int64).reshape(-1, 2)
+
+        # Step 1: mark all existing as missed
+        self._miss[:self._n] += 1
+
+        # Step 2: optimal assignment dalam max_distance
+        det_slot = self._match(det_centers)
+        matched = det_slot >= 0
+        slots = det_slot[matched]
+        self._boxes[slots] = det_boxes[matched]
+        self._centers[slots] = det_centers[matched]
+        self._miss[slots] = 0
+
+        # deteksi tanpa match -> track baru
+        new_det = np.nonzero(~matched)[0]
+        k = len(new_det)
+        if k:
+            self._reserve(self._n + k)
+            new_slots = np.arange(self._n, self._n + k)
+            self._ids[new_slots] = np.arange(self.next_id, self.next_id + k)
+            self._boxes[new_slots] = det_boxes[new_det]
+            self._centers[new_slots] = det_centers[new_det]
+            self._miss[new_slots] = 0
+            det_slot[new_det] = new_slots
+            self.next_id += k
+            self._n += k
+
+        # snapshot hasil (fancy indexing = copy) sebelum compaction
+        out = (self._ids[det_slot], self._boxes[det_slot], self._centers[det_slot])
+
+        # Step 3: remove long-missed
+        self._compact()
+        return out
+
+    def _compact(self):
+        """Buang track dengan miss > max_miss (compaction in-place, urutan slot tetap)."""
+        n = self._n
+        keep = self._miss[:n] <= self.max_miss
+        if not keep.all():
+            idx = np.nonzero(keep)[0]
+            m = len(idx)
+            for name in self._STATE:
+                arr = getattr(self, name)
+                arr[:m] = arr[idx]
+            self._n = m
+
+    def update(self, detections):
+        if detections:
+            arr = np.array(
+                [(d["x1"], d["y1"], d["x2"], d["y2"], d["cx"], d["cy"]) for d in detections],
+                dtype=np.int64,
+            )
+        else:
+            arr = np.empty((0, 6), np.int64)
+        ids, boxes, centers = self.update_arrays(arr[:, :4], arr[:, 4:6])
+
+        # Kembalikan list track aktif (id + bbox + centroid)
+        return [
+            {"x1": b[0], "y1": b[1], "x2": b[2], "y2": b[3], "cx": c[0], "cy": c[1], "miss": 0, "id": tid}
+            for tid, b, c in zip(ids.tolist(), boxes.tolist(), centers.tolist())
+        ]
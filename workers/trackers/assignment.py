@@ -0,0 +1,91 @@
+# workers/trackers/assignment.py
+"""
+Optimal assignment (Hungarian / shortest augmenting path) untuk matrix cost.
+
+Pakai scipy.optimize.linear_sum_assignment kalau tersedia (ikut terpasang
+bersama ultralytics); kalau tidak, fallback ke implementasi NumPy di bawah
+yang loop-nya hanya per baris (inner loop di-vektorisasi). scipy baru
+diimport saat assignment pertama supaya tidak menambah waktu startup worker.
+"""
+import numpy as np
+
+_scipy_lsa = False      # False = belum dicoba import, None = scipy tidak ada
+
+
+def _scipy_solver():
+    global _scipy_lsa
+    if _scipy_lsa is False:
+        try:
+            from scipy.optimize import linear_sum_assignment as lsa
+        except Exception:  # scipy opsional
+            lsa = None
+        _scipy_lsa = lsa
+    return _scipy_lsa
+
+
+def _hungarian_numpy(cost):
+    """Min-cost assignment untuk cost (n, m) dengan n <= m. Return (rows, cols)."""
+    n, m = cost.shape
+    u = np.zeros(n + 1)
+    v = np.zeros(m + 1)
+    p = np.zeros(m + 1, dtype=np.int64)    # p[j] = baris (1-based) yang memegang kolom j
+    way = np.zeros(m + 1, dtype=np.int64)
+
+    for i in range(1, n + 1):
+        p[0] = i
+        j0 = 0
+        minv = np.full(m + 1, np.inf)
+        used = np.zeros(m + 1, dtype=bool)
+        while True:
+            used[j0] = True
+            i0 = p[j0]
+            free = ~used[1:]
+            cur = cost[i0 - 1] - u[i0] - v[1:]
+            upd = free & (cur < minv[1:])
+            minv[1:][upd] = cur[upd]
+            way[1:][upd] = j0
+
+            masked = np.where(free, minv[1:], np.inf)
+            j1 = int(np.argmin(masked)) + 1
+            delta = masked[j1 - 1]
+
+            used_idx = np.nonzero(used)[0]
+            u[p[used_idx]] += delta
+            v[used_idx] -= delta
+            minv[1:][free] -= delta
+
+            j0 = j1
+            if p[j0] == 0:
+                break
+        # augment sepanjang jalur
+        while j0:
+            j1 = way[j0]
+            p[j0] = p[j1]
+            j0 = j1
+
+    cols = np.nonzero(p[1:])[0]
+    rows = p[1:][cols] - 1
+    order = np.argsort(rows)
+    return rows[order], cols[order]
+
+
+def linear_assignment(cost):
+    """
+    Solusi optimal min-cost untuk matrix cost (n, m) persegi panjang.
+    Return (row_ind, col_ind) terurut berdasarkan row_ind, seperti scipy.
+    Cost harus finite; pasangan yang "dilarang" beri nilai besar lalu
+    saring hasilnya di pemanggil.
+    """
+    cost = np.asarray(cost, dtype=np.float64)
+    if cost.size == 0:
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty
+    lsa = _scipy_solver()
+    if lsa is not None:
+        r, c = lsa(cost)
+        return r.astype(np.int64), c.astype(np.int64)
+    if cost.shape[0] <= cost.shape[1]:
+        return _hungarian_numpy(cost)
+    c, r = _hungarian_numpy(cost.T)
+    order = np.argsort(r)
+    return r[order], c[order]
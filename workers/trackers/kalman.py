@@ -0,0 +1,134 @@
+# workers/trackers/kalman.py
+import numpy as np
+
+from workers.trackers.array_centroid import ArrayCentroidTracker
+
+
+class KalmanCentroidTracker(ArrayCentroidTracker):
+    """
+    ArrayCentroidTracker + motion model constant-velocity (Kalman filter per
+    track, divektorisasi untuk semua track sekaligus).
+
+    - State per track: posisi (cx, cy) float + kecepatan (vx, vy) dalam
+      px/frame. Sumbu x dan y memakai model yang sama, jadi cukup satu
+      kovarians 2x2 [pos, vel] per track (array (n, 2, 2)).
+    - Tiap frame = satu langkah predict. Matching memakai posisi PREDIKSI
+      (gating max_distance + Hungarian dari kelas induk), jadi orang yang
+      bergerak cepat tidak lepas walau inference hanya tiap N frame.
+    - predict() untuk frame tanpa inference: semua track maju satu frame dan
+      track yang terlihat di inference terakhir dikembalikan dengan posisi
+      prediksi, sehingga counting/crossing tetap berjalan di antara deteksi.
+      Counter "miss" hanya bertambah di frame inference.
+
+    bbox ikut bergeser bersama centroid (ukuran dari deteksi terakhir).
+    """
+    _STATE = ArrayCentroidTracker._STATE + ("_pos", "_vel", "_cov", "_box_off")
+
+    def __init__(self, max_distance=60, max_miss=20, capacity=64,
+                 process_noise=1.0, measure_noise=4.0):
+        super().__init__(max_distance=max_distance, max_miss=max_miss, capacity=capacity)
+        capacity = len(self._ids)
+        self._pos = np.zeros((capacity, 2), np.float64)
+        self._vel = np.zeros((capacity, 2), np.float64)
+        self._cov = np.zeros((capacity, 2, 2), np.float64)
+        self._box_off = np.zeros((capacity, 4), np.int64)     # box - (cx, cy, cx, cy)
+
+        # discrete white-noise acceleration, dt = 1 frame
+        q = float(process_noise) ** 2
+        self._Q = q * np.array([[0.25, 0.5], [0.5, 1.0]])
+        self._R = float(measure_noise) ** 2
+        # ketidakpastian awal kecepatan track baru: sampai max_distance px/frame
+        self._init_cov = np.array([[self._R, 0.0], [0.0, float(max_distance) ** 2]])
+
+    @property
+    def velocities(self):
+        return self._vel[:self._n]
+
+    def _step(self):
+        """Satu langkah predict untuk semua track: x = F x, P = F P F^T + Q."""
+        n = self._n
+        if n == 0:
+            return
+        pos, vel, P = self._pos[:n], self._vel[:n], self._cov[:n]
+        pos += vel
+        p00, p01, p11 = P[:, 0, 0].copy(), P[:, 0, 1].copy(), P[:, 1, 1].copy()
+        P[:, 0, 0] = p00 + 2.0 * p01 + p11 + self._Q[0, 0]
+        P[:, 0, 1] = P[:, 1, 0] = p01 + p11 + self._Q[0, 1]
+        P[:, 1, 1] = p11 + self._Q[1, 1]
+        self._sync(slice(0, n))
+
+    def _sync(self, slots):
+        """Turunkan centers/boxes int dari posisi float."""
+        c = np.rint(self._pos[slots]).astype(np.int64)
+        self._centers[slots] = c
+        self._boxes[slots] = self._box_off[slots] + np.concatenate([c, c], axis=1)
+
+    def _correct(self, slots, det_centers):
+        """Update Kalman untuk track yang match (pengukuran = posisi centroid)."""
+        P = self._cov[slots]
+        S = P[:, 0, 0] + self._R
+        k0 = P[:, 0, 0] / S
+        k1 = P[:, 0, 1] / S
+        innov = det_centers - self._pos[slots]
+        self._pos[slots] += k0[:, None] * innov
+        self._vel[slots] += k1[:, None] * innov
+        p00, p01, p11 = P[:, 0, 0], P[:, 0, 1], P[:, 1, 1]
+        P_new = np.empty_like(P)
+        P_new[:, 0, 0] = (1.0 - k0) * p00
+        P_new[:, 0, 1] = P_new[:, 1, 0] = (1.0 - k0) * p01
+        P_new[:, 1, 1] = p11 - k1 * p01
+        self._cov[slots] = P_new
+
+    def update_arrays(self, det_boxes, det_centers):
+        """
+        Frame dengan inference. det_boxes (D,4) int, det_centers (D,2) int.
+        Return (ids, boxes, centers) untuk track yang match/baru, urut sesuai deteksi.
+        """
+        det_boxes = np.asarray(det_boxes, np.int64).reshape(-1, 4)
+        det_centers = np.asarray(det_centers, np.int64).reshape(-1, 2)
+
+        self._step()
+        self._miss[:self._n] += 1
+
+        det_slot = self._match(det_centers)
+        matched = det_slot >= 0
+        slots = det_slot[matched]
+        if len(slots):
+            self._correct(slots, det_centers[matched].astype(np.float64))
+            self._box_off[slots] = det_boxes[matched] - np.tile(det_centers[matched], 2)
+            self._miss[slots] = 0
+            self._sync(slots)
+
+        new_det = np.nonzero(~matched)[0]
+        k = len(new_det)
+        if k:
+            self._reserve(self._n + k)
+            new_slots = np.arange(self._n, self._n + k)
+            self._ids[new_slots] = np.arange(self.next_id, self.next_id + k)
+            self._pos[new_slots] = det_centers[new_det]
+            self._vel[new_slots] = 0.0
+            self._cov[new_slots] = self._init_cov
+            self._box_off[new_slots] = det_boxes[new_det] - np.tile(det_centers[new_det], 2)
+            self._miss[new_slots] = 0
+            det_slot[new_det] = new_slots
+            self.next_id += k
+            self._n += k
+            self._sync(new_slots)
+
+        out = (self._ids[det_slot], self._boxes[det_slot], self._centers[det_slot])
+        self._compact()
+        return out
+
+    def predict(self):
+        """
+        Frame TANPA inference: majukan semua track satu frame dan kembalikan
+        track yang terlihat di inference terakhir (miss == 0) dengan posisi
+        prediksi, format sama dengan update().
+        """
+        self._step()
+        visible = np.nonzero(self._miss[:self._n] == 0)[0]
+        return [
+            {"x1": b[0], "y1": b[1], "x2": b[2], "y2": b[3], "cx": c[0], "cy": c[1], "miss": 0, "id": tid}
+            for tid, b, c in zip(self._ids[visible].tolist(), self._boxes[visible].tolist(),
+                                 self._centers[visible].tolist())
+        ]
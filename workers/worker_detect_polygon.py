@@ -4,7 +4,15 @@ from pathlib import Path
 
 import cv2
 import numpy as np
-from ultralytics import YOLO
+import sys
+
+# Tambahkan REPO ROOT ke sys.path agar "workers.*" bisa diimport
+REPO_ROOT = Path(__file__).resolve().parents[1]
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+from workers.overlay import OverlayRenderer
+from workers.detector import add_detector_args, load_detector
 
 # ---------- DB loader (psycopg2) ----------
 import psycopg2
@@ -79,6 +87,7 @@ def main():
     ap.add_argument("--poly", default="", help="JSON list of [x_norm,y_norm] jika tidak pakai DB")
     ap.add_argument("--poly-pad", type=int, default=0, help="expand polygon outward in pixels")
     ap.add_argument("--model", default="yolov8l.pt", help="model YOLO (mis. yolov8s.pt / yolov8l.pt / path kustom)")
+    add_detector_args(ap)
     ap.add_argument("--roi-scale", type=float, default=1.5, help="pembesaran ROI sebelum inferensi (1.0=tanpa)")
     args = ap.parse_args()
 
@@ -127,8 +136,11 @@ def main():
     # ROI bbox (pakai nama yang konsisten!)
     x, y, w, h = cv2.boundingRect(poly_px)
 
+    # layer statis (dim luar area + outline polygon) dihitung sekali
+    overlay = OverlayRenderer(poly_px, mask)
+
     # --- load YOLO ---
-    model = YOLO(args.model)
+    model = load_detector(args)
 
     target = 1.0 / args.fps if args.fps > 0 else 0
     prev = time.perf_counter()
@@ -153,7 +165,8 @@ def main():
             roi_for_infer, imgsz=args.imgsz, conf=args.conf, classes=[0], iou=0.5, verbose=False
         )
 
-        vis = frame.copy()
+        # background: luar area digelapkan + polygon (layer statis)
+        vis = overlay.compose(frame)
 
         # gambar deteksi (centroid harus di dalam polygon)
         for r in results:
@@ -179,10 +192,6 @@ def main():
                 cv2.putText(vis, f"person {conf:.2f}",
                             (gx1, max(gy1 - 6, 0)), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0,255,0), 2)
 
-        # overlay polygon & gelapkan luar area
-        cv2.polylines(vis, [poly_px], True, (0, 255, 255), 2)
-        vis[mask == 0] = (vis[mask == 0] * 0.35).astype(np.uint8)
-
         # header kecil
         cv2.putText(
             vis,
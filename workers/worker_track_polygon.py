@@ -4,7 +4,17 @@ from pathlib import Path
 
 import cv2
 import numpy as np
-from ultralytics import YOLO
+import sys
+
+# Tambahkan REPO ROOT ke sys.path agar "workers.*" bisa diimport
+REPO_ROOT = Path(__file__).resolve().parents[1]
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+from workers.overlay import OverlayRenderer
+from workers.geometry import get_polygon_geometry
+from workers.tiling import TiledROI
+from workers.detector import add_detector_args, load_detector
 
 # ---------- DB loader (psycopg2) ----------
 import psycopg2
@@ -138,10 +148,13 @@ def main():
     ap.add_argument("--iou", type=float, default=0.5)
     ap.add_argument("--fps", type=float, default=8.0)
     ap.add_argument("--model", default="yolov8l.pt")  # ganti model bebas
+    add_detector_args(ap)
     ap.add_argument("--poly", default="", help="JSON list of [x_norm,y_norm] jika tidak pakai DB")
     ap.add_argument("--poly-pad", type=int, default=0, help="expand polygon outward in pixels")
     ap.add_argument("--trk-max-dist", type=int, default=80)
     ap.add_argument("--trk-max-miss", type=int, default=30)
+    ap.add_argument("--tile-size", type=int, default=0, help="inference per tile NxN px resolusi asli (0 = ROI utuh di-upscale 1.5x)")
+    ap.add_argument("--tile-overlap", type=float, default=0.2)
     args = ap.parse_args()
 
     os.makedirs(args.outdir, exist_ok=True)
@@ -178,8 +191,17 @@ def main():
         x, y, w, h = cv2.boundingRect(poly_px)
         mask = np.zeros((H, W), np.uint8); cv2.fillPoly(mask, [poly_px], 255)
 
+    # layer statis (dim luar area + outline polygon) dihitung sekali
+    overlay = OverlayRenderer(poly_px, mask)
+
+    # tile ROI resolusi asli (tile di luar polygon dilewati)
+    tiler = None
+    if args.tile_size > 0:
+        tiler = TiledROI((x, y, w, h), args.tile_size, overlap=args.tile_overlap,
+                         geometry=get_polygon_geometry(poly_px, mask))
+
     # model & tracker
-    model = YOLO(args.model)
+    model = load_detector(args)
     tracker = CentroidTracker(max_disappeared=args.trk_max_miss, max_dist=args.trk_max_dist)
 
     target = 1.0 / args.fps if args.fps > 0 else 0
@@ -190,38 +212,45 @@ def main():
         if not ok:
             cap.set(cv2.CAP_PROP_POS_FRAMES, 0); continue
 
-        roi = frame[y:y+h, x:x+w]
-
-        # sedikit upscale buat objek jauh/duduk
-        scale_up = 1.5
-        roi_big = cv2.resize(roi, None, fx=scale_up, fy=scale_up, interpolation=cv2.INTER_CUBIC)
-
-        results = model.predict(
-            roi_big, imgsz=args.imgsz, conf=args.conf, iou=args.iou, classes=[0], verbose=False
-        )
-
         # kumpulkan bbox (global coords) yg centernya di dalam polygon
         det_bboxes = []
-        for r in results:
-            if r.boxes is None: continue
-            for b in r.boxes:
-                x1, y1, x2, y2 = map(int, b.xyxy[0])
-                # scale back
-                x1 = int(x1/scale_up); y1 = int(y1/scale_up)
-                x2 = int(x2/scale_up); y2 = int(y2/scale_up)
-                gx1, gy1, gx2, gy2 = x + x1, y + y1, x + x2, y + y2
+        if tiler is not None:
+            results = model.predict(
+                tiler.crops(frame), imgsz=tiler.imgsz, conf=args.conf, iou=args.iou, classes=[0], verbose=False
+            )
+            boxes, _confs, _classes = tiler.merge(results)
+            for gx1, gy1, gx2, gy2 in boxes.astype(int).tolist():
                 cx, cy = (gx1+gx2)//2, (gy1+gy2)//2
                 if cv2.pointPolygonTest(poly_px, (cx, cy), False) >= 0:
                     det_bboxes.append((gx1, gy1, gx2, gy2))
+        else:
+            roi = frame[y:y+h, x:x+w]
+
+            # sedikit upscale buat objek jauh/duduk
+            scale_up = 1.5
+            roi_big = cv2.resize(roi, None, fx=scale_up, fy=scale_up, interpolation=cv2.INTER_CUBIC)
+
+            results = model.predict(
+                roi_big, imgsz=args.imgsz, conf=args.conf, iou=args.iou, classes=[0], verbose=False
+            )
+
+            for r in results:
+                if r.boxes is None: continue
+                for b in r.boxes:
+                    x1, y1, x2, y2 = map(int, b.xyxy[0])
+                    # scale back
+                    x1 = int(x1/scale_up); y1 = int(y1/scale_up)
+                    x2 = int(x2/scale_up); y2 = int(y2/scale_up)
+                    gx1, gy1, gx2, gy2 = x + x1, y + y1, x + x2, y + y2
+                    cx, cy = (gx1+gx2)//2, (gy1+gy2)//2
+                    if cv2.pointPolygonTest(poly_px, (cx, cy), False) >= 0:
+                        det_bboxes.append((gx1, gy1, gx2, gy2))
 
         tracks = tracker.update(det_bboxes)
 
         # --- visualize ---
-        vis = frame.copy()
-        # shade di luar polygon
-        vis[mask == 0] = (vis[mask == 0] * 0.35).astype(np.uint8)
-        # polygon
-        cv2.polylines(vis, [poly_px], True, (0, 255, 255), 2)
+        # shade di luar polygon + polygon (layer statis)
+        vis = overlay.compose(frame)
 
         for tid, obj in tracks.items():
             x1,y1,x2,y2 = obj["bbox"]